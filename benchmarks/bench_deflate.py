@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""permessage-deflate benchmark.
+
+Publishes verbose JSON messages (JointState-like) through a compressing
+executor to the local stand-in bridge, which echoes them back compressed,
+and reports the wire size, compression ratio and zlib time for several
+compression levels, against an uncompressed run.
+
+Usage:
+    python benchmarks/bench_deflate.py [--messages 2000] [--joints 30]
+"""
+
+from __future__ import print_function
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rosbridge_pyclient import (  # noqa: E402
+    ExecutorThreaded, Publisher, Subscriber, PerMessageDeflate)
+from standin_bridge import StandinBridge  # noqa: E402
+
+
+def joint_state(seq, joints):
+    return {
+        "header": {"seq": seq, "stamp": {"secs": 1700000000 + seq // 100,
+                                         "nsecs": (seq % 100) * 10000000},
+                   "frame_id": "base_link"},
+        "name": ["arm_joint_{}".format(i) for i in range(joints)],
+        "position": [round(0.001 * seq * (i + 1), 4) for i in range(joints)],
+        "velocity": [0.0] * joints,
+        "effort": [round(0.5 + 0.01 * i, 3) for i in range(joints)],
+    }
+
+
+def run(compression, messages, joints):
+    bridge = StandinBridge(compression=compression is not None)
+    bridge.start()
+    executor = ExecutorThreaded(port=bridge.port, compression=compression)
+    executor.start()
+    received = []
+    sub = Subscriber(executor, "/joint_states", "sensor_msgs/JointState", received.append)
+    pub = Publisher(executor, "/joint_states", "sensor_msgs/JointState")
+    time.sleep(0.2)
+    start = time.time()
+    for seq in range(messages):
+        pub.publish(joint_state(seq, joints))
+    while len(received) < messages and time.time() - start < 30:
+        time.sleep(0.005)
+    elapsed = time.time() - start
+    sub.unregister()
+    pub.unregister()
+    executor.close()
+    bridge.stop()
+    return bridge.wire_bytes, elapsed, len(received)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--joints", type=int, default=30)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    plain, elapsed, count = run(None, args.messages, args.joints)
+    print("{0:<10} {1:>10} {2:>7} {3:>14} {4:>14} {5:>8}".format(
+        "level", "sent KiB", "ratio", "deflate us/msg", "inflate us/msg", "total s"))
+    print("{0:<10} {1:>10.0f} {2:>7} {3:>14} {4:>14} {5:>8.2f}".format(
+        "off", plain / 1024.0, "-", "-", "-", elapsed))
+    for level in (1, 6, 9):
+        deflate = PerMessageDeflate(level=level)
+        wire, elapsed, count = run(deflate, args.messages, args.joints)
+        stats = deflate.stats
+        print("{0:<10} {1:>10.0f} {2:>6.1f}x {3:>14.1f} {4:>14.1f} {5:>8.2f}".format(
+            level, wire / 1024.0, stats.ratio,
+            stats.compress_seconds / max(stats.compressed, 1) * 1e6,
+            stats.decompress_seconds / max(stats.inflated, 1) * 1e6, elapsed))
+
+
+if __name__ == "__main__":
+    main()
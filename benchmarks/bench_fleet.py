@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Fleet mode scaling benchmark.
+
+Connects N executors to a local stand-in bridge, manages them on a single
+FleetManager poller and measures:
+
+- connect + add time for the whole fleet,
+- fleet-wide publish throughput (one message to every robot),
+- round trip fan-in: every robot publishes on its own topic, the bridge
+  echoes it back to its subscription, all handled by the one poller.
+
+Usage:
+    python benchmarks/bench_fleet.py [--robots 500] [--rounds 20] [--baseline]
+"""
+
+from __future__ import print_function
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rosbridge_pyclient import Executor, ExecutorManager  # noqa: E402
+from rosbridge_pyclient.fleet import FleetManager  # noqa: E402
+from standin_bridge import StandinBridge  # noqa: E402
+
+
+def bench_add(manager_cls, port, robots):
+    manager = manager_cls()
+    manager.start()
+    executors = [Executor(ip="127.0.0.1", port=port) for _ in range(robots)]
+    start = time.time()
+    if isinstance(manager, FleetManager):
+        failed = manager.connect_all(executors)
+    else:
+        failed = []
+        for e in executors:
+            e.connect()
+            manager.add(e)
+    elapsed = time.time() - start
+    return manager, executors, elapsed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--robots", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--baseline", action="store_true",
+                        help="Also time adding the fleet to a plain ExecutorManager")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    bridge = StandinBridge()
+    bridge.start()
+
+    if args.baseline:
+        manager, executors, elapsed, _ = bench_add(ExecutorManager, bridge.port, args.robots)
+        print("ExecutorManager: connect+add {0} robots: {1:.3f} s".format(args.robots, elapsed))
+        manager.kill()
+
+    fleet, executors, elapsed, failed = bench_add(FleetManager, bridge.port, args.robots)
+    print("FleetManager:    connect+add {0} robots: {1:.3f} s ({2} failed)".format(
+        args.robots, elapsed, len(failed)))
+
+    msg = {"data": "x" * 64}
+    start = time.time()
+    for _ in range(args.rounds):
+        fleet.publish("/fleet/cmd", "std_msgs/String", msg)
+    elapsed = time.time() - start
+    sent = args.rounds * len(fleet.executors)
+    print("Fleet publish:   {0} msgs in {1:.3f} s -> {2:.0f} msgs/s".format(
+        sent, elapsed, sent / elapsed))
+
+    received = [0]
+    lock = threading.Lock()
+    done = threading.Event()
+    expected = args.rounds * len(fleet.executors)
+
+    def on_echo(executor, msg):
+        with lock:
+            received[0] += 1
+            if received[0] >= expected:
+                done.set()
+
+    for i, executor in enumerate(fleet.executors):
+        fleet.subscribe("/fleet/echo/{}".format(i), "std_msgs/String", on_echo, [executor])
+    time.sleep(0.5)
+    start = time.time()
+    for _ in range(args.rounds):
+        for i, executor in enumerate(fleet.executors):
+            fleet.publish("/fleet/echo/{}".format(i), "std_msgs/String", msg, [executor])
+    done.wait(60)
+    elapsed = time.time() - start
+    print("Echo fan-in:     {0}/{1} msgs in {2:.3f} s -> {3:.0f} msgs/s".format(
+        received[0], expected, elapsed, received[0] / elapsed))
+
+    states = {}
+    for h in fleet.health():
+        states[h["state"]] = states.get(h["state"], 0) + 1
+    print("Health:          {}".format(states))
+    for i in range(len(fleet.executors)):
+        fleet.unsubscribe("/fleet/echo/{}".format(i))
+    fleet.kill()
+    bridge.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Large frame decoding benchmark.
+
+Decodes a nav_msgs/OccupancyGrid frame and a sensor_msgs/PointCloud2
+frame with json.loads and with LargeFrameDecoder, and reports the decode
+time and the peak memory allocated while decoding.
+
+Usage:
+    python benchmarks/bench_large_frames.py [--size 2000] [--points 500000]
+"""
+
+from __future__ import print_function
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rosbridge_pyclient.largeframe import LargeFrameDecoder  # noqa: E402
+
+
+def occupancy_grid(size):
+    cells = np.random.RandomState(0).choice([-1, 0, 100], size * size)
+    return json.dumps({"op": "publish", "topic": "/map", "msg": {
+        "header": {"frame_id": "map"},
+        "info": {"width": size, "height": size, "resolution": 0.05},
+        "data": cells.tolist()}}).encode("utf-8")
+
+
+def point_cloud(points):
+    cloud = np.random.RandomState(0).rand(points, 4).astype(np.float32)
+    return json.dumps({"op": "publish", "topic": "/points", "msg": {
+        "header": {"frame_id": "lidar"}, "height": 1, "width": points,
+        "point_step": 16, "row_step": 16 * points,
+        "data": base64.b64encode(cloud.tobytes()).decode("ascii")}}).encode("utf-8")
+
+
+def measure(name, decode, frame):
+    tracemalloc.start()
+    start = time.time()
+    decode(frame)
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("{0:<28} {1:>8.1f} ms  peak {2:>7.1f} MB".format(name, elapsed * 1e3, peak / 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--points", type=int, default=500000)
+    args = parser.parse_args()
+    decoder = LargeFrameDecoder(min_size=0, dtypes={"/map": {"data": np.int8}},
+                                base64_fields={"/points": ("data",)})
+
+    grid = occupancy_grid(args.size)
+    print("OccupancyGrid {0}x{0}, {1:.1f} MB frame".format(args.size, len(grid) / 1e6))
+    measure("json.loads", json.loads, grid)
+    measure("LargeFrameDecoder", decoder.loads, grid)
+
+    cloud = point_cloud(args.points)
+    print("PointCloud2 {0} points, {1:.1f} MB frame".format(args.points, len(cloud) / 1e6))
+    # json.loads leaves the base64 string to be decoded by the application
+    measure("json.loads + b64decode",
+            lambda frame: base64.b64decode(json.loads(frame)["msg"]["data"]), cloud)
+    measure("LargeFrameDecoder", decoder.loads, cloud)
+
+
+if __name__ == "__main__":
+    main()
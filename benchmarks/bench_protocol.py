@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Protocol core benchmark, with no socket involved.
+
+Measures the RosbridgeProtocol operations in isolation: building publish
+frames, routing received publish frames to subscribers (one at a time and
+in batches), prefiltered frames skipped without decoding, and service
+response routing.
+
+Usage:
+    python benchmarks/bench_protocol.py [--ops 200000]
+"""
+
+from __future__ import print_function
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rosbridge_pyclient.protocol import RosbridgeProtocol  # noqa: E402
+
+
+class Handle(object):
+    def __init__(self, topic, needles=()):
+        self.topic = topic
+        self.message_type = "std_msgs/String"
+        self.needles = needles
+        self.subscribe_id = ""
+
+
+class ServiceHandle(object):
+    def __init__(self, service_id):
+        self.service_id = service_id
+        self.name = "/add_two_ints"
+
+
+def report(name, ops, elapsed):
+    print("{0:<28} {1:>8.2f} M ops/s  ({2:.0f} ns/op)".format(
+        name, ops / elapsed / 1e6, elapsed / ops * 1e9))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=200000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    n = args.ops
+
+    protocol = RosbridgeProtocol()
+    protocol.add_subscriber(Handle("/chatter"))
+    protocol.add_subscriber(Handle("/diagnostics", needles=('"map"',)))
+    msg = {"data": "hello"}
+
+    start = time.time()
+    for i in range(n):
+        protocol.publish("/chatter", msg, 1)
+    report("publish frame", n, time.time() - start)
+
+    frames = [json.dumps({"op": "publish", "topic": "/chatter", "msg": {"data": i}})
+              for i in range(n)]
+    receive = protocol.receive
+    start = time.time()
+    for frame in frames:
+        receive(frame)
+    report("receive publish", n, time.time() - start)
+
+    start = time.time()
+    protocol.receive_many(frames)
+    report("receive_many publish", n, time.time() - start)
+
+    filtered = [json.dumps({"op": "publish", "topic": "/diagnostics",
+                            "msg": {"header": {"frame_id": "base"}}})] * n
+    start = time.time()
+    events = protocol.receive_many(filtered)
+    report("prefiltered publish", n, time.time() - start)
+    assert not events
+
+    clients = [ServiceHandle("call_service:{}".format(i)) for i in range(n)]
+    responses = [json.dumps({"op": "service_response", "id": c.service_id,
+                             "result": True, "values": {"sum": 3}}) for c in clients]
+    start = time.time()
+    for client in clients:
+        protocol.call_service(client, {"a": 1, "b": 2})
+    events = protocol.receive_many(responses)
+    report("service call + response", n, time.time() - start)
+    assert len(events) == n
+
+
+if __name__ == "__main__":
+    main()
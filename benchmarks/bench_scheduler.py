@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Periodic publishing benchmark.
+
+Drives N periodic streams from the executor's single scheduler thread,
+against the local stand-in bridge, and reports the achieved rate, the tick
+lateness and the number of threads used.
+
+Usage:
+    python benchmarks/bench_scheduler.py [--streams 500] [--rate 10] [--seconds 5]
+"""
+
+from __future__ import print_function
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rosbridge_pyclient import Executor, ExecutorManager, Publisher  # noqa: E402
+from rosbridge_pyclient.scheduler import _clock  # noqa: E402
+from standin_bridge import StandinBridge  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=10.0)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    bridge = StandinBridge()
+    bridge.start()
+    manager = ExecutorManager()
+    manager.start()
+    executor = Executor(ip="127.0.0.1", port=bridge.port)
+    executor.connect()
+    manager.add(executor)
+
+    threads_before = threading.active_count()
+    lateness = []
+    tasks = []
+    period = 1.0 / args.rate
+
+    def provider(index):
+        def message():
+            task = tasks[index]
+            # The task already moved to its next deadline
+            lateness.append(_clock() - (task.deadline() - period))
+            return {"data": index}
+        return message
+
+    for i in range(args.streams):
+        pub = Publisher(executor, "/periodic/{}".format(i), "std_msgs/Int32")
+        tasks.append(pub.publish_periodic(args.rate, provider(i), phase=0.05))
+    time.sleep(args.seconds)
+    for task in tasks:
+        task.cancel()
+    threads = threading.active_count() - threads_before
+
+    published = sum(t.published for t in tasks)
+    missed = sum(t.missed for t in tasks)
+    expected = args.streams * args.rate * args.seconds
+    lateness.sort()
+    print("Streams:    {0} at {1:g} Hz, {2} scheduler thread(s)".format(
+        args.streams, args.rate, threads))
+    print("Published:  {0} msgs ({1:.1%} of {2:.0f}), {3} ticks missed".format(
+        published, published / expected, expected, missed))
+    print("Lateness:   median {0:.2f} ms, p99 {1:.2f} ms, max {2:.2f} ms".format(
+        lateness[len(lateness) // 2] * 1e3, lateness[int(len(lateness) * 0.99)] * 1e3,
+        lateness[-1] * 1e3))
+    executor.scheduler.stop()
+    manager.kill()
+    bridge.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Startup benchmark: package import time, connect + authenticate time and
+registration of a robot's topics, one by one or with `register_many`.
+
+Import time is measured in fresh interpreters. Connect time is measured
+against the local stand-in bridge, so no network access is needed. Use
+--public-ip to also time the former authentication path, which asked an
+external service for the public IP address on every connect.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 10] [--topics 300] [--public-ip]
+"""
+
+from __future__ import print_function
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from rosbridge_pyclient import (Executor, ExecutorManager, Publisher,  # noqa: E402
+                                Subscriber, get_public_ip)
+from standin_bridge import StandinBridge  # noqa: E402
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def bench_import(runs):
+    code = ("import sys, time; sys.path.insert(0, {!r}); t = time.time(); "
+            "import rosbridge_pyclient; print(time.time() - t)").format(ROOT)
+    times = []
+    for _ in range(runs):
+        out = subprocess.check_output([sys.executable, "-c", code])
+        times.append(float(out.decode().strip().splitlines()[-1]))
+    return median(times)
+
+
+def bench_connect(port, runs, public_ip=False):
+    manager = ExecutorManager()
+    manager.start()
+    times = []
+    try:
+        for _ in range(runs):
+            start = time.time()
+            executor = Executor(ip="127.0.0.1", port=port)
+            executor.connect()
+            manager.add(executor)
+            if public_ip:
+                executor.authenticate("secret", source_ip=lambda e: get_public_ip())
+            else:
+                executor.authenticate("secret")
+            times.append(time.time() - start)
+    finally:
+        manager.kill()
+    return median(times)
+
+
+def bench_register(port, topics, bulk):
+    manager = ExecutorManager()
+    manager.start()
+    executor = Executor(ip="127.0.0.1", port=port)
+    executor.connect()
+    manager.add(executor)
+    publish = [("/robot/out/{}".format(i), "std_msgs/String") for i in range(topics // 2)]
+    subscribe = [("/robot/in/{}".format(i), "std_msgs/String", None)
+                 for i in range(topics - topics // 2)]
+    try:
+        start = time.time()
+        if bulk:
+            publishers, subscribers = executor.register_many(publish, subscribe)
+            publishers = list(publishers.values())
+        else:
+            publishers = [Publisher(executor, topic, message_type)
+                          for topic, message_type in publish]
+            subscribers = [Subscriber(executor, topic, message_type, clb)
+                           for topic, message_type, clb in subscribe]
+        elapsed = time.time() - start
+        for handle in publishers + subscribers:
+            handle.unregister()
+        return elapsed
+    finally:
+        manager.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--topics", type=int, default=300)
+    parser.add_argument("--public-ip", action="store_true",
+                        help="Also time authentication with the external IP lookup")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print("Import rosbridge_pyclient:      {0:.1f} ms".format(bench_import(args.runs) * 1e3))
+    bridge = StandinBridge()
+    bridge.start()
+    print("Connect + authenticate:         {0:.2f} ms".format(
+        bench_connect(bridge.port, args.runs) * 1e3))
+    print("Register {0} topics, one by one: {1:.2f} ms".format(
+        args.topics, bench_register(bridge.port, args.topics, False) * 1e3))
+    print("Register {0} topics, bulk:       {1:.2f} ms".format(
+        args.topics, bench_register(bridge.port, args.topics, True) * 1e3))
+    if args.public_ip:
+        try:
+            print("Connect + authenticate (ip.42): {0:.2f} ms".format(
+                bench_connect(bridge.port, args.runs, True) * 1e3))
+        except Exception as exc:
+            print("Connect + authenticate (ip.42): failed, {}".format(exc))
+    bridge.stop()
+
+
+if __name__ == "__main__":
+    main()
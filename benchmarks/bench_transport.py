@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Websocket vs raw TCP transport benchmark.
+
+Publishes messages through the executor to the local stand-in bridge,
+which sends them back to the executor's subscriber, and reports the
+round trip throughput of ExecutorThreaded (websocket) and ExecutorTCP.
+
+Usage:
+    python benchmarks/bench_transport.py [--messages 20000] [--size 200]
+"""
+
+from __future__ import print_function
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rosbridge_pyclient import ExecutorThreaded, ExecutorTCP, Publisher, Subscriber  # noqa: E402
+from standin_bridge import StandinBridge  # noqa: E402
+
+
+def run(executor_class, messages, size):
+    bridge = StandinBridge(tcp=executor_class is ExecutorTCP)
+    bridge.start()
+    executor = executor_class(port=bridge.port)
+    executor.start()
+    received = []
+    sub = Subscriber(executor, "/chatter", "std_msgs/String", received.append)
+    pub = Publisher(executor, "/chatter", "std_msgs/String")
+    time.sleep(0.2)
+    msg = {"data": "x" * size}
+    start = time.time()
+    for _ in range(messages):
+        pub.publish(msg)
+    while len(received) < messages and time.time() - start < 60:
+        time.sleep(0.001)
+    elapsed = time.time() - start
+    sub.unregister()
+    pub.unregister()
+    executor.close()
+    bridge.stop()
+    return elapsed, len(received)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=200)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    for executor_class in (ExecutorThreaded, ExecutorTCP):
+        elapsed, count = run(executor_class, args.messages, args.size)
+        print("{0:<18} {1} msgs in {2:.2f} s, {3:.0f} msg/s".format(
+            executor_class.__name__, count, elapsed, count / elapsed))
+
+
+if __name__ == "__main__":
+    main()
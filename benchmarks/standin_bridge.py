@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Minimal local stand-in for rosbridge_server, used by the benchmarks.
+
+It speaks just enough of the websocket protocol and of the rosbridge
+protocol to exercise the client: subscribe/unsubscribe, publish (fanned
+out to subscribers of the topic, like ROS would), advertise/unadvertise,
+call_service (echoes the args back, with an optional delay) and
+`/rosapi/get_time`. Everything runs on one selectors loop in a thread.
+With `compression=True`, permessage-deflate is accepted when offered.
+With `tcp=True`, it speaks the raw TCP protocol of rosbridge_tcp in JSON
+mode instead: concatenated JSON messages, with no delimiter.
+"""
+
+from __future__ import print_function
+import base64
+import hashlib
+import heapq
+import json
+import selectors
+import socket
+import struct
+import threading
+import time
+import zlib
+
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_JSON = json.JSONDecoder()
+
+
+def _unmask(payload, mask):
+    n = len(payload)
+    if n == 0:
+        return payload
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(n, 'big')
+
+
+def ws_frame(payload, opcode=0x1, rsv1=False):
+    """Build an unmasked, single server-to-client websocket frame."""
+    n = len(payload)
+    first = 0x80 | opcode | (0x40 if rsv1 else 0)
+    if n < 126:
+        header = struct.pack("!BB", first, n)
+    elif n < 65536:
+        header = struct.pack("!BBH", first, 126, n)
+    else:
+        header = struct.pack("!BBQ", first, 127, n)
+    return header + payload
+
+
+class _Connection(object):
+    def __init__(self, sock, tcp=False):
+        self.sock = sock
+        self.inbuf = bytearray()
+        self.outbuf = bytearray()
+        self.tcp = tcp
+        self.handshaken = tcp
+        self.topics = set()
+        # permessage-deflate codecs, if negotiated
+        self.deflater = None
+        self.inflater = None
+
+    def frame(self, payload):
+        """Text frame of a message, compressed if negotiated."""
+        if self.tcp:
+            return payload
+        if self.deflater is None:
+            return ws_frame(payload)
+        data = self.deflater.compress(payload) + self.deflater.flush(zlib.Z_SYNC_FLUSH)
+        return ws_frame(data[:-4], rsv1=True)
+
+
+class StandinBridge(threading.Thread):
+    def __init__(self, host="127.0.0.1", port=0, service_delay=None, compression=False,
+                 tcp=False):
+        """Constructor.
+
+        Args:
+            host (str, optional): Listening address. Defaults to 127.0.0.1.
+            port (int, optional): Listening port. Defaults to 0 (any free port).
+            service_delay (function, optional): Called with the service name
+                and args, returns the seconds to wait before responding.
+            compression (bool, optional): Accept permessage-deflate.
+                Defaults to False.
+            tcp (bool, optional): Use the raw TCP protocol instead of
+                websockets. Defaults to False.
+        """
+        threading.Thread.__init__(self, name="StandinBridge")
+        self.daemon = True
+        self._sel = selectors.DefaultSelector()
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((host, port))
+        self._listener.listen(1024)
+        self._listener.setblocking(False)
+        self._sel.register(self._listener, selectors.EVENT_READ, None)
+        self._subscribers = {}
+        self._timers = []
+        self._service_delay = service_delay
+        self._compression = compression
+        self._tcp = tcp
+        self.wire_bytes = 0
+        self._running = False
+        self.received = 0
+
+    @property
+    def port(self):
+        return self._listener.getsockname()[1]
+
+    @property
+    def connections(self):
+        return len(self._sel.get_map()) - 1
+
+    def stop(self):
+        self._running = False
+        self.join(2)
+
+    def run(self):
+        self._running = True
+        while self._running:
+            timeout = 0.05
+            if self._timers:
+                timeout = max(0.0, min(timeout, self._timers[0][0] - time.time()))
+            for key, events in self._sel.select(timeout):
+                if key.data is None:
+                    self._accept()
+                    continue
+                conn = key.data
+                if events & selectors.EVENT_READ:
+                    self._read(conn)
+                if events & selectors.EVENT_WRITE:
+                    self._flush(conn)
+            now = time.time()
+            while self._timers and self._timers[0][0] <= now:
+                _, _, conn, payload = heapq.heappop(self._timers)
+                self._queue(conn, conn.frame(payload))
+        for key in list(self._sel.get_map().values()):
+            key.fileobj.close()
+        self._sel.close()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = _Connection(sock, self._tcp)
+            self._sel.register(sock, selectors.EVENT_READ, conn)
+
+    def _drop(self, conn):
+        for topic in conn.topics:
+            self._subscribers.get(topic, set()).discard(conn)
+        try:
+            self._sel.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass
+        conn.sock.close()
+
+    def _queue(self, conn, data):
+        if conn.sock.fileno() < 0:
+            return
+        if not conn.outbuf:
+            try:
+                sent = conn.sock.send(data)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError:
+                self._drop(conn)
+                return
+            data = data[sent:]
+            if not data:
+                return
+            self._sel.modify(conn.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, conn)
+        conn.outbuf += data
+
+    def _flush(self, conn):
+        try:
+            sent = conn.sock.send(conn.outbuf)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._drop(conn)
+            return
+        del conn.outbuf[:sent]
+        if not conn.outbuf:
+            self._sel.modify(conn.sock, selectors.EVENT_READ, conn)
+
+    def _read(self, conn):
+        try:
+            data = conn.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._drop(conn)
+            return
+        conn.inbuf += data
+        if conn.tcp:
+            self._parse_tcp(conn)
+            return
+        if not conn.handshaken:
+            end = conn.inbuf.find(b"\r\n\r\n")
+            if end < 0:
+                return
+            self._handshake(conn, bytes(conn.inbuf[:end]))
+            del conn.inbuf[:end + 4]
+        self._parse_frames(conn)
+
+    def _handshake(self, conn, request):
+        key = b""
+        extensions = b""
+        for line in request.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            if name == b"sec-websocket-key":
+                key = value.strip()
+            elif name == b"sec-websocket-extensions":
+                extensions = value.strip()
+        accept = base64.b64encode(hashlib.sha1(key + _WS_GUID).digest())
+        conn.handshaken = True
+        response = (b"HTTP/1.1 101 Switching Protocols\r\n"
+                    b"Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                    b"Sec-WebSocket-Accept: " + accept + b"\r\n")
+        if self._compression and extensions.startswith(b"permessage-deflate"):
+            conn.deflater = zlib.compressobj(6, zlib.DEFLATED, -15)
+            conn.inflater = zlib.decompressobj(-15)
+            response += b"Sec-WebSocket-Extensions: permessage-deflate\r\n"
+        self._queue(conn, response + b"\r\n")
+
+    def _parse_tcp(self, conn):
+        # Like rosbridge_tcp, decode JSON objects until the rest is incomplete
+        text = conn.inbuf.decode('utf-8', 'ignore')
+        pos = 0
+        while True:
+            while pos < len(text) and text[pos].isspace():
+                pos += 1
+            try:
+                _, end = _JSON.raw_decode(text, pos)
+            except ValueError:
+                break
+            payload = text[pos:end].encode('utf-8')
+            self.wire_bytes += len(payload)
+            pos = end
+            self.handle(conn, payload)
+        del conn.inbuf[:len(text[:pos].encode('utf-8'))]
+
+    def _parse_frames(self, conn):
+        buf = conn.inbuf
+        while len(buf) >= 2:
+            opcode = buf[0] & 0x0f
+            compressed = buf[0] & 0x40
+            masked = buf[1] & 0x80
+            length = buf[1] & 0x7f
+            pos = 2
+            if length == 126:
+                if len(buf) < 4:
+                    return
+                length = struct.unpack_from("!H", buf, 2)[0]
+                pos = 4
+            elif length == 127:
+                if len(buf) < 10:
+                    return
+                length = struct.unpack_from("!Q", buf, 2)[0]
+                pos = 10
+            mask = b""
+            if masked:
+                mask = bytes(buf[pos:pos + 4])
+                pos += 4
+            if len(buf) < pos + length:
+                return
+            payload = bytes(buf[pos:pos + length])
+            del buf[:pos + length]
+            self.wire_bytes += pos + length
+            if masked:
+                payload = _unmask(payload, mask)
+            if compressed:
+                payload = conn.inflater.decompress(payload + b"\x00\x00\xff\xff")
+            if opcode == 0x8:
+                self._queue(conn, ws_frame(payload[:2], 0x8))
+                self._drop(conn)
+                return
+            if opcode == 0x9:
+                self._queue(conn, ws_frame(payload, 0xA))
+            elif opcode in (0x1, 0x2):
+                self.handle(conn, payload)
+
+    def send_to(self, conn, data):
+        """Send a rosbridge protocol message (dict) to a connection."""
+        self._queue(conn, conn.frame(json.dumps(data).encode('utf-8')))
+
+    def handle(self, conn, payload):
+        """Handle one rosbridge protocol op."""
+        self.received += 1
+        data = json.loads(payload.decode('utf-8'))
+        op = data.get('op')
+        if op == 'subscribe':
+            conn.topics.add(data['topic'])
+            self._subscribers.setdefault(data['topic'], set()).add(conn)
+        elif op == 'unsubscribe':
+            conn.topics.discard(data['topic'])
+            self._subscribers.get(data['topic'], set()).discard(conn)
+        elif op == 'publish':
+            subscribers = self._subscribers.get(data['topic'])
+            if subscribers:
+                payload = json.dumps({
+                    'op': 'publish', 'topic': data['topic'], 'msg': data['msg']
+                }).encode('utf-8')
+                frame = ws_frame(payload)
+                for sub in list(subscribers):
+                    self._queue(sub, sub.frame(payload) if sub.tcp or sub.deflater else frame)
+        elif op == 'call_service':
+            service = data.get('service')
+            args = data.get('args') or {}
+            if service == '/rosapi/get_time':
+                now = time.time()
+                values = {'time': {'secs': int(now), 'nsecs': int((now % 1) * 1e9)}}
+            else:
+                values = args
+            payload = json.dumps({
+                'op': 'service_response', 'service': service, 'id': data.get('id'),
+                'result': True, 'values': values
+            }).encode('utf-8')
+            delay = self._service_delay(service, args) if self._service_delay else 0
+            if delay > 0:
+                # Compressed when sent, frames share the compression context
+                heapq.heappush(self._timers, (time.time() + delay, id(payload), conn, payload))
+            else:
+                self._queue(conn, conn.frame(payload))
@@ -2,12 +2,50 @@
 # coding: utf-8
 
 from __future__ import absolute_import
+import sys
 
 __version__ = "0.6.1"
 
-from .executor import ExecutorThreaded, ExecutorTornado, ExecutorManager, Executor, get_public_ip
+from .executor import ExecutorThreaded, ExecutorManager, Executor, ExecutorTCP, get_public_ip, local_source_ip
 from .publisher import Publisher
 from .subscriber import Subscriber
+from .stream import MessageStream, StreamClosed
+from .deflate import PerMessageDeflate, DeflateStats
+from .keepalive import Keepalive
+from .latency import LatencyTracer, estimate_clock_offset
+from .metrics import Histogram
 from .service_client import ServiceClient
-from .action_client import ActionClient, Goal
+from .service_server import ServiceServer
+from .action_client import ActionClient, Goal, GoalStatus, GoalTimeoutError, wait_any, wait_all
 from .rosapi import ROSApi
+from .graph import GraphWatcher, GraphChange
+from .synchronizer import TimeSynchronizer, ApproximateTimeSynchronizer
+
+# Attributes whose modules pull in tornado or NumPy, imported on first use
+_LAZY = {
+    'ExecutorTornado': '.tornado_executor',
+    'TFClient': '.tf_client',
+    'TransformBuffer': '.tf_client',
+    'Transform': '.tf_client',
+    'TransformLookupError': '.tf_client',
+    'TimeSeries': '.timeseries',
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    import importlib
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
+
+
+if sys.version_info < (3, 7):
+    # No module __getattr__, import everything
+    for _name in _LAZY:
+        __getattr__(_name)
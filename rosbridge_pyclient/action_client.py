@@ -7,6 +7,9 @@ from .publisher import Publisher
 
 import uuid
 import logging
+import threading
+import time
+from collections import OrderedDict
 
 try:
     basestring
@@ -18,8 +21,31 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class GoalTimeoutError(Exception):
+    """Raised when waiting for a goal result times out."""
+    pass
+
+
+class GoalStatus(object):
+    """actionlib_msgs/GoalStatus status codes."""
+    PENDING = 0
+    ACTIVE = 1
+    PREEMPTED = 2
+    SUCCEEDED = 3
+    ABORTED = 4
+    REJECTED = 5
+    PREEMPTING = 6
+    RECALLING = 7
+    RECALLED = 8
+    LOST = 9
+
+    TERMINAL_STATES = frozenset([PREEMPTED, SUCCEEDED, ABORTED,
+                                 REJECTED, RECALLED, LOST])
+
+
 class ActionClient(object):
-    def __init__(self, executor, server_name, action_type):
+    def __init__(self, executor, server_name, action_type, history_size=0,
+                 result_grace=1.0):
         """Constructor.
 
         Args:
@@ -27,11 +53,22 @@ class ActionClient(object):
             The [Executor|ExecutorThreadedu|ExecutorTornado] object.
             server_name (str): The ROS action server name.
             action_type (str): The ROS action name.
+            history_size (int, optional): Number of finished goals kept
+                for lookup via `get_goal()`, after they are evicted from
+                the active goal index. Defaults to 0.
+            result_grace (float, optional): Seconds to wait for the result
+                message of a goal after the status array reported it in a
+                terminal state, before evicting it. Defaults to 1.
         """
         self._executor = executor
         self._server_name = server_name
         self._action_type = action_type
         self._goals = {}
+        self._history = OrderedDict()
+        self._history_size = history_size
+        self._result_grace = result_grace
+        # Goal ID -> (time, status) of its first terminal status
+        self._terminal = {}
         self._id = ""
 
         self._feedback_sub = Subscriber(self._executor,
@@ -70,64 +107,124 @@ class ActionClient(object):
     def id(self, val):
         self._id = val
 
-    def on_statusChanged(self, message):
-        try:
-            goal = self._goals.get(message.get('status_list')[0].get('goal_id').get('id'))
-        except Exception as exc:
-            print(exc)
+    @property
+    def active_goals(self):
+        """Number of goals that have not received a result yet."""
+        return len(self._goals)
+
+    def get_goal(self, goal_id):
+        """Returns an active or, if kept in history, finished Goal.
+
+        Args:
+            goal_id (str): The goal ID.
+        """
+        goal = self._goals.get(goal_id)
+        if goal is None:
+            goal = self._history.get(goal_id)
+        return goal
+
+    def _evict(self, goal):
+        """Remove a finished goal from the active index."""
+        self._terminal.pop(goal.id, None)
+        if self._goals.pop(goal.id, None) is None:
             return
-        if goal:
-            goal.status_received(message.get('status_list'), message.get('header', None))
+        if self._history_size > 0:
+            self._history[goal.id] = goal
+            while len(self._history) > self._history_size:
+                self._history.popitem(last=False)
+
+    def on_statusChanged(self, message):
+        """Callback when a status array is received. Every status entry is
+        matched against the goal index in a single pass. Goals reported in
+        a terminal state are evicted once their result arrives, or after
+        `result_grace` seconds without it.
+
+        Args:
+            message (dict): An actionlib_msgs/GoalStatusArray message.
+        """
+        status_list = message.get('status_list') or []
+        header = message.get('header', None)
+        goals = self._goals
+        now = time.time()
+        for status in status_list:
+            try:
+                goal = goals.get(status['goal_id']['id'])
+            except (KeyError, TypeError):
+                continue
+            if goal is not None:
+                goal.status_received(status_list, header, status)
+                if status.get('status') in GoalStatus.TERMINAL_STATES:
+                    self._terminal.setdefault(goal.id, (now, status))
+        if self._terminal:
+            self._evict_terminal(now)
+
+    def _evict_terminal(self, now):
+        """Evict the goals whose result did not follow their terminal
+        status within the grace period. They are done, with a None result."""
+        deadline = now - self._result_grace
+        for goal_id, (seen, status) in list(self._terminal.items()):
+            if seen <= deadline:
+                goal = self._goals.get(goal_id)
+                self._terminal.pop(goal_id, None)
+                if goal is not None:
+                    self._evict(goal)
+                    goal.result_received(None, status)
 
     def on_feedback(self, msg):
         """Callback when a feedback message received.
         Args:
             message (dict): A feedback message received feedbackrom ROS action server.
         """
-        logger.info("Feedback: {}".format(msg))
-        goal = self._goals.get(msg.get('status').get('goal_id').get('id'))
+        status = msg.get('status')
+        goal = self._goals.get(status.get('goal_id').get('id'))
         if goal:
-            goal.feedback_received(msg.get('feedback'), msg.get('status'), msg.get('header', None))
+            goal.feedback_received(msg.get('feedback'), status, msg.get('header', None))
 
     def on_result(self, msg):
-        """Callback when a result message received.
+        """Callback when a result message received. The goal is evicted
+        from the active goal index.
+
         Args:
             message (dict): A result message received from ROS action server.
         """
-        goal = self._goals.get(msg.get('status').get('goal_id').get('id'))
+        status = msg.get('status')
+        goal = self._goals.get(status.get('goal_id').get('id'))
         if goal:
-            goal.result_received(msg.get('result'), msg.get('status'), msg.get('header', None))
+            self._evict(goal)
+            goal.result_received(msg.get('result'), status, msg.get('header', None))
 
     def send_goal(self, goal):
         """Send a goal to the ROS action server.
+
         Args:
-            goal_message (dict): A message to send to ROS action server.
-            on_result (function): A callback function to be called when a
-                feedback message received.
-            on_feedback (function): A callback function to be called when a
-                result message received.
+            goal (Goal): The goal to send.
+
+        Returns:
+            Goal: The same goal, usable as a future-like handle through
+                `result(timeout)`, `done()` and `cancel()`.
         """
+        goal._action_client = self
         self._goals[goal.id] = goal
         self._goal_pub.publish(goal.message)
-        return goal.id
+        return goal
 
     def cancel_goal(self, goal_id):
         """Cancel a goal with a given goal ID
         Args:
-            goal_id (str): The ID of the goal to be cancelled.
+            goal_id (str|Goal): The ID of the goal, or the goal to be cancelled.
         """
+        if isinstance(goal_id, Goal):
+            goal_id = goal_id.id
         self._cancel_pub.publish({'id': goal_id})
 
     def unregister(self):
-        """Reduce the usage of the action client. If the usage is 0,
-        unregister its publishers and subscribers."""
-        self._usage -= 1
-        if self._usage == 0:
-            self._feedback_sub.unregister()
-            self._result_sub.unregister()
-            self._goal_pub.unregister()
-            self._cancel_pub.unregister()
-            self._rosbridge.unregister_action_client(self)
+        """Unregister the publishers and subscribers of the action client."""
+        self._feedback_sub.unregister()
+        self._result_sub.unregister()
+        self._status_sub.unregister()
+        self._goal_pub.unregister()
+        self._cancel_pub.unregister()
+        self._executor.unregister_action_client(self)
 
     def _register(self):
         self._executor.register_action_client(self)
@@ -145,21 +242,24 @@ class Goal(object):
         """
         self._id = 'goal_' + str(uuid.uuid4())
         self._message = message
+        self._envelope = self._build_envelope()
+        self._result = None
+        self._status = None
         self._is_finished = False
         self._on_result = on_result
         self._on_feedback = on_feedback
         self._on_status = on_status
+        self._action_client = None
+        self._lock = threading.Lock()
+        self._done_event = threading.Event()
+        self._waiters = []
+        self._done_callbacks = []
 
     @property
     def id(self):
         return self._id
 
-    @property
-    def message(self):
-        """Wrap message in JSON format that complies ROSBridge protocol.
-        Returns:
-            A JSON that contains the goal ID and message.
-        """
+    def _build_envelope(self):
         return {
             'goal_id': {
                 'stamp': {
@@ -171,14 +271,121 @@ class Goal(object):
             'goal': self._message
         }
 
+    @property
+    def message(self):
+        """Wrap message in JSON format that complies ROSBridge protocol.
+        The envelope is built once, when the goal message is set.
+
+        Returns:
+            A JSON that contains the goal ID and message.
+        """
+        return self._envelope
+
     @message.setter
     def message(self, val):
         self._message = val
+        self._envelope = self._build_envelope()
+
+    @property
+    def status(self):
+        """Last received GoalStatus code, or None. Getter only property"""
+        return self._status
 
     @property
     def is_finished(self):
         return self._is_finished
 
+    def done(self):
+        """Returns True if the goal result has been received, or the goal
+        reached a terminal status without one."""
+        return self._done_event.is_set()
+
+    def cancelled(self):
+        """Returns True if the goal finished by being preempted or recalled."""
+        return self.done() and self._status in (GoalStatus.PREEMPTED,
+                                                GoalStatus.RECALLED)
+
+    def wait(self, timeout=None):
+        """Block until the goal result is received.
+
+        Args:
+            timeout (float, optional): Max seconds to wait. Defaults to None,
+                which waits forever.
+
+        Returns:
+            bool: True if the goal is done.
+        """
+        return self._done_event.wait(timeout)
+
+    def result(self, timeout=None):
+        """Block until the goal result is received and return it.
+
+        Args:
+            timeout (float, optional): Max seconds to wait. Defaults to None,
+                which waits forever.
+
+        Returns:
+            dict: The result message, or None if the goal reached a terminal
+                status, e.g. REJECTED or ABORTED, without a result message.
+
+        Raises:
+            GoalTimeoutError: If the result was not received in time.
+        """
+        if not self._done_event.wait(timeout):
+            raise GoalTimeoutError(
+                "Goal {0} did not finish within {1} seconds".format(self._id, timeout))
+        return self._result
+
+    def cancel(self):
+        """Request cancellation of the goal through the action client it
+        was sent with. The goal is done once the server reports the
+        preempted/recalled result.
+
+        Returns:
+            bool: False if the goal is already done or was never sent.
+        """
+        if self.done() or self._action_client is None:
+            return False
+        self._action_client.cancel_goal(self._id)
+        return True
+
+    def add_done_callback(self, fn):
+        """Call `fn(goal)` when the goal is done. Called immediately if the
+        goal is already done.
+        """
+        with self._lock:
+            if not self._done_event.is_set():
+                self._done_callbacks.append(fn)
+                return
+        fn(self)
+
+    def _add_waiter(self, waiter):
+        with self._lock:
+            if not self._done_event.is_set():
+                self._waiters.append(waiter)
+                return
+        waiter.goal_done()
+
+    def _remove_waiter(self, waiter):
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _set_done(self):
+        with self._lock:
+            self._done_event.set()
+            waiters = self._waiters
+            callbacks = self._done_callbacks
+            self._waiters = []
+            self._done_callbacks = []
+        for waiter in waiters:
+            waiter.goal_done()
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception as exc:
+                logger.error("Goal done callback raised: {}".format(exc))
+
     def _on_result_wrap(self, msg, status, header=None):
         self._on_result(msg, status, header)
 
@@ -192,7 +399,9 @@ class Goal(object):
             result (dict): The result message.
         """
         self._is_finished = True
-        self._message = result
+        self._result = result
+        self._status = status.get('status') if status else None
+        self._set_done()
         if callable(self._on_result):
             self._on_result_wrap(result, status, header)
 
@@ -213,11 +422,14 @@ class Goal(object):
         if callable(self._on_feedback):
             self._on_feedback_wrap(feedback, status, header)
 
-    def status_received(self, status, header=None):
-        """Called when a result message is received.
+    def status_received(self, status_list, header=None, status=None):
+        """Called when the status array lists this goal. The `on_status`
+        callback gets the whole status list.
         Args:
-            feedback (dict): The feedback message.
-            status (int): The status code. Such as:
+            status_list (list): The actionlib_msgs/GoalStatus entries of the
+                status array.
+            status (dict): The actionlib_msgs/GoalStatus of this goal.
+                Its `status` field holds the status code. Such as:
                 ACTIVE = 1: The goal is currently being processed by the AS;
                 PREEMPTED = 2: The goal received a cancel request after it
                     started executing;
@@ -227,5 +439,69 @@ class Goal(object):
                 For more details, refer to
                 http://docs.ros.org/indigo/api/actionlib_msgs/html/msg/GoalStatus.html.
         """
+        if status is not None:
+            self._status = status.get('status')
         if callable(self._on_status):
-            self._on_status(status, header=header)
+            self._on_status(status_list, header=header)
+
+
+class _GoalWaiter(object):
+    """Shared by all goals of a single wait call. Releases the waiting
+    thread once `count` of them are done."""
+
+    def __init__(self, count):
+        self._remaining = count
+        self._lock = threading.Lock()
+        self.event = threading.Event()
+
+    def goal_done(self):
+        with self._lock:
+            self._remaining -= 1
+            if self._remaining <= 0:
+                self.event.set()
+
+
+def _wait(goals, timeout, wait_all):
+    goals = list(goals)
+    pending = [g for g in goals if not g.done()]
+    if pending and (wait_all or len(pending) == len(goals)):
+        waiter = _GoalWaiter(len(pending) if wait_all else 1)
+        for goal in pending:
+            goal._add_waiter(waiter)
+        try:
+            waiter.event.wait(timeout)
+        finally:
+            for goal in pending:
+                goal._remove_waiter(waiter)
+    done = [g for g in goals if g.done()]
+    not_done = [g for g in goals if not g.done()]
+    return done, not_done
+
+
+def wait_any(goals, timeout=None):
+    """Block until at least one of the given goals is done. Waiting does
+    not poll, the calling thread sleeps until a result arrives.
+
+    Args:
+        goals (iterable): Goals returned by `ActionClient.send_goal`.
+        timeout (float, optional): Max seconds to wait. Defaults to None,
+            which waits forever.
+
+    Returns:
+        tuple: (done, not_done) lists of goals.
+    """
+    return _wait(goals, timeout, False)
+
+
+def wait_all(goals, timeout=None):
+    """Block until all of the given goals are done, or the timeout expires.
+
+    Args:
+        goals (iterable): Goals returned by `ActionClient.send_goal`.
+        timeout (float, optional): Max seconds to wait. Defaults to None,
+            which waits forever.
+
+    Returns:
+        tuple: (done, not_done) lists of goals.
+    """
+    return _wait(goals, timeout, True)
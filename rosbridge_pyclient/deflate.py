@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+
+"""permessage-deflate (RFC 7692) websocket compression for the ws4py based
+executors.
+
+ws4py has no extension support: it rejects frames with the RSV1 bit set and
+never sets it. Outgoing compressed frames are therefore built here, and
+incoming frames go through a `FrameInflater`, which inflates compressed
+messages and hands them to ws4py as plain frames.
+"""
+
+from __future__ import print_function, absolute_import
+import logging
+import os
+import re
+import struct
+import time
+import zlib
+from ws4py.framing import Frame, OPCODE_CONTINUATION
+
+logger = logging.getLogger(__name__)
+
+try:
+    _clock = time.perf_counter
+except AttributeError:
+    # Python 2
+    _clock = time.time
+
+# Appended by a sync flush, stripped from the sent messages, see RFC 7692 7.2.1
+_TAIL = b'\x00\x00\xff\xff'
+
+# Topic of the outgoing rosbridge frames, looked up in their head only
+_TOPIC = re.compile(br'"topic": "([^"]+)"')
+_TOPIC_SPAN = 512
+
+
+class DeflateStats(object):
+    """Compression counters of a connection."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # Sent messages
+        self.compressed = 0
+        self.uncompressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compress_seconds = 0.0
+        # Received messages
+        self.inflated = 0
+        self.wire_bytes_in = 0
+        self.inflated_bytes = 0
+        self.decompress_seconds = 0.0
+
+    @property
+    def ratio(self):
+        """Size reduction factor of the compressed sent messages."""
+        return float(self.bytes_in) / self.bytes_out if self.bytes_out else 0.0
+
+    @property
+    def received_ratio(self):
+        """Size reduction factor of the compressed received messages."""
+        return float(self.inflated_bytes) / self.wire_bytes_in if self.wire_bytes_in else 0.0
+
+    def __repr__(self):
+        return ("DeflateStats(sent {0} compressed {1:.1f}x in {2:.3f}s, {3} plain; "
+                "received {4} compressed {5:.1f}x in {6:.3f}s)").format(
+                    self.compressed, self.ratio, self.compress_seconds,
+                    self.uncompressed, self.inflated, self.received_ratio,
+                    self.decompress_seconds)
+
+
+class PerMessageDeflate(object):
+    """permessage-deflate settings and codec of an executor connection.
+
+    Pass an instance as the `compression` argument of `Executor` or
+    `ExecutorThreaded`. The extension is offered during the handshake, and
+    only used if rosbridge accepts it, see `enabled`.
+
+    Sent messages are compressed if their topic is listed in `topics` with
+    True, or else if they are at least `threshold` bytes long. Small frames
+    compress poorly and are cheaper to send as is.
+    """
+
+    def __init__(self, level=6, threshold=512, topics=None, mem_level=8,
+                 client_max_window_bits=15, server_max_window_bits=15,
+                 client_no_context_takeover=False):
+        """Constructor.
+
+        Args:
+            level (int, optional): zlib compression level, 1 (fast) to 9.
+                Defaults to 6.
+            threshold (int, optional): Min size in bytes of the compressed
+                sent messages. Defaults to 512.
+            topics (dict/list, optional): Per-topic rule, overriding the
+                threshold. A dict of topic name to whether to compress its
+                published messages, or a list of topics to always compress.
+            mem_level (int, optional): zlib memory level, 1 to 9. Defaults to 8.
+            client_max_window_bits (int, optional): LZ77 window of the sent
+                messages, 9 to 15. Smaller windows use less memory and
+                compress less. Defaults to 15.
+            server_max_window_bits (int, optional): LZ77 window requested
+                for the received messages, 8 to 15. Defaults to 15.
+            client_no_context_takeover (bool, optional): Compress every
+                sent message on its own, instead of referring to the previous
+                ones. Defaults to False.
+        """
+        if not 9 <= client_max_window_bits <= 15:
+            raise ValueError("client_max_window_bits must be in [9, 15]")
+        if not 8 <= server_max_window_bits <= 15:
+            raise ValueError("server_max_window_bits must be in [8, 15]")
+        self.level = level
+        self.mem_level = mem_level
+        self.threshold = threshold
+        if topics is not None and not isinstance(topics, dict):
+            topics = dict((topic, True) for topic in topics)
+        self.topics = topics or {}
+        self.client_max_window_bits = client_max_window_bits
+        self.server_max_window_bits = server_max_window_bits
+        self.client_no_context_takeover = client_no_context_takeover
+        self.stats = DeflateStats()
+        self._enabled = False
+        self._compressor = None
+        self._decompressor = None
+        self._flush_mode = zlib.Z_SYNC_FLUSH
+
+    @property
+    def enabled(self):
+        """Whether rosbridge accepted the extension. Getter only property."""
+        return self._enabled
+
+    def offer(self):
+        """Returns the Sec-WebSocket-Extensions header value of the handshake."""
+        params = ['permessage-deflate']
+        # Advertise the window we may use, allowing the server to ask for less
+        params.append('client_max_window_bits={}'.format(self.client_max_window_bits))
+        if self.server_max_window_bits < 15:
+            params.append('server_max_window_bits={}'.format(self.server_max_window_bits))
+        if self.client_no_context_takeover:
+            params.append('client_no_context_takeover')
+        return '; '.join(params)
+
+    def negotiate(self, extensions):
+        """Apply the extension parameters accepted by the server.
+
+        Args:
+            extensions (list): The Sec-WebSocket-Extensions values of the
+                handshake response, as parsed by ws4py (lowercase bytes).
+
+        Returns:
+            bool: Whether permessage-deflate is in use.
+        """
+        self._enabled = False
+        for extension in extensions or ():
+            if isinstance(extension, bytes):
+                extension = extension.decode('ascii', 'replace')
+            params = [p.strip() for p in extension.split(';')]
+            if params[0] != 'permessage-deflate':
+                continue
+            window_bits = self.client_max_window_bits
+            no_context_takeover = self.client_no_context_takeover
+            for param in params[1:]:
+                name, _, value = param.partition('=')
+                name = name.strip()
+                if name == 'client_max_window_bits' and value:
+                    window_bits = min(window_bits, int(value.strip().strip('"')))
+                elif name == 'client_no_context_takeover':
+                    no_context_takeover = True
+            if window_bits < 9:
+                # zlib cannot deflate with an 8 bit window, RFC 7692 7.1.2.1.
+                # Messages are then all sent uncompressed, which is allowed.
+                logger.warning("Server requires an 8 bit window, sending uncompressed")
+                self._compressor = None
+            else:
+                self._compressor = zlib.compressobj(
+                    self.level, zlib.DEFLATED, -window_bits, self.mem_level)
+            self._flush_mode = zlib.Z_FULL_FLUSH if no_context_takeover else zlib.Z_SYNC_FLUSH
+            # A full size window inflates any smaller one
+            self._decompressor = zlib.decompressobj(-15)
+            self._enabled = True
+            return True
+        return False
+
+    def wants(self, payload):
+        """Whether to compress a message to send.
+
+        Args:
+            payload (bytes): The encoded message.
+        """
+        if self._compressor is None:
+            return False
+        if self.topics:
+            match = _TOPIC.search(payload, 0, _TOPIC_SPAN)
+            if match is not None:
+                compress = self.topics.get(match.group(1).decode('utf-8'))
+                if compress is not None:
+                    return compress
+        return len(payload) >= self.threshold
+
+    def compress(self, payload):
+        """Deflate a message. Calls must be serialized in the order the
+        messages are sent, as they share the LZ77 window.
+
+        Args:
+            payload (bytes): The message.
+
+        Returns:
+            bytes: The compressed message, without the flush tail.
+        """
+        start = _clock()
+        data = self._compressor.compress(payload) + self._compressor.flush(self._flush_mode)
+        stats = self.stats
+        stats.compress_seconds += _clock() - start
+        if data.endswith(_TAIL):
+            data = data[:-4]
+        stats.compressed += 1
+        stats.bytes_in += len(payload)
+        stats.bytes_out += len(data)
+        return data
+
+    def decompress(self, data):
+        """Inflate a received message.
+
+        Args:
+            data (bytes): The compressed message.
+
+        Returns:
+            bytes: The message.
+        """
+        start = _clock()
+        payload = self._decompressor.decompress(bytes(data) + _TAIL)
+        stats = self.stats
+        stats.decompress_seconds += _clock() - start
+        stats.inflated += 1
+        stats.wire_bytes_in += len(data)
+        stats.inflated_bytes += len(payload)
+        return payload
+
+    def frame(self, payload, opcode, mask):
+        """Build the frame of a message to send, compressed if the rule
+        says so.
+
+        Args:
+            payload (bytes): The encoded message.
+            opcode (int): The websocket opcode, text or binary.
+            mask (bool): Whether to mask the frame, as clients do.
+
+        Returns:
+            bytes: The frame.
+        """
+        rsv1 = 0
+        if self.wants(payload):
+            payload = self.compress(payload)
+            rsv1 = 1
+        else:
+            self.stats.uncompressed += 1
+        masking_key = os.urandom(4) if mask else None
+        return Frame(opcode=opcode, body=payload, masking_key=masking_key,
+                     fin=1, rsv1=rsv1).build()
+
+
+class FrameInflater(object):
+    """Incremental parser of the frames received from the server.
+
+    Compressed messages, flagged with RSV1 on their first frame and possibly
+    fragmented, are inflated and rebuilt as a single plain frame. All other
+    frames are passed through unchanged. Every returned frame is complete,
+    so ws4py parses it in one go.
+    """
+
+    def __init__(self, deflate):
+        self._deflate = deflate
+        self._buf = bytearray()
+        self._needed = 2
+        # Opcode and fragments of the compressed message being received
+        self._opcode = None
+        self._fragments = []
+
+    @property
+    def needed(self):
+        """Number of bytes to read to complete the current frame."""
+        return self._needed
+
+    def feed(self, data):
+        """Parse received bytes.
+
+        Args:
+            data (bytes): Bytes read from the socket.
+
+        Returns:
+            list: The complete frames, to feed to the ws4py stream parser.
+        """
+        buf = self._buf
+        buf += data
+        frames = []
+        while True:
+            n = len(buf)
+            if n < 2:
+                self._needed = 2 - n
+                break
+            first, second = buf[0], buf[1]
+            length = second & 0x7f
+            pos = 2
+            if length == 126:
+                pos = 4
+                if n < pos:
+                    self._needed = pos - n
+                    break
+                length = struct.unpack_from('!H', buf, 2)[0]
+            elif length == 127:
+                pos = 10
+                if n < pos:
+                    self._needed = pos - n
+                    break
+                length = struct.unpack_from('!Q', buf, 2)[0]
+            if second & 0x80:
+                pos += 4
+            end = pos + length
+            if n < end:
+                self._needed = end - n
+                break
+            opcode = first & 0x0f
+            rsv1 = first & 0x40
+            fin = first & 0x80
+            if rsv1 and 0 < opcode < 8 and not second & 0x80:
+                self._opcode = opcode
+                self._fragments = [bytes(buf[pos:end])]
+            elif opcode == OPCODE_CONTINUATION and self._opcode is not None:
+                self._fragments.append(bytes(buf[pos:end]))
+            else:
+                # Control frames, plain messages and anything ws4py must reject
+                frames.append(bytes(buf[:end]))
+                del buf[:end]
+                continue
+            del buf[:end]
+            if fin:
+                payload = self._deflate.decompress(b''.join(self._fragments))
+                frames.append(Frame(opcode=self._opcode, body=payload, fin=1).build())
+                self._opcode = None
+                self._fragments = []
+        return frames
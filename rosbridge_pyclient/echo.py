@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""Matching of messages that rosbridge echoes back to their publisher."""
+
+from __future__ import print_function, absolute_import
+import math
+import threading
+import time
+from collections import deque
+
+# float32 fields come back widened to float64, e.g. 0.1 as 0.10000000149011612
+_FLOAT_TOLERANCE = 1e-6
+
+
+def echo_of(sent, received, top=True):
+    """Whether a received message is the echo of a published one.
+
+    rosbridge fills in the default value of every field the publisher left
+    out, and rospy overwrites the `header.seq` of stamped messages, so the
+    echo only has to carry the fields that were set, with the same values.
+    Floats are compared at float32 precision, since a float32 field does
+    not round-trip the published double exactly.
+
+    Args:
+        sent: The published message, or one of its fields.
+        received: The received message, or the same field of it.
+
+    Returns:
+        bool: True if every field of `sent` is found in `received`.
+    """
+    if isinstance(sent, dict):
+        if not isinstance(received, dict):
+            return False
+        for key, value in sent.items():
+            if key not in received:
+                return False
+            if top and key == 'header' and isinstance(value, dict):
+                value = dict((k, v) for k, v in value.items() if k != 'seq')
+            if not echo_of(value, received[key], False):
+                return False
+        return True
+    if isinstance(sent, (list, tuple)):
+        if not isinstance(received, (list, tuple)) or len(sent) != len(received):
+            return False
+        return all(echo_of(s, r, False) for s, r in zip(sent, received))
+    if isinstance(sent, float) or isinstance(received, float):
+        if isinstance(sent, bool) or isinstance(received, bool):
+            return False
+        try:
+            return math.isclose(sent, received, rel_tol=_FLOAT_TOLERANCE)
+        except TypeError:
+            return False
+    return sent == received
+
+
+class EchoTracker(object):
+    """Remembers recently published messages per topic, so that their echo,
+    received through the executor's own subscription, can be recognized.
+
+    Echoes arrive in publish order on a single connection, so matching
+    only scans the short per-topic queue, see `echo_of` for the comparison.
+    Entries skipped over by a match are assumed lost and dropped, as are
+    entries older than `ttl` seconds, and each queue is bounded.
+    """
+
+    def __init__(self, maxlen=64, ttl=5.0):
+        """Constructor.
+
+        Args:
+            maxlen (int, optional): Max outstanding messages per topic.
+                Defaults to 64.
+            ttl (float, optional): Seconds after which an unmatched message
+                is forgotten. Defaults to 5.
+        """
+        self._maxlen = maxlen
+        self._ttl = ttl
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.expired = 0
+
+    def __contains__(self, topic):
+        return bool(self._pending.get(topic))
+
+    def expect(self, topic, msg):
+        """Record a message that is about to be published.
+
+        Args:
+            topic (str): The topic name.
+            msg (dict): The published message.
+        """
+        now = time.time()
+        with self._lock:
+            queue = self._pending.get(topic)
+            if queue is None:
+                queue = deque(maxlen=self._maxlen)
+                self._pending[topic] = queue
+            self._expire(queue, now)
+            queue.append((msg, now))
+
+    def match(self, topic, msg):
+        """Check whether a received message is the echo of a published one.
+
+        Args:
+            topic (str): The topic name.
+            msg (dict): The received message.
+
+        Returns:
+            float: The time the matched message was published, or None.
+        """
+        queue = self._pending.get(topic)
+        if not queue:
+            return None
+        with self._lock:
+            self._expire(queue, time.time())
+            for i, (sent, sent_at) in enumerate(queue):
+                if echo_of(sent, msg):
+                    for _ in range(i + 1):
+                        queue.popleft()
+                    return sent_at
+        return None
+
+    def _expire(self, queue, now):
+        # Entries are in publish order
+        deadline = now - self._ttl
+        while queue and queue[0][1] < deadline:
+            queue.popleft()
+            self.expired += 1
+
+    def clear(self, topic=None):
+        """Forget outstanding messages of a topic, or of all topics."""
+        with self._lock:
+            if topic is None:
+                self._pending.clear()
+            else:
+                self._pending.pop(topic, None)
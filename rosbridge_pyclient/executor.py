@@ -7,51 +7,134 @@ fo the executor class.
 from __future__ import print_function
 import threading
 import time
-import json
 import uuid
 from ws4py.manager import WebSocketManager
-from pydispatch import dispatcher
 import os
 import binascii
-import hashlib
+import socket
 from ws4py import format_addresses, configure_logger
 from ws4py.client import WebSocketBaseClient
+from ws4py.framing import OPCODE_TEXT, OPCODE_BINARY
 from ws4py.client.threadedclient import WebSocketClient as ThreadedWebSocketClient
-try:
-    from ws4py.client.tornadoclient import TornadoWebSocketClient
-    from tornado.ioloop import IOLoop
-    TORNADO = True
-except ImportError:
-    print("[WARNING]: Install tornado to use the ExecutorTornado class, with tornado backend support.")
-    TORNADO = False
+from .deflate import PerMessageDeflate, FrameInflater
+from .keepalive import Keepalive
+from .latency import LatencyTracer
+from .publisher import Publisher
+from .subscriber import Subscriber
+from .protocol import RosbridgeProtocol, TopicMessage, ServiceResponse, ServiceRequest
+from .registry import Registry
+from .scheduler import PeriodicScheduler
+from .transport import TCPClient
 
 
+logger = configure_logger()
+
 try:
     import wsaccel
     wsaccel.patch_ws4py()
-except ImportError as exc:
-    print("[WARNING]: wsaccel python module was not found. XOR masking optimizations wont apply!")
+except ImportError:
+    logger.debug("wsaccel python module was not found. XOR masking optimizations wont apply!")
 
 
-logger = configure_logger()
+def __getattr__(name):
+    """Import the tornado backend on first use (Python 3.7+)."""
+    if name == 'ExecutorTornado':
+        from .tornado_executor import ExecutorTornado
+        return ExecutorTornado
+    if name == 'TORNADO':
+        try:
+            import tornado  # noqa: F401
+        except ImportError:
+            return False
+        return True
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 def get_public_ip():
-    from urllib2 import urlopen
-    my_ip = urlopen('http://ip.42.pl/raw').read()
-    return my_ip
+    """Ask an external service for the public IP address of this host.
+
+    Not used by `authenticate`, which defaults to `local_source_ip`.
+    """
+    try:
+        from urllib.request import urlopen
+    except ImportError:
+        from urllib2 import urlopen
+    return urlopen('http://ip.42.pl/raw', timeout=5).read().decode('utf-8')
+
+
+def local_source_ip(executor):
+    """Default source address resolver of `ExecutorBase.authenticate`.
+
+    Returns the local address of the executor's socket. Before the socket is
+    connected, when it is bound to the wildcard address, the address the OS
+    would route to rosbridge from is used, which sends no packet and works
+    offline.
+
+    Args:
+        executor (ExecutorBase): The executor.
+
+    Returns:
+        str: The local IP address.
+    """
+    sock = getattr(executor, 'sock', None)
+    if sock is not None:
+        try:
+            address = sock.getsockname()[0]
+        except (socket.error, IndexError):
+            address = None
+        # ws4py creates the socket unbound, before connecting
+        if address not in (None, '0.0.0.0', '::'):
+            return address
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        probe.connect((executor.remote_ip, executor.remote_port))
+        return probe.getsockname()[0]
+    except socket.error:
+        return '127.0.0.1'
+    finally:
+        probe.close()
+
+
+def _encode(payload):
+    if isinstance(payload, bytes):
+        return payload
+    return payload.encode('utf-8')
+
+
+def _manifest_entry(entry, third=None):
+    """Split a register_many manifest entry into (topic, type, options)."""
+    if isinstance(entry, dict):
+        options = dict(entry)
+        topic = options.pop('topic')
+        message_type = options.pop('type', '')
+        return topic, message_type, options
+    topic, message_type = entry[0], entry[1]
+    options = {}
+    if len(entry) > 2 and third is not None:
+        options[third] = entry[2]
+    return topic, message_type, options
 
 
 class ExecutorBase(object):
     """Rosbridge websocket protocol executor mixins.
     Manages connections to the server and all interactions with ROS.
 
-    It keeps a record of all publishers, subscribers, service request
-    callbacks and action clients.
+    The protocol state, i.e. the publishers, subscribers and services, is
+    kept by a transport-free RosbridgeProtocol. The executor sends the
+    frames it builds over the transport of the backend, and handles the
+    events of the received frames. It also keeps a record of the action
+    clients.
     """
     MAX_RECONNECTIONS = 20
-
-    def __init__(self, ip="127.0.0.1", port=9090, onopen=None, onclose=None, onerror=None):
+    # Seconds before the first reconnection attempt, doubled after every
+    # failed attempt up to RECONNECT_MAX_DELAY
+    RECONNECT_DELAY = 0.5
+    RECONNECT_MAX_DELAY = 10.0
+
+    def __init__(self, ip="127.0.0.1", port=9090, onopen=None, onclose=None,
+                 onerror=None, local_delivery=False, cache_last=False,
+                 compression=None, large_frames=None, keepalive=None,
+                 reconnect=False):
         """Executor class constructor.
 
         Warning: there is a know issue regarding resolving localhost
@@ -62,20 +145,62 @@ class ExecutorBase(object):
             Defaults to 'localhost'.
             port (int, optional): Rosbridge instance listening port number.
             Defaults to 9090.
+            local_delivery (bool, optional): Hand messages published through
+            this executor straight to its own subscribers of the same topic,
+            instead of waiting for them to come back from rosbridge.
+            Defaults to False.
+            cache_last (bool, optional): Keep the last message received on
+            each subscribed topic. It is replayed to subscribers joining an
+            existing subscription and returned by `get_last`.
+            Defaults to False.
+            compression (PerMessageDeflate/bool, optional): Offer websocket
+            permessage-deflate compression, with these settings, or the
+            defaults if True. Used by the ws4py executors, if rosbridge
+            accepts it. Defaults to None.
+            large_frames (LargeFrameDecoder/bool, optional): Decode large
+            received frames, e.g. maps and point clouds, with their big
+            arrays as NumPy arrays, with these settings, or the defaults if
+            True. Requires NumPy. Defaults to None.
+            keepalive (Keepalive/bool, optional): Ping rosbridge periodically,
+            measuring the round trip time, and drop the connection when it
+            stops answering, with these settings, or the defaults if True.
+            The connection is then reestablished if `reconnect` is set.
+            Defaults to None.
+            reconnect (bool, optional): Reconnect when the connection is lost,
+            up to MAX_RECONNECTIONS attempts in a row, and restore the
+            registered publishers, subscribers and services. Supported by
+            ExecutorThreaded and ExecutorTCP only, Executor and
+            ExecutorTornado stay disconnected. Defaults to False.
         """
         self._remote_ip = ip
         self._remote_port = port
         self._uri = "ws://{0}:{1}".format(ip, port)
         self._connected = False
-        self._id_counter = 0
-        self._publishers = {}
-        self._publishers_count = {}
-        self._subscribers = {}
-        self._service_clients = {}
-        self._service_servers = {}
-        self._action_clients = {}
+        if large_frames is True:
+            # NumPy is only imported when needed
+            from .largeframe import LargeFrameDecoder
+            large_frames = LargeFrameDecoder()
+        self._protocol = RosbridgeProtocol(
+            local_delivery, cache_last, large_frames or None)
+        self._action_clients = Registry()
+        self._reconnect = reconnect
         self._reconnections = 0
+        self._connections = 0
+        self._closing = False
         self._auth_secret = None
+        self._auth_source_ip = None
+        self._onautherror = None
+        # Reentrant, compressed frames are built and written under it
+        self._write_lock = threading.RLock()
+        self._scheduler = None
+        self._latency = None
+        if compression is True:
+            compression = PerMessageDeflate()
+        self._deflate = compression or None
+        self._inflater = None
+        if keepalive is True:
+            keepalive = Keepalive()
+        self._keepalive = keepalive or None
         self._bind_callbacks(onopen, onclose, onerror)
 
     def _bind_callbacks(self, onopen=None, onclose=None, onerror=None):
@@ -87,20 +212,101 @@ class ExecutorBase(object):
     def remote_uri(self):
         return self._uri
 
+    @property
+    def remote_ip(self):
+        return self._remote_ip
+
+    @property
+    def remote_port(self):
+        return self._remote_port
+
     @property
     def connected(self):
         return self.connected
 
+    @property
+    def protocol(self):
+        """The RosbridgeProtocol of the connection. Getter only property."""
+        return self._protocol
+
+    @property
+    def local_delivery(self):
+        """Whether in-process delivery between local publishers and
+        subscribers is enabled. Getter/Setter property."""
+        return self._protocol.local_delivery
+
+    @local_delivery.setter
+    def local_delivery(self, value):
+        self._protocol.local_delivery = value
+
+    @property
+    def scheduler(self):
+        """The PeriodicScheduler of this executor, created on first use.
+        Getter only property."""
+        if self._scheduler is None:
+            with self._protocol.publishers.lock:
+                if self._scheduler is None:
+                    self._scheduler = PeriodicScheduler(self)
+        return self._scheduler
+
+    @property
+    def latency(self):
+        """The LatencyTracer of this executor, created on first use.
+        Getter only property."""
+        if self._latency is None:
+            with self._protocol.publishers.lock:
+                if self._latency is None:
+                    self._latency = LatencyTracer(self)
+        return self._latency
+
+    @property
+    def compression(self):
+        """The PerMessageDeflate settings and stats of the connection, or
+        None. Getter only property."""
+        return self._deflate
+
+    @property
+    def keepalive(self):
+        """The Keepalive settings of the connection, with the `rtt`
+        histogram of the pings, or None. Getter only property."""
+        return self._keepalive
+
+    def _handshake_headers(self):
+        """Extra headers of the websocket upgrade request."""
+        if self._deflate is None:
+            return None
+        return [('Sec-WebSocket-Extensions', self._deflate.offer())]
+
+    @property
+    def cache_last(self):
+        """Whether the last message of each subscribed topic is kept.
+        Getter only property."""
+        return self._protocol.cache_last
+
+    def get_last(self, topic, default=None):
+        """Return the last message received on a subscribed topic.
+
+        Requires the executor to be created with `cache_last=True`.
+
+        Args:
+            topic (str): The topic name.
+            default (optional): Returned if no message was received yet.
+
+        Returns:
+            dict: The message object, shared with the subscribers.
+        """
+        return self._protocol.last(topic, default)
+
     def gen_id(self):
         """Generate a new ID.
 
-        Current implementation uses an auto-incremental method.
+        Current implementation uses an auto-incremental method,
+        safe to call from several threads.
 
         Returns:
             Incremental ID:
         """
-        self._id_counter += 1
-        return self._id_counter
+        return self._protocol.gen_id()
 
     def gen_uuid(self):
         """Generate a new UUID."""
@@ -112,33 +318,141 @@ class ExecutorBase(object):
         Implements the websocket onopened event handler operation.
         """
         self._connected = True
+        self._closing = False
+        self._reconnections = 0
+        self._connections += 1
         logger.info('Connected to ROSBridge: {0}'.format(self._uri))
+        if self._deflate is not None:
+            if self._deflate.negotiate(getattr(self, 'extensions', None)):
+                self._inflater = FrameInflater(self._deflate)
+                logger.info('Using permessage-deflate compression')
+            else:
+                self._inflater = None
+                logger.info('Rosbridge declined permessage-deflate compression')
+        if self._connections > 1:
+            self._restore_registrations()
+        if self._keepalive is not None:
+            self._start_keepalive()
         if callable(self._onopen):
             self._onopen()
 
+    def _restore_registrations(self):
+        """Authenticate again and restore the registrations after a
+        reconnection, in a single write."""
+        if self._auth_secret is not None:
+            self._send_auth()
+        protocol = self._protocol
+        with protocol.publishers.lock, protocol.subscribers.lock:
+            frames = protocol.registration_frames()
+            logger.info('Restoring {} registrations'.format(len(frames)))
+            self.send_many(frames)
+
+    def _start_keepalive(self):
+        self._keepalive.start(self)
+
     def closed(self, code, reason=None):
         """Called when ROSBridge websocket connection is closed.
 
-        Implements the websocket onclosed event handler operation.
+        Implements the websocket onclosed event handler operation. Pending
+        service calls fail, their callbacks get `success=False`. Lost
+        connections are reestablished in the background if reconnection
+        is enabled, connections closed by `close` are not.
 
         Args:
             code (int): A status code.
             reason (str, opitonal): A human readable message. Defaults to None.
         """
         self._connected = False
+        self._inflater = None
+        if self._keepalive is not None:
+            self._keepalive.stop()
         logger.info('Disconnected from ROSBridge: {}'.format(self._uri))
         logger.info("Reason: {0}, Code: {1}".format(reason, code))
-        logger.info("Closed down {0} - {1}\nTiming out for a bit...".format(
-            code, reason))
-        # self.sock.shutdown(socket.SHUT_RDWR)
-        self.sock.close()
-        self.close()
+        for event in self._protocol.fail_pending('Connection to {} lost'.format(self._uri)):
+            try:
+                self.handle_event(event)
+            except Exception as exc:
+                logger.error("Service callback failed: {}".format(exc))
         if code == 1005:  # Authentication Error
             if self._onautherror is not None:
                 self._onautherror()
-        #  self._reconnections += 1
-        #  if self._reconnections == self.MAX_RECONNECTIONS:
-            #  return
+        if self._reconnect and not self._closing:
+            thread = threading.Thread(
+                target=self._reconnect_loop, args=(threading.current_thread(),),
+                name='{}-reconnect'.format(self.__class__.__name__))
+            thread.daemon = True
+            thread.start()
+        else:
+            # Periodic streams survive reconnections only
+            self._stop_scheduler()
+
+    def close(self, *args, **kwargs):
+        """Close the connection, without reconnecting. Periodic streams
+        are stopped."""
+        self._closing = True
+        self._stop_scheduler()
+        super(ExecutorBase, self).close(*args, **kwargs)
+
+    def _stop_scheduler(self):
+        if self._scheduler is not None:
+            self._scheduler.stop()
+
+    def _reconnect_loop(self, reader):
+        # The reader thread still releases the lost connection after
+        # `closed` returns
+        reader.join(5.0)
+        delay = self.RECONNECT_DELAY
+        while not self._closing:
+            if self._reconnections >= self.MAX_RECONNECTIONS:
+                logger.error('Giving up reconnecting to {0} after {1} attempts'.format(
+                    self._uri, self._reconnections))
+                self._stop_scheduler()
+                return
+            self._reconnections += 1
+            time.sleep(delay)
+            if self._closing:
+                return
+            logger.info('Reconnecting to {0}, attempt {1}'.format(
+                self._uri, self._reconnections))
+            try:
+                self._reset_transport()
+                self.start()
+                return
+            except NotImplementedError:
+                logger.error('{} does not support reconnection'.format(
+                    self.__class__.__name__))
+                self._stop_scheduler()
+                return
+            except Exception as exc:
+                logger.info('Reconnection failed - {}'.format(exc))
+                delay = min(delay * 2, self.RECONNECT_MAX_DELAY)
+
+    def _reset_transport(self):
+        """Prepare the transport for a new connection. Implemented by the
+        backends that support reconnection."""
+        raise NotImplementedError
+
+    def send_ping(self, data):
+        """Send a websocket ping. Called by the Keepalive thread."""
+        self.ping(data)
+
+    def ponged(self, pong):
+        """Called when a websocket pong is received."""
+        if self._keepalive is not None:
+            self._keepalive.ponged(pong.data)
+
+    def abort_connection(self):
+        """Drop the connection without a closing handshake, e.g. when the
+        link is dead. The reader thread then sees the connection closed,
+        with code 1006, and reconnects if enabled.
+        """
+        sock = getattr(self, 'sock', None)
+        if sock is None:
+            return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except (socket.error, OSError):
+            pass
 
     def start(self, onopen=None, onclose=None, onerror=None):
         self._bind_callbacks(onopen, onclose, onerror)
@@ -159,33 +473,84 @@ class ExecutorBase(object):
         Args:
             msg (ws4py.messaging.Message): A message that sent from ROS server.
         """
-        data = json.loads(msg.data)
-        # Handle subscriber event
-        if 'topic' in data:
-            dispatcher.send(data.get('topic'), msg=data.get('msg'))
-        # handle service response
-        if 'service' in data:
-            if data.get('op') == 'service_response':
-                service_id = data.get('id')
-                success = data.get('result')
-                values = data.get('values')
-                if service_id in self._service_clients:
-                    self._service_clients[service_id].callback(success, values)
-                    del self._service_clients[service_id]
-            elif data.get('op') == 'call_service':
-                service_name = data.get('service')
-                service_id = data.get('id')
-                args = data.get('args')
-                if service_name in self._service_servers:
-                    result, values = \
-                        self._service_servers[service_name].run_handler(args)
-                    self.send(json.dumps({
-                        'op': 'service_response',
-                        'service': service_name,
-                        'id': service_id,
-                        'result': result,
-                        'values': values
-                    }))
+        event = self._protocol.receive(msg.data)
+        if event is not None:
+            self.handle_event(event)
+
+    def handle_event(self, event):
+        """Run the callbacks of a protocol event.
+
+        Args:
+            event: A TopicMessage, ServiceResponse or ServiceRequest.
+        """
+        kind = type(event)
+        if kind is TopicMessage:
+            for subscriber in event.subscribers:
+                subscriber.callback(event.msg)
+        elif kind is ServiceResponse:
+            event.client.callback(event.result, event.values)
+        elif kind is ServiceRequest:
+            event.server.dispatch(event.id, event.args)
+
+    def deliver_local(self, topic, msg, remote=True):
+        """Deliver a message published through this executor straight to
+        its local subscribers of the same topic. Called by Publisher when
+        local delivery is enabled.
+
+        Args:
+            topic (str): The topic name.
+            msg (dict): The message object, passed as is, not copied.
+            remote (bool, optional): Whether the message is also published
+                to rosbridge, in which case its echo will be skipped.
+                Defaults to True.
+
+        Returns:
+            bool: True if there were local subscribers.
+        """
+        event = self._protocol.deliver_local(topic, msg, remote)
+        if event is None:
+            return False
+        self.handle_event(event)
+        return True
+
+    def _write(self, b):
+        """Serialize socket writes, as frames may be sent concurrently
+        from user threads and service server workers.
+        """
+        with self._write_lock:
+            super(ExecutorBase, self)._write(b)
+
+    def send(self, payload, binary=False):
+        """Send a frame, compressed if permessage-deflate is in use and
+        its rule selects the payload."""
+        if self._inflater is None or not isinstance(payload, (bytes, type(u''))):
+            return super(ExecutorBase, self).send(payload, binary)
+        self._send_deflate([payload], binary)
+
+    def _send_deflate(self, payloads, binary=False):
+        opcode = OPCODE_BINARY if binary else OPCODE_TEXT
+        mask = self.stream.always_mask
+        deflate = self._deflate
+        with self._write_lock:
+            # Frames are written in the order they are compressed, as they
+            # share the compression context
+            self._write(b''.join(
+                deflate.frame(_encode(payload), opcode, mask) for payload in payloads))
+
+    def process(self, data):
+        """Feed bytes read from the socket to the ws4py stream parser,
+        inflating compressed messages first when permessage-deflate is in use.
+        """
+        if self._keepalive is not None:
+            self._keepalive.touched = True
+        inflater = self._inflater
+        if inflater is None or not data:
+            return super(ExecutorBase, self).process(data)
+        for frame in inflater.feed(data):
+            if not super(ExecutorBase, self).process(frame):
+                return False
+        self.reading_buffer_size = inflater.needed
+        return True
 
     def _data_provider(self, data):
         for i in data:
@@ -201,24 +566,23 @@ class ExecutorBase(object):
 
     def __del__(self):
         """Destructor. Safely release resources."""
-        for publisher in self._publishers:
-            if isinstance(self._publishers[publisher], list):
-                for p in self._publishers[publisher]:
-                    p[publisher].unregister()
-            else:
-                self._publishers[publisher].unregister()
-        for subscriber in self._subscribers:
-            if isinstance(self._subscribers[subscriber], list):
-                for s in self._subscribers[subscriber]:
-                    s[subscriber].unregister()
-            else:
-                self._subscribers[subscriber].unregister()
-        for service_server in self._service_servers:
-            self._service_servers[service_server].unregister()
-        for action_client in self._action_clients:
-            self._action_clients[action_client].unregister()
-        if self._connected:
+        if not self._connected:
+            return
+        try:
+            protocol = self._protocol
+            for publishers in protocol.publishers.values():
+                for p in publishers:
+                    p.unregister()
+            for subscription in protocol.subscribers.values():
+                for s in subscription.subscribers:
+                    s.unregister()
+            for service_server in protocol.service_servers.values():
+                service_server.unregister()
+            for action_client in self._action_clients.values():
+                action_client.unregister()
             self.close()
+        except Exception as exc:
+            logger.debug("Failed to release executor resources: {}".format(exc))
 
     def register_publisher(self, publisher):
         """Registers a new publisher in the context of the current executor.
@@ -226,20 +590,7 @@ class ExecutorBase(object):
         Args:
             publisher (Publisher): The Publisher object.
         """
-        topic = publisher.topic
-        self.send(json.dumps({
-            'op': 'advertise',
-            'id': publisher.advertise_id,
-            'topic': publisher.topic,
-            'type': publisher.message_type,
-            'latch': publisher.latch,
-            'queue_size': publisher.queue_size
-        }))
-        if topic in self._publishers:
-            self._publishers.get(topic).append(publisher)
-        else:
-            logger.info('Advertising topic {} for publishing'.format(topic))
-            self._publishers[topic] = [publisher]
+        self.send(self._protocol.add_publisher(publisher))
 
     def unregister_publisher(self, publisher):
         """Stop advertising on the given topic.
@@ -247,20 +598,7 @@ class ExecutorBase(object):
         Args:
             publisher (Publisher): The Publisher object.
         """
-        topic = publisher.topic
-        self.send(json.dumps({
-            'op': 'unadvertise',
-            'id': publisher.advertise_id,
-            'topic': publisher.topic
-        }))
-        if topic not in self._publishers:
-            return
-        publishers = self._publishers.get(topic)
-        if publisher in publishers:
-            publishers.remove(publisher)
-        if len(publishers) == 0:
-            del publishers[:]
-            del self._publishers[topic]
+        self.send(self._protocol.remove_publisher(publisher))
 
     def register_subscriber(self, subscriber):
         """Registers a new subscriber in the context of the current executor
@@ -268,26 +606,120 @@ class ExecutorBase(object):
         Args:
             subscriber (Subscriber): The subscriber object.
         """
-        topic = subscriber.topic
-        message_type = subscriber.message_type
-        if topic in self._subscribers:
-            self._subscribers.get(topic).get('subscribers').append(subscriber)
-        else:
-            subscribe_id = 'subscribe:{}:{}'.format(topic, self.gen_id())
-            logger.info('Sending request to subscribe to topic {}'.format(
-                topic))
-            msg = json.dumps({
-                'op': 'subscribe',
-                'id': subscribe_id,
-                'topic': topic,
-                'type': message_type
-            })
-            self.send(msg)
-            subscriber.subscribe_id = subscribe_id
-            dispatcher.connect(subscriber.callback, signal=topic)
-            self._subscribers[topic] = {}
-            self._subscribers[topic]['subscribe_id'] = subscribe_id
-            self._subscribers[topic]['subscribers'] = [subscriber]
+        protocol = self._protocol
+        last = protocol.last(subscriber.topic)
+        with protocol.subscribers.lock:
+            frame = protocol.add_subscriber(subscriber)
+            if frame is not None:
+                self.send(frame)
+        self._replay_last(subscriber, last)
+
+    def _replay_last(self, subscriber, last):
+        # Replay the cached message, unless a newer one has been delivered
+        # since the subscriber got connected.
+        if last is not None and self._protocol.last(subscriber.topic) is last:
+            subscriber.callback(last)
+
+    def register_many(self, publish=(), subscribe=()):
+        """Advertise and subscribe to many topics at once.
+
+        All advertise and subscribe requests are sent in a single write,
+        instead of one blocking send per Publisher/Subscriber constructor.
+
+        Args:
+            publish (list): Topics to advertise, each a (topic, message_type)
+                tuple or a dict with `topic`, `type` and optionally `latch`,
+                `queue_size` and `remote`. Topics already advertised by this
+                executor, or repeated, reuse the existing Publisher.
+            subscribe (list): Topics to subscribe to, each a
+                (topic, message_type, clb) tuple or a dict with `topic`,
+                `type` and optionally `clb`, `where` and `projection`. Topics
+                already subscribed to are not subscribed again.
+
+        Returns:
+            tuple: (publishers, subscribers). A dict of topic to Publisher,
+                and a list of Subscriber in the order of `subscribe`.
+        """
+        protocol = self._protocol
+        frames = []
+        publishers = {}
+        subscribers = []
+        lasts = []
+        with protocol.publishers.lock, protocol.subscribers.lock:
+            for entry in publish:
+                topic, message_type, options = _manifest_entry(entry)
+                if topic in publishers:
+                    continue
+                existing = protocol.publishers.get(topic)
+                if existing:
+                    publishers[topic] = existing[0]
+                    continue
+                publisher = Publisher(self, topic, message_type, register=False, **options)
+                frames.append(protocol.add_publisher(publisher, verbose=False))
+                publishers[topic] = publisher
+            for entry in subscribe:
+                topic, message_type, options = _manifest_entry(entry, 'clb')
+                subscriber = Subscriber(self, topic, message_type, register=False, **options)
+                lasts.append(protocol.last(topic))
+                frame = protocol.add_subscriber(subscriber, verbose=False)
+                if frame is not None:
+                    frames.append(frame)
+                subscribers.append(subscriber)
+            logger.info('Registering {0} publishers and {1} subscribers, {2} requests'.format(
+                len(publishers), len(subscribers), len(frames)))
+            self.send_many(frames)
+        for subscriber, last in zip(subscribers, lasts):
+            self._replay_last(subscriber, last)
+        return publishers, subscribers
+
+    def send_many(self, payloads):
+        """Send several text frames in a single socket write.
+
+        Args:
+            payloads (list): The frame payloads, e.g. JSON strings.
+        """
+        if not payloads:
+            return
+        codec = getattr(self, 'codec', None)
+        if codec is not None:
+            # TCP transport
+            self._write(b''.join(codec.encode(payload) for payload in payloads))
+            return
+        stream = getattr(self, 'stream', None)
+        if stream is None:
+            # Not a websocket executor, e.g. in tests
+            for payload in payloads:
+                self.send(payload)
+            return
+        if self._inflater is not None:
+            self._send_deflate(payloads)
+            return
+        mask = stream.always_mask
+        self._write(b''.join(
+            stream.text_message(payload).single(mask=mask) for payload in payloads))
+
+    def record(self, topic, message_type, directory, **kwargs):
+        """Record a topic into columnar .npz chunk files, without a
+        callback subscriber. See `Subscriber.record`.
+
+        Args:
+            topic (str): The topic name.
+            message_type (str): The ROS message type, such as `sensor_msgs/JointState`.
+            directory (str): Output directory.
+            **kwargs: Recorder options, `prefix`, `chunk_size` and `compress`.
+
+        Returns:
+            Recorder: The recorder. Closing it unsubscribes the topic.
+        """
+        from .recorder import Recorder
+        subscriber = Subscriber(self, topic, message_type)
+
+        def on_close(recorder):
+            subscriber.remove_sink(recorder)
+            subscriber.unregister()
+        recorder = Recorder(directory, on_close=on_close, **kwargs)
+        subscriber.add_sink(recorder)
+        return recorder
 
     def unregister_subscriber(self, subscriber):
         """Remove a callback subscriber from its topic subscription list.
@@ -299,24 +731,11 @@ class ExecutorBase(object):
             subscriber (Subscriber): A subscriber with callback function
             that listen to the topic.
         """
-        topic = subscriber.topic
-        if topic not in self._subscribers:
-            return
-        #  subscribe_id = self._subscribers.get(topic).get('subscribe_id')
-        subscribers = self._subscribers.get(topic).get('subscribers')
-        if subscriber in subscribers:
-            dispatcher.disconnect(subscriber.callback, signal=topic)
-            subscribers.remove(subscriber)
-        if len(subscribers) == 0:
-            logger.info('Sending request to unsubscribe topic {}'.format(
-                topic))
-            del subscribers[:]
-            self.send(json.dumps({
-                'op': 'unsubscribe',
-                'id': subscriber.subscribe_id,
-                'topic': topic
-            }))
-            del self._subscribers[topic]
+        protocol = self._protocol
+        with protocol.subscribers.lock:
+            frame = protocol.remove_subscriber(subscriber)
+            if frame is not None:
+                self.send(frame)
 
     def register_service_client(self, svcClient, request):
         """Registers a new ServiceClient object.
@@ -326,37 +745,84 @@ class ExecutorBase(object):
             svcClient (ServiceClient): The ServiceClient object to register.
             request (dict): The request arguments.
         """
-        _id = svcClient.service_id
-        _name = svcClient.name
-        if _id in self._service_clients:
-            logger.info("Service client with id={0} already registered!")
-            return
-        self._service_clients[_id] = svcClient
-        self.send(json.dumps({
-            'op': 'call_service',
-            'id': _id,
-            'service': _name,
-            'args': request
-        }))
+        frame = self._protocol.call_service(svcClient, request)
+        if frame is not None:
+            self.send(frame)
+
+    def unregister_service_client(self, svcClient):
+        """Forget a pending ServiceClient request, e.g. after it timed out.
+        A late response is then ignored.
+
+        Args:
+            svcClient (ServiceClient): The ServiceClient object.
+        """
+        self._protocol.cancel_service_call(svcClient)
+
+    def register_service_server(self, service_server):
+        """Advertise a new ServiceServer. Incoming requests for its
+        service are dispatched to it.
+
+        Args:
+            service_server (ServiceServer): The ServiceServer object.
+        """
+        frame = self._protocol.advertise_service(service_server)
+        if frame is not None:
+            self.send(frame)
+
+    def unregister_service_server(self, service_server):
+        """Stop advertising the service of the given ServiceServer.
+
+        Args:
+            service_server (ServiceServer): The ServiceServer object.
+        """
+        frame = self._protocol.unadvertise_service(service_server)
+        if frame is not None:
+            self.send(frame)
+
+    def send_service_response(self, service_name, service_id, result, values):
+        """Respond to a call_service request of an advertised service.
+
+        Args:
+            service_name (str): The service name.
+            service_id (str): The id of the call_service request.
+            result (bool): Whether the call succeeded.
+            values (dict): The response values.
+        """
+        self.send(self._protocol.service_response(
+            service_name, service_id, result, values))
 
     def register_action_client(self, action_client):
         action_client.id = self.gen_uuid()
         _id = '{}:{}'.format(action_client.server_name,
                              action_client.action_type)
 
-        if _id in self._action_clients:
-            logger.info("Action client with id={0} already registered!")
+        if self._action_clients.add(_id, action_client) is not action_client:
+            logger.info("Action client with id={0} already registered!".format(_id))
         else:
             logger.info("Registered Action Client: {}".format(_id))
-            self._action_clients[_id] = action_client
 
     def unregister_action_client(self, action_client):
         _id = '{}:{}'.format(action_client.server_name,
                              action_client.action_type)
-        if _id in self._action_clients:
-            del self._action_clients[_id]
+        self._action_clients.pop(_id)
 
-    def authenticate(self, secret=None, secret_from_file=None, onerror=None):
+    def authenticate(self, secret=None, secret_from_file=None, onerror=None,
+                     source_ip=local_source_ip):
+        """Send a rosauth authentication request.
+
+        Args:
+            secret (str, optional): The shared secret.
+            secret_from_file (str, optional): Read the secret from the first
+                line of this file instead.
+            onerror (function, optional): Called if authentication fails.
+            source_ip (str/function, optional): The client address sent to
+                rosbridge, or a function taking the executor and returning
+                it. Defaults to `local_source_ip`, the local address of the
+                connection, so that no external service is queried.
+
+        Returns:
+            bool: False if no secret is available.
+        """
         setattr(self, "_onautherror", onerror)
         if secret_from_file is not None:
             if os.path.isfile(secret_from_file):
@@ -366,28 +832,18 @@ class ExecutorBase(object):
             self._auth_secret = secret
         if self._auth_secret is None:
             return False
-        rand_hex = binascii.b2a_hex(os.urandom(15))
-        user_lvl = "admin"
-        dest_ip = self._remote_ip
-        source_ip = get_public_ip()
-        time_start = 0
-        time_stop = 0
-        _str = self._auth_secret + source_ip + dest_ip + rand_hex +\
-            str(time_start) + user_lvl + str(time_stop)
-        _hash = hashlib.sha512(b'{}'.format(_str)).hexdigest()
-        auth_msg = {
-            "op": "auth",
-            "mac": _hash,
-            "client": source_ip,
-            "dest": dest_ip,
-            "rand": rand_hex,
-            "t": 0,
-            "level": user_lvl,
-            "end": 0
-        }
-        self.send(json.dumps(auth_msg))
+        self._auth_source_ip = source_ip
+        self._send_auth()
         return True
 
+    def _send_auth(self):
+        rand_hex = binascii.b2a_hex(os.urandom(15)).decode('ascii')
+        source_ip = self._auth_source_ip
+        if callable(source_ip):
+            source_ip = source_ip(self)
+        self.send(self._protocol.auth(
+            self._auth_secret, source_ip, self._remote_ip, rand_hex))
+
 
 class Executor(ExecutorBase, WebSocketBaseClient):
     """TODO"""
@@ -404,7 +860,7 @@ class Executor(ExecutorBase, WebSocketBaseClient):
             Defaults to 9090.
         """
         ExecutorBase.__init__(self, *args, **kwargs)
-        WebSocketBaseClient.__init__(self, self._uri)
+        WebSocketBaseClient.__init__(self, self._uri, headers=self._handshake_headers())
 
 
 class ExecutorThreaded(ExecutorBase, ThreadedWebSocketClient):
@@ -422,7 +878,7 @@ class ExecutorThreaded(ExecutorBase, ThreadedWebSocketClient):
             Defaults to 9090.
         """
         ExecutorBase.__init__(self, *args, **kwargs)
-        ThreadedWebSocketClient.__init__(self, self._uri)
+        ThreadedWebSocketClient.__init__(self, self._uri, headers=self._handshake_headers())
 
     def start(self):
         """Start executor. Establishes connection to the
@@ -439,54 +895,58 @@ class ExecutorThreaded(ExecutorBase, ThreadedWebSocketClient):
         self.connect()
         self.run_forever()
 
+    def _reset_transport(self):
+        # Relies on ws4py 0.5.x (tested with 0.5.1), where __init__ only
+        # creates a new socket, stream and unstarted thread, and registers
+        # nothing, so that it can run again on a closed client
+        ThreadedWebSocketClient.__init__(self, self._uri, headers=self._handshake_headers())
 
-if TORNADO:
-    class ExecutorTornado(ExecutorBase, TornadoWebSocketClient):
-        """Tornado backend implementation of the Executor class."""
-        def __init__(self, *args, **kwargs):
-            """Constructor.
-
-            Warning: there is a known issue regarding resolving localhost to
-            IPv6 address.
-
-            Args:
-                ip (str, optional): Rosbridge instance IPv4/Host address.
-                Defaults to 'localhost'.
-                port (int, optional): Rosbridge instance listening port number.
-                Defaults to 9090.
-            """
-            ioloop = kwargs.get("ioloop", None)
-            ExecutorBase.__init__(self, *args, **kwargs)
-            TornadoWebSocketClient.__init__(self, self._uri)
-            if ioloop is None:
-                self._ioLoop = IOLoop.current()
-            else:
-                self._ioLoop = ioloop
 
-        @property
-        def IOLoop(self):
-            """Reference to the IOLoop instance. Getter/Setter property."""
-            return self._ioLoop
+class ExecutorTCP(ExecutorBase, TCPClient):
+    """Threaded implementation of the Executor class over a raw TCP
+    connection to rosbridge_tcp, instead of a websocket. rosbridge_tcp
+    must run in JSON mode, the default, BSON is not supported."""
+    def __init__(self, *args, **kwargs):
+        """Constructor.
 
-        @IOLoop.setter
-        def IOLoop(self, ioloop):
-            self._ioLoop = ioloop
+        Args:
+            ip (str, optional): Rosbridge instance IPv4/Host address.
+            Defaults to 'localhost'.
+            port (int, optional): Rosbridge TCP listening port number.
+            Defaults to 9090.
+            codec (JSONStreamCodec/LengthPrefixCodec, optional): The
+            message framing. Defaults to the plain JSON stream of
+            rosbridge_tcp in JSON mode.
+            buffer_size (int, optional): Initial receive buffer size.
+            Defaults to 64 KiB.
+        """
+        codec = kwargs.pop("codec", None)
+        self._buffer_size = kwargs.pop("buffer_size", 65536)
+        if kwargs.get("compression"):
+            raise ValueError("permessage-deflate requires a websocket executor")
+        ExecutorBase.__init__(self, *args, **kwargs)
+        TCPClient.__init__(self, self._remote_ip, self._remote_port, codec, self._buffer_size)
+        self._uri = "tcp://{0}:{1}".format(self._remote_ip, self._remote_port)
 
-        def start(self):
-            """Start executor. Establishes connection to the ROSBridge
-            websocket server
-            """
-            self.connect()
-            if self._ioLoop._running:
-                return
-            logger.info("Starting current IOLoop.")
-            self._ioLoop.start()
+    def start(self):
+        """Start executor. Connects to rosbridge and reads messages on a
+        background thread.
+        """
+        self.connect()
+        self._thread = threading.Thread(target=self.run_forever, name=self.__class__.__name__)
+        self._thread.daemon = True
+        self._thread.start()
 
-        def stop(self):
-            """Stop executor and terminate the IOLoop instance."""
-            self.close()
-            logger.info("Terminating current IOLoop")
-            self._ioLoop.stop()
+    def start_sync(self):
+        self.connect()
+        self.run_forever()
+
+    def _reset_transport(self):
+        TCPClient.__init__(self, self._remote_ip, self._remote_port, self.codec, self._buffer_size)
+
+    def _start_keepalive(self):
+        # rosbridge_tcp has no ping message, see Keepalive
+        self._keepalive.configure_socket(self.sock)
 
 
 class ExecutorManager(WebSocketManager):
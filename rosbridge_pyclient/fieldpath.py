@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+"""Compilation of message field paths and conditions into Python functions.
+
+A field path is a dot separated list of keys, each optionally followed by
+integer indices, e.g. `header.frame_id` or `status[0].level`. Paths are
+validated and turned into a single lambda once, so that evaluating them
+per message costs one function call.
+"""
+
+from __future__ import print_function, absolute_import
+import json
+import re
+
+_STEP = re.compile(r'^(\w+)((?:\[\d*:?\d*\])*)$')
+_INDEX = re.compile(r'\[(\d*)(:?)(\d*)\]')
+
+
+def compile_path(path):
+    """Compile a field path into a Python expression over the message `m`.
+
+    Args:
+        path (str): Dot separated keys, each optionally followed by integer
+            indices, e.g. `pose.position.x` or `ranges[0]`. The path may end
+            with a slice with an explicit end, e.g. `position[0:6]`.
+
+    Returns:
+        tuple: (expression, column names, whether the path ends with a
+            slice). The expression evaluates to a scalar if the path has no
+            slice, else to a sequence.
+    """
+    expr = 'm'
+    names = None
+    for step in path.split('.'):
+        match = _STEP.match(step)
+        if match is None or names is not None:
+            raise ValueError("Invalid field path: {}".format(path))
+        expr += '[{!r}]'.format(match.group(1))
+        for start, colon, stop in _INDEX.findall(match.group(2)):
+            if names is not None:
+                raise ValueError("A slice must end the field path: {}".format(path))
+            if not colon:
+                if not start:
+                    raise ValueError("Invalid field path: {}".format(path))
+                expr += '[{}]'.format(int(start))
+                continue
+            if not stop:
+                raise ValueError("A slice needs an explicit end: {}".format(path))
+            start, stop = int(start or 0), int(stop)
+            if stop <= start:
+                raise ValueError("Empty slice in field path: {}".format(path))
+            expr += '[{}:{}]'.format(start, stop)
+            base = path[:path.rindex('[')]
+            names = ['{}[{}]'.format(base, i) for i in range(start, stop)]
+    if names is None:
+        return expr, [path], False
+    return expr, names, True
+
+
+def compile_fields(fields):
+    """Compile field paths into a single extractor function.
+
+    Args:
+        fields (list): Field paths, see `TimeSeries`.
+
+    Returns:
+        tuple: (function, column names). The function takes a message and
+            returns a flat list of values, one per column.
+    """
+    if not fields:
+        raise ValueError("At least one field path is required")
+    parts = []
+    columns = []
+    scalars = []
+    for path in fields:
+        expr, names, is_slice = compile_path(path)
+        columns.extend(names)
+        if is_slice:
+            if scalars:
+                parts.append('[{}]'.format(', '.join(scalars)))
+                scalars = []
+            parts.append('list({})'.format(expr))
+        else:
+            scalars.append(expr)
+    if scalars:
+        parts.append('[{}]'.format(', '.join(scalars)))
+    # Paths are validated above, keys are quoted with repr()
+    extract = eval('lambda m: ' + ' + '.join(parts), {})
+    return extract, columns
+
+
+def compile_getter(path):
+    """Compile a field path into a function returning the field of a message.
+
+    Args:
+        path (str): The field path, e.g. `status[0].level`.
+
+    Returns:
+        function: Takes a message, raises KeyError/IndexError/TypeError if
+            the field is missing.
+    """
+    return eval('lambda m: ' + compile_path(path)[0], {})
+
+
+def stamp_to_sec(stamp):
+    """Convert a ROS time message, e.g. `header.stamp`, to seconds.
+
+    Args:
+        stamp (dict): A time message with `secs`/`nsecs` (ROS1) or
+            `sec`/`nanosec` (ROS2) fields.
+
+    Returns:
+        float: Time in seconds.
+    """
+    if stamp is None:
+        return 0.0
+    if 'secs' in stamp:
+        return stamp.get('secs', 0) + stamp.get('nsecs', 0) * 1e-9
+    return stamp.get('sec', 0) + stamp.get('nanosec', 0) * 1e-9
+
+
+def compile_predicate(conditions):
+    """Compile message conditions into a predicate.
+
+    Args:
+        conditions (dict/function): Field path to expected value. A list,
+            tuple or set value matches any of its elements. All conditions
+            must hold. A function taking a message is used as is.
+
+    Returns:
+        function: Takes a message and returns True if it matches. Messages
+            missing a field do not match.
+    """
+    if callable(conditions):
+        test = conditions
+    else:
+        if not conditions:
+            raise ValueError("At least one condition is required")
+        values = []
+        terms = []
+        for path, value in sorted(conditions.items()):
+            expr = compile_path(path)[0]
+            op = 'in' if isinstance(value, (list, tuple, set, frozenset)) else '=='
+            if op == 'in':
+                value = frozenset(value)
+            terms.append('{0} {1} _v[{2}]'.format(expr, op, len(values)))
+            values.append(value)
+        test = eval('lambda m: ' + ' and '.join(terms), {'_v': tuple(values)})
+
+    def predicate(msg):
+        try:
+            return bool(test(msg))
+        except (KeyError, IndexError, TypeError):
+            return False
+    return predicate
+
+
+def compile_needles(conditions):
+    """Substrings that the JSON encoding of a message must contain for it
+    to match `conditions`. Lets non-matching messages be skipped before
+    they are decoded.
+
+    Only plain ASCII strings and integers are used, whose JSON encoding is
+    unambiguous.
+
+    Args:
+        conditions (dict/function): See `compile_predicate`.
+
+    Returns:
+        tuple: The needles, possibly empty.
+    """
+    if callable(conditions):
+        return ()
+    needles = []
+    for value in conditions.values():
+        if isinstance(value, bool):
+            continue
+        if isinstance(value, int):
+            needles.append(str(value))
+        elif isinstance(value, str) and value and \
+                all(32 <= ord(c) < 127 and c not in '"\\' for c in value):
+            needles.append(json.dumps(value))
+    return tuple(needles)
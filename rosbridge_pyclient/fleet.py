@@ -0,0 +1,481 @@
+# -*- coding: utf-8 -*-
+
+"""Fleet mode: many executors, one per robot, multiplexed on a single
+epoll-driven poller thread.
+"""
+
+from __future__ import print_function, absolute_import
+import select
+import socket
+import threading
+import time
+import logging
+from collections import namedtuple
+from functools import partial
+
+try:
+    from queue import Queue, Empty
+except ImportError:
+    # Python2 compatibility
+    from Queue import Queue, Empty
+
+from ws4py.manager import WebSocketManager, EPollPoller, SelectPoller
+
+from .executor import ExecutorManager
+from .publisher import Publisher
+from .subscriber import Subscriber
+from .service_client import ServiceClient
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+ServiceResult = namedtuple('ServiceResult',
+                           ['executor', 'success', 'values', 'elapsed', 'timed_out'])
+ServiceResult.__doc__ = """Outcome of one call of a fan-out service request."""
+
+
+def gather_services(calls, timeout=5.0):
+    """Issue many service calls concurrently and return a generator of
+    their results, as they arrive.
+
+    All requests are sent right away, before the first result is awaited,
+    so the total time is close to the slowest response rather than to the
+    sum of all. Waiting blocks on a queue, it does not poll.
+
+    Args:
+        calls (iterable): (executor, service_name, service_type, request)
+            tuples.
+        timeout (float, optional): Seconds each call may take, counted from
+            when it was sent. Defaults to 5.
+
+    Returns:
+        generator: Yields a ServiceResult per call, in arrival order. Calls
+            that do not respond in time are yielded when they expire, with
+            `timed_out` set.
+    """
+    results = Queue()
+    pending = {}
+    sent_at = {}
+    for index, (executor, name, svc_type, request) in enumerate(calls):
+        svc = ServiceClient(executor, name, svc_type)
+        pending[index] = svc
+        sent_at[index] = time.time()
+
+        def _clb(success, values, index=index):
+            results.put((index, success, values, time.time()))
+
+        try:
+            svc.call(request, _clb)
+        except Exception as exc:
+            logger.error("Service call {0} to {1} failed: {2}".format(
+                name, executor.remote_uri, exc))
+            results.put((index, False, str(exc), time.time()))
+    return _collect_services(results, pending, sent_at, timeout)
+
+
+def _collect_services(results, pending, sent_at, timeout):
+    while pending:
+        now = time.time()
+        expired = [i for i in pending if sent_at[i] + timeout <= now]
+        for index in expired:
+            svc = pending.pop(index)
+            svc._executor.unregister_service_client(svc)
+            yield ServiceResult(svc._executor, False, None, now - sent_at[index], True)
+        if not pending:
+            break
+        remaining = min(sent_at[i] for i in pending) + timeout - now
+        try:
+            index, success, values, received_at = results.get(timeout=remaining)
+        except Empty:
+            continue
+        svc = pending.pop(index, None)
+        if svc is None:
+            continue
+        yield ServiceResult(svc._executor, success, values,
+                            received_at - sent_at[index], False)
+
+
+def call_service_all(executors, service_name, service_type, request, timeout=5.0):
+    """Call the same service with the same request on many executors
+    concurrently. See `gather_services`.
+
+    E.g. set a parameter on every robot:
+        call_service_all(executors, '/rosapi/set_param', 'rosapi/SetParam',
+                         {'name': '/max_vel', 'value': '0.5'})
+
+    Args:
+        executors (iterable): The executors, one per robot.
+        service_name (str): The ROS service name.
+        service_type (str): The ROS service type.
+        request (dict): The request arguments.
+        timeout (float, optional): Per robot timeout in seconds. Defaults to 5.
+
+    Returns:
+        generator: Yields a ServiceResult per executor, as results arrive.
+    """
+    return gather_services(
+        ((e, service_name, service_type, request) for e in executors), timeout)
+
+
+class ConnectionHealth(object):
+    """Health record of a single fleet connection."""
+    UP = 'up'
+    STALE = 'stale'
+    DOWN = 'down'
+
+    __slots__ = ('executor', 'state', 'added_at', 'last_rx', 'reads',
+                 'tx_messages', 'errors', 'last_error')
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.state = self.UP
+        self.added_at = time.time()
+        self.last_rx = self.added_at
+        self.reads = 0
+        self.tx_messages = 0
+        self.errors = 0
+        self.last_error = None
+
+    def snapshot(self, stale_after=None):
+        """Returns the health record as a dict.
+
+        Args:
+            stale_after (float, optional): Seconds without incoming data
+                after which an UP connection is reported as STALE.
+        """
+        state = self.state
+        if state == self.UP and stale_after is not None and \
+                time.time() - self.last_rx > stale_after:
+            state = self.STALE
+        return {
+            'uri': self.executor.remote_uri,
+            'state': state,
+            'last_rx': self.last_rx,
+            'reads': self.reads,
+            'tx_messages': self.tx_messages,
+            'errors': self.errors,
+            'last_error': self.last_error
+        }
+
+
+class FleetManager(ExecutorManager):
+    """ExecutorManager for hundreds of robot connections.
+
+    All connections share one epoll poller thread. Unlike the base
+    manager, the poll itself runs without holding the registry lock, so
+    adding connections does not wait for poll timeouts, and the
+    connection map is replaced copy-on-write so the poller never blocks
+    on it.
+
+    Per-connection buffers are bounded: incoming messages larger than
+    `max_message_size` close the connection, kernel socket buffers can
+    be capped, and blocking sends to a stuck peer give up after
+    `send_timeout`.
+    """
+
+    def __init__(self, poll_timeout=0.1, max_message_size=16 * 1024 * 1024,
+                 send_timeout=5.0, stale_after=30.0, rcvbuf=None, sndbuf=None):
+        """FleetManager Constructor.
+
+        Args:
+            poll_timeout (float, optional): Poller timeout in seconds.
+                Defaults to 0.1.
+            max_message_size (int, optional): Max incoming message size in
+                bytes. Defaults to 16MB.
+            send_timeout (float, optional): Max seconds a send may block on
+                a single connection. Defaults to 5.
+            stale_after (float, optional): Seconds without incoming data
+                after which a connection is reported stale. Defaults to 30.
+            rcvbuf (int, optional): SO_RCVBUF size for each connection.
+            sndbuf (int, optional): SO_SNDBUF size for each connection.
+        """
+        if hasattr(select, "epoll"):
+            poller = EPollPoller(poll_timeout)
+        else:
+            poller = SelectPoller(poll_timeout)
+        WebSocketManager.__init__(self, poller=poller)
+        self.name = "FleetManager"
+        self.daemon = True
+        self._max_message_size = max_message_size
+        self._send_timeout = send_timeout
+        self._stale_after = stale_after
+        self._rcvbuf = rcvbuf
+        self._sndbuf = sndbuf
+        # Replaced copy-on-write under the lock, like the connection map
+        self._health = {}
+        # Fleet publishers and subscribers, changed in place under their lock
+        self._endpoint_lock = threading.Lock()
+        self._publishers = {}
+        self._subscribers = {}
+
+    def __contains__(self, ws):
+        if ws.sock is None:
+            return False
+        return self.websockets.get(ws.sock.fileno()) is ws
+
+    @property
+    def executors(self):
+        """List of managed executors. Getter only property"""
+        return list(self.websockets.values())
+
+    def connect_all(self, executors, parallel=32):
+        """Connect many executors concurrently and manage them.
+
+        Args:
+            executors (list): Executor instances, not yet connected.
+            parallel (int, optional): Max concurrent handshakes. Defaults to 32.
+
+        Returns:
+            list: The executors that failed to connect.
+        """
+        pending = list(executors)
+        failed = []
+        lock = threading.Lock()
+
+        def _worker():
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    executor = pending.pop()
+                try:
+                    executor.connect()
+                    self.add(executor)
+                except Exception as exc:
+                    logger.error("Failed to connect to {0}: {1}".format(
+                        executor.remote_uri, exc))
+                    with lock:
+                        failed.append(executor)
+
+        workers = [threading.Thread(target=_worker)
+                   for _ in range(min(parallel, len(pending)))]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        return failed
+
+    def add(self, websocket):
+        """Manage a connected executor."""
+        if websocket in self:
+            return
+        sock = websocket.sock
+        if self._rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self._rcvbuf)
+        if self._sndbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self._sndbuf)
+        if self._send_timeout is not None:
+            sock.settimeout(self._send_timeout)
+        websocket.opened()
+        fd = sock.fileno()
+        with self.lock:
+            websockets = dict(self.websockets)
+            websockets[fd] = websocket
+            self.websockets = websockets
+            health = dict(self._health)
+            health[websocket] = ConnectionHealth(websocket)
+            self._health = health
+            self.poller.register(fd)
+
+    def remove(self, websocket):
+        """Stop managing the given executor, and forget its health record
+        and the fleet publishers and subscribers created on it. Does not
+        close it."""
+        with self.lock:
+            self._drop(websocket)
+            if websocket in self._health:
+                health = dict(self._health)
+                health.pop(websocket, None)
+                self._health = health
+        with self._endpoint_lock:
+            for key in [k for k in self._publishers if k[0] is websocket]:
+                del self._publishers[key]
+            for topic, subs in list(self._subscribers.items()):
+                subs = [sub for sub in subs if sub._executor is not websocket]
+                if subs:
+                    self._subscribers[topic] = subs
+                else:
+                    del self._subscribers[topic]
+
+    def _drop(self, websocket, fd=None):
+        if fd is None:
+            if websocket.sock is None:
+                return
+            fd = websocket.sock.fileno()
+        if self.websockets.get(fd) is not websocket:
+            return
+        websockets = dict(self.websockets)
+        websockets.pop(fd, None)
+        self.websockets = websockets
+        try:
+            self.poller.unregister(fd)
+        except (IOError, OSError, ValueError):
+            pass
+
+    def stop(self):
+        """Mark the manager as terminated and release its resources."""
+        self.running = False
+        with self.lock:
+            self.websockets = {}
+            self.poller.release()
+
+    def run(self):
+        """Poller loop. Reads from every ready connection and updates its
+        health record. Connections that fail, or announce a message
+        larger than `max_message_size`, are closed and marked down.
+        """
+        self.running = True
+        while self.running:
+            polled = list(self.poller.poll())
+            if not self.running:
+                break
+            websockets = self.websockets
+            now = time.time()
+            for fd in polled:
+                ws = websockets.get(fd)
+                if ws is None or ws.terminated:
+                    continue
+                health = self._health.get(ws)
+                try:
+                    ok = ws.once()
+                except Exception as exc:
+                    ok = False
+                    if health is not None:
+                        health.errors += 1
+                        health.last_error = repr(exc)
+                if ok and ws.reading_buffer_size > self._max_message_size:
+                    logger.error("Message from {0} exceeds {1} bytes".format(
+                        ws.remote_uri, self._max_message_size))
+                    try:
+                        ws.close(code=1009, reason='Message too big')
+                    except Exception:
+                        pass
+                    ok = False
+                if ok and health is not None:
+                    health.last_rx = now
+                    health.reads += 1
+                if not ok:
+                    with self.lock:
+                        self._drop(ws, fd)
+                    if health is not None:
+                        health.state = ConnectionHealth.DOWN
+                    if not ws.terminated:
+                        ws.terminate()
+
+    def health(self):
+        """Returns the health record of every connection, as a list of
+        dicts. Connections dropped because they failed stay reported as
+        down, until they are removed with `remove()` or added again.
+        """
+        return [h.snapshot(self._stale_after) for h in self._health.values()]
+
+    def _targets(self, executors):
+        if executors is None:
+            return self.executors
+        return list(executors)
+
+    def _record_tx(self, executor, exc=None):
+        health = self._health.get(executor)
+        if health is None:
+            return
+        if exc is None:
+            health.tx_messages += 1
+        else:
+            health.errors += 1
+            health.last_error = repr(exc)
+
+    def advertise(self, topic, message_type, latch=False, queue_size=1, executors=None):
+        """Advertise a topic on many executors.
+
+        Args:
+            topic (str): The ROS topic name.
+            message_type (str): The ROS message type.
+            latch (bool, optional): Defaults to False.
+            queue_size (int, optional): Defaults to 1.
+            executors (list, optional): Target executors. Defaults to all.
+
+        Returns:
+            list: The Publisher of the topic on each executor.
+        """
+        publishers = []
+        with self._endpoint_lock:
+            for executor in self._targets(executors):
+                key = (executor, topic)
+                if key not in self._publishers:
+                    self._publishers[key] = Publisher(executor, topic, message_type,
+                                                      latch=latch, queue_size=queue_size)
+                publishers.append(self._publishers[key])
+        return publishers
+
+    def publish(self, topic, message_type, message, executors=None):
+        """Publish the same message on many executors, through the fleet
+        Publisher of each one, so its id, sinks and local delivery apply.
+        A failing connection does not stop the others.
+
+        Args:
+            topic (str): The ROS topic name.
+            message_type (str): The ROS message type.
+            message (dict): The message to publish.
+            executors (list, optional): Target executors. Defaults to all.
+
+        Returns:
+            list: The executors the message could not be sent to.
+        """
+        failed = []
+        for publisher in self.advertise(topic, message_type, executors=executors):
+            executor = publisher._executor
+            try:
+                publisher.publish(message)
+            except Exception as exc:
+                failed.append(executor)
+                self._record_tx(executor, exc)
+            else:
+                self._record_tx(executor)
+        return failed
+
+    def subscribe(self, topic, message_type, clb, executors=None):
+        """Subscribe to a topic on many executors.
+
+        Args:
+            topic (str): The ROS topic name.
+            message_type (str): The ROS message type.
+            clb (function): Called as `clb(executor, msg)`.
+            executors (list, optional): Target executors. Defaults to all.
+
+        Returns:
+            list: The created Subscriber objects.
+        """
+        subscribers = []
+        for executor in self._targets(executors):
+            subscribers.append(
+                Subscriber(executor, topic, message_type, partial(clb, executor)))
+        with self._endpoint_lock:
+            self._subscribers.setdefault(topic, []).extend(subscribers)
+        return subscribers
+
+    def call_service(self, service_name, service_type, request, timeout=5.0,
+                     executors=None):
+        """Call a service on many executors concurrently.
+        See `call_service_all`.
+
+        Returns:
+            generator: Yields a ServiceResult per executor, as results arrive.
+        """
+        return call_service_all(self._targets(executors), service_name,
+                                service_type, request, timeout)
+
+    def unsubscribe(self, topic):
+        """Remove all fleet subscriptions of a topic."""
+        with self._endpoint_lock:
+            subscribers = self._subscribers.pop(topic, [])
+        for sub in subscribers:
+            sub.unregister()
+
+    def unadvertise(self, topic):
+        """Remove all fleet publishers of a topic."""
+        with self._endpoint_lock:
+            publishers = [self._publishers.pop(k) for k in list(self._publishers)
+                          if k[1] == topic]
+        for publisher in publishers:
+            publisher.unregister()
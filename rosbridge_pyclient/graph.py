@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+
+"""Cached view of the ROS graph, refreshed incrementally in the background."""
+
+from __future__ import print_function, absolute_import
+import logging
+import threading
+import time
+from collections import namedtuple
+from .service_client import ServiceClient
+
+logger = logging.getLogger(__name__)
+
+GraphSnapshot = namedtuple('GraphSnapshot', [
+    'topics', 'services', 'nodes', 'publishers', 'subscribers', 'stamp'])
+GraphSnapshot.__doc__ = """Immutable state of the ROS graph. `topics` maps
+topic names to their types, `services` service names to the node providing
+them, `nodes` node names to their NodeInfo, and `publishers`/`subscribers`
+topic names to node names. `stamp` is the local time of the refresh."""
+
+NodeInfo = namedtuple('NodeInfo', ['publishing', 'subscribing', 'services'])
+NodeInfo.__doc__ = """Sorted topic and service names of a node, or None if
+its details are not known."""
+
+GraphChange = namedtuple('GraphChange', ['kind', 'name', 'change', 'old', 'new'])
+GraphChange.__doc__ = """A change of the graph: `kind` is 'topic', 'service'
+or 'node', `change` is 'added', 'removed' or 'changed', `old` and `new` the
+values in the topics, services or nodes maps of the snapshots."""
+
+EMPTY_GRAPH = GraphSnapshot({}, {}, {}, {}, {}, None)
+
+
+def diff_graphs(old, new):
+    """Compute the changes between two graph snapshots.
+
+    Returns:
+        list: The GraphChange list, topics first, then services and nodes.
+    """
+    changes = []
+    for kind, before, after in (('topic', old.topics, new.topics),
+                                ('service', old.services, new.services),
+                                ('node', old.nodes, new.nodes)):
+        for name in sorted(set(before) | set(after)):
+            if name not in after:
+                changes.append(GraphChange(kind, name, 'removed', before[name], None))
+            elif name not in before:
+                changes.append(GraphChange(kind, name, 'added', None, after[name]))
+            elif before[name] != after[name]:
+                changes.append(GraphChange(kind, name, 'changed', before[name], after[name]))
+    return changes
+
+
+def _call_all(executor, calls, timeout):
+    """Call services concurrently, all requests being sent before any
+    response is awaited.
+
+    Args:
+        calls (list): (service_name, service_type, request) tuples.
+
+    Returns:
+        list: The response values of each call, in order, None for the
+            calls that failed or timed out.
+    """
+    results = [None] * len(calls)
+    if not calls:
+        return results
+    remaining = [len(calls)]
+    lock = threading.Lock()
+    done = threading.Event()
+    clients = []
+    for index, (name, svc_type, request) in enumerate(calls):
+        def _clb(success, values, index=index):
+            if success:
+                results[index] = values
+            with lock:
+                remaining[0] -= 1
+                if not remaining[0]:
+                    done.set()
+
+        svc = ServiceClient(executor, name, svc_type)
+        clients.append(svc)
+        svc.call(request, _clb)
+    if not done.wait(timeout):
+        for svc in clients:
+            executor.unregister_service_client(svc)
+    return results
+
+
+class GraphWatcher(object):
+    """Keeps a snapshot of the ROS graph of an executor up to date, so
+    that reads are served from memory instead of rosapi round trips.
+
+    Each refresh gets the topics with their types, the nodes and the
+    services concurrently, 3 rosapi calls. Node details, which give the
+    publishers and subscribers of the topics, are then fetched
+    concurrently only for new nodes and nodes whose details could not be
+    fetched yet, or for all nodes when the topics or services changed and
+    every `full_refresh` refreshes.
+
+    The refresh interval drops to `min_interval` when the graph changes,
+    and grows by `backoff` at each refresh without changes, up to
+    `max_interval`. Listeners get the GraphChange of every difference
+    found, from the watcher thread. The first refresh reports the whole
+    graph as added.
+    """
+
+    def __init__(self, executor, min_interval=1.0, max_interval=30.0, backoff=2.0,
+                 timeout=5.0, details=True, full_refresh=10):
+        """Constructor.
+
+        Args:
+            executor (ExecutorBase): A connected executor.
+            min_interval (float, optional): Seconds between refreshes while
+                the graph changes. Defaults to 1.
+            max_interval (float, optional): Max seconds between refreshes
+                of a stable graph. Defaults to 30.
+            backoff (float, optional): Interval growth factor. Defaults to 2.
+            timeout (float, optional): Seconds to wait for the rosapi
+                responses of a refresh. Defaults to 5.
+            details (bool, optional): Fetch node details, needed for
+                `nodes`, `publishers` and `subscribers`. Defaults to True.
+            full_refresh (int, optional): Fetch the details of all nodes
+                every this many refreshes, 0 for only when the topics or
+                services change. Defaults to 10.
+        """
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("Refresh intervals must be positive and ordered")
+        if full_refresh < 0:
+            raise ValueError("full_refresh must not be negative")
+        self._executor = executor
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.details = details
+        self.full_refresh = full_refresh
+        self.interval = min_interval
+        self.refreshes = 0
+        self.calls = 0
+        self._snapshot = EMPTY_GRAPH
+        self._listeners = ()
+        self._ready = threading.Event()
+        self._cond = threading.Condition()
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._wakeup = False
+
+    @property
+    def snapshot(self):
+        """The current GraphSnapshot. Getter only property."""
+        return self._snapshot
+
+    def topics(self):
+        """Returns a dict of topic names to types."""
+        return self._snapshot.topics
+
+    def services(self):
+        """Returns a dict of service names to providing nodes."""
+        return self._snapshot.services
+
+    def nodes(self):
+        """Returns a dict of node names to NodeInfo."""
+        return self._snapshot.nodes
+
+    def topic_type(self, topic):
+        """Returns the type of a topic, or None."""
+        return self._snapshot.topics.get(topic)
+
+    def publishers(self, topic):
+        """Returns the names of the nodes publishing a topic."""
+        return self._snapshot.publishers.get(topic, ())
+
+    def subscribers(self, topic):
+        """Returns the names of the nodes subscribed to a topic."""
+        return self._snapshot.subscribers.get(topic, ())
+
+    def add_listener(self, listener):
+        """Call a function with each GraphChange found by the refreshes."""
+        self._listeners = self._listeners + (listener,)
+
+    def remove_listener(self, listener):
+        self._listeners = tuple(l for l in self._listeners if l is not listener)
+
+    def start(self):
+        """Start refreshing in the background.
+
+        Returns:
+            GraphWatcher: self.
+        """
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='GraphWatcher')
+                self._thread.daemon = True
+                self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop refreshing. The last snapshot stays available."""
+        with self._cond:
+            self._thread = None
+            self._cond.notify_all()
+
+    def wait_ready(self, timeout=None):
+        """Wait for the first successful refresh.
+
+        Returns:
+            bool: False on timeout.
+        """
+        return self._ready.wait(timeout)
+
+    def wakeup(self):
+        """Refresh as soon as possible, e.g. after starting a node, and
+        at the min interval from then on."""
+        with self._cond:
+            self._wakeup = True
+            self.interval = self.min_interval
+            self._cond.notify_all()
+
+    def refresh(self):
+        """Refresh the snapshot now, on the calling thread, which must not
+        be the executor's reader thread.
+
+        Returns:
+            list: The GraphChange list, or None if rosapi did not respond.
+        """
+        with self._refresh_lock:
+            old = self._snapshot
+            new = self._fetch(old)
+            if new is None:
+                return None
+            self.refreshes += 1
+            self._snapshot = new
+            changes = diff_graphs(old, new)
+            self._ready.set()
+        for change in changes:
+            for listener in self._listeners:
+                try:
+                    listener(change)
+                except Exception as exc:
+                    logger.error("Graph listener failed: {}".format(exc))
+        return changes
+
+    def _fetch(self, old):
+        executor, timeout = self._executor, self.timeout
+        calls = [('/rosapi/topics', 'rosapi/Topics', {}),
+                 ('/rosapi/services', 'rosapi/Services', {}),
+                 ('/rosapi/nodes', 'rosapi/Nodes', {})]
+        self.calls += len(calls)
+        topics_resp, services_resp, nodes_resp = _call_all(executor, calls, timeout)
+        if topics_resp is None or services_resp is None or nodes_resp is None:
+            logger.debug("Graph refresh failed, rosapi did not respond")
+            return None
+        names = topics_resp.get('topics') or []
+        types = topics_resp.get('types') or []
+        if len(types) == len(names):
+            topics = dict(zip(names, types))
+        else:
+            # Older rosapi, types are fetched for new topics only
+            topics = dict((name, old.topics.get(name)) for name in names)
+        service_names = services_resp.get('services') or []
+        node_names = nodes_resp.get('nodes') or []
+
+        # Second round: node details and missing topic types
+        nodes = dict((name, old.nodes.get(name, NodeInfo(None, None, None)))
+                     for name in node_names)
+        if self.details:
+            full = (set(topics) != set(old.topics) or set(service_names) != set(old.services)
+                    or (self.full_refresh and self.refreshes % self.full_refresh == 0))
+            stale = [n for n in node_names if full or nodes[n].publishing is None]
+        else:
+            stale = []
+        untyped = [t for t, t_type in topics.items() if t_type is None]
+        calls = ([('/rosapi/node_details', 'rosapi/NodeDetails', {'node': n}) for n in stale] +
+                 [('/rosapi/topic_type', 'rosapi/TopicType', {'topic': t}) for t in untyped])
+        self.calls += len(calls)
+        results = _call_all(executor, calls, timeout)
+        for name, details in zip(stale, results):
+            if details is not None:
+                nodes[name] = NodeInfo(tuple(sorted(details.get('publishing') or ())),
+                                       tuple(sorted(details.get('subscribing') or ())),
+                                       tuple(sorted(details.get('services') or ())))
+        for topic, response in zip(untyped, results[len(stale):]):
+            if response is not None:
+                topics[topic] = response.get('type') or None
+
+        services = dict((name, None) for name in service_names)
+        publishers, subscribers = {}, {}
+        for name in sorted(nodes):
+            info = nodes[name]
+            for topic in info.publishing or ():
+                publishers[topic] = publishers.get(topic, ()) + (name,)
+            for topic in info.subscribing or ():
+                subscribers[topic] = subscribers.get(topic, ()) + (name,)
+            for service in info.services or ():
+                if service in services:
+                    services[service] = name
+        return GraphSnapshot(topics, services, nodes, publishers, subscribers, time.time())
+
+    def _run(self):
+        me = threading.current_thread()
+        while True:
+            try:
+                changes = self.refresh()
+            except Exception as exc:
+                logger.error("Graph refresh failed: {}".format(exc))
+                changes = None
+            with self._cond:
+                if changes:
+                    self.interval = self.min_interval
+                elif changes is not None:
+                    self.interval = min(self.interval * self.backoff, self.max_interval)
+                deadline = time.time() + self.interval
+                while self._thread is me and not self._wakeup:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._wakeup = False
+                if self._thread is not me:
+                    return
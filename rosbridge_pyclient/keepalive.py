@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""Keepalive of an executor connection: websocket ping/pong with round trip
+time measurement, and dead link detection.
+"""
+
+from __future__ import print_function, absolute_import
+import logging
+import socket
+import threading
+from .metrics import Histogram
+from .scheduler import _clock
+
+logger = logging.getLogger(__name__)
+
+
+class Keepalive(object):
+    """Pings rosbridge periodically and tears down the connection when it
+    stops answering.
+
+    A ping is sent every `interval` seconds, and the round trip time of
+    each pong is recorded in the `rtt` histogram. A tick at which the last
+    ping is still unanswered, and nothing else was received since the
+    previous tick, counts as a missed pong. After `max_missed` consecutive
+    misses the link is considered dead and the executor aborts the
+    connection, so that a half-open connection is detected within about
+    `interval * (max_missed + 1)` seconds instead of the TCP timeout. The
+    executor then reconnects, if enabled. Only ExecutorThreaded and
+    ExecutorTCP can reconnect, Executor and ExecutorTornado just report
+    the connection closed.
+
+    rosbridge_tcp has no ping message, so `ExecutorTCP` uses the kernel's
+    TCP keepalive with the same settings instead, see `configure_socket`,
+    and measures no round trip time.
+    """
+
+    def __init__(self, interval=5.0, max_missed=2):
+        """Constructor.
+
+        Args:
+            interval (float, optional): Seconds between pings. Defaults to 5.
+            max_missed (int, optional): Consecutive missed pongs before the
+                link is considered dead. Defaults to 2.
+        """
+        if interval <= 0 or max_missed < 1:
+            raise ValueError("Keepalive interval and max_missed must be positive")
+        self.interval = interval
+        self.max_missed = max_missed
+        self.rtt = Histogram()
+        self.missed = 0
+        self.dead_links = 0
+        # Set by the executor on every socket read
+        self.touched = False
+        self._executor = None
+        self._seq = 0
+        self._sent = {}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self, executor):
+        """Start pinging on a new connection of an executor."""
+        with self._cond:
+            self.stop()
+            self._executor = executor
+            self._sent.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='{}-keepalive'.format(type(executor).__name__))
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """Stop pinging. Called when the connection is closed."""
+        with self._cond:
+            self._executor = None
+            self._thread = None
+            self._cond.notify_all()
+
+    def ponged(self, data):
+        """Record the round trip time of a received pong.
+
+        Args:
+            data (bytes): The pong payload, the sequence number of its ping.
+        """
+        now = _clock()
+        try:
+            seq = int(data)
+        except (TypeError, ValueError):
+            # Unsolicited pong
+            return
+        with self._cond:
+            sent_at = self._sent.pop(seq, None)
+            if sent_at is None:
+                return
+            # Earlier pings are answered by this pong too
+            for earlier in [s for s in self._sent if s < seq]:
+                del self._sent[earlier]
+        self.rtt.record(now - sent_at)
+
+    def configure_socket(self, sock):
+        """Enable the kernel's TCP keepalive on a socket, probing every
+        `interval` seconds and giving up after `max_missed` probes. Also
+        bounds the time sent data may stay unacknowledged, where the
+        platform supports it."""
+        interval = max(1, int(self.interval))
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for option, value in (('TCP_KEEPIDLE', interval),
+                              ('TCP_KEEPINTVL', interval),
+                              ('TCP_KEEPCNT', self.max_missed),
+                              ('TCP_USER_TIMEOUT', interval * (self.max_missed + 1) * 1000)):
+            if hasattr(socket, option):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+    def _run(self):
+        me = threading.current_thread()
+        missed = 0
+        while True:
+            with self._cond:
+                self._cond.wait(self.interval)
+                executor = self._executor
+                if self._thread is not me:
+                    return
+                if self._sent and not self.touched:
+                    missed += 1
+                    self.missed += 1
+                else:
+                    missed = 0
+                self.touched = False
+                if missed >= self.max_missed:
+                    self.dead_links += 1
+                    self._executor = self._thread = None
+                else:
+                    self._seq += 1
+                    self._sent[self._seq] = _clock()
+                    # Pings are never answered through some proxies
+                    self._sent.pop(self._seq - 64, None)
+                    seq = self._seq
+            # Socket calls are made without the lock, so that a blocked
+            # write does not hold up the reader
+            if missed >= self.max_missed:
+                logger.warning('No pong from {0} for {1} pings, dropping the link'.format(
+                    executor.remote_uri, missed))
+                executor.abort_connection()
+                return
+            try:
+                executor.send_ping(str(seq))
+            except Exception as exc:
+                logger.debug('Failed to send ping: {}'.format(exc))
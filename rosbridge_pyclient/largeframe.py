@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+"""Decoding of very large received frames, e.g. maps and point clouds, into
+NumPy arrays.
+
+`json.loads` turns a `nav_msgs/OccupancyGrid` frame into a Python list of
+millions of ints, and a `sensor_msgs/PointCloud2` frame into a huge base64
+string, to be decoded again by the application. `LargeFrameDecoder` instead
+finds the big arrays in the raw frame and parses them chunk by chunk,
+straight into preallocated NumPy arrays. Only the small remainder of the
+message goes through `json.loads`.
+"""
+
+from __future__ import print_function, absolute_import
+import binascii
+import json
+import logging
+import re
+import warnings
+
+import numpy as np
+
+from .protocol import _PUBLISH_BYTES
+
+logger = logging.getLogger(__name__)
+
+try:
+    basestring
+except NameError:
+    # Python3 compatibility
+    basestring = str
+
+# Placeholder of an extracted array in the JSON remainder of a frame
+_PLACEHOLDER = u'\x00ndarray:'
+
+
+class LargeFrameDecoder(object):
+    """Decodes large frames with their big arrays as NumPy arrays.
+
+    A `"key": [numbers]` array of at least `min_array` characters becomes a
+    1-D array. Its dtype is `dtypes[topic][key]` if given, else int64, or
+    float64 if it has decimals. rosbridge encodes `uint8[]` fields such as
+    `PointCloud2.data` in base64, which cannot be told apart from strings,
+    so a `"key": "base64"` string of at least `min_array` characters is
+    decoded into a uint8 array only if `key` is in `base64_fields[topic]`.
+    The topic is read from the header of publish frames, the other frames
+    have no per topic settings.
+
+    Arrays are parsed `chunk_size` bytes at a time, so peak memory stays
+    close to the frame size plus the resulting arrays. Frames that cannot be
+    decoded this way are decoded by `json.loads`.
+    """
+
+    def __init__(self, min_size=1 << 20, min_array=4096, dtypes=None,
+                 base64_fields=None, chunk_size=1 << 20):
+        """Constructor.
+
+        Args:
+            min_size (int, optional): Min frame size in bytes to use this
+                decoder for. Defaults to 1 MiB.
+            min_array (int, optional): Min size in characters of the arrays
+                to extract. Defaults to 4096.
+            dtypes (dict, optional): Topic name to a dict of field name to
+                NumPy dtype of its arrays, e.g.
+                `{'/map': {'data': np.int8}}` for an occupancy grid.
+            base64_fields (dict, optional): Topic name to the names of its
+                base64 encoded `uint8[]` fields, e.g.
+                `{'/points': ('data',)}`. Defaults to none.
+            chunk_size (int, optional): Bytes parsed at a time.
+                Defaults to 1 MiB.
+        """
+        self.min_size = min_size
+        self.min_array = min_array
+        self.dtypes = dict((topic, dict(fields)) for topic, fields in (dtypes or {}).items())
+        self.base64_fields = dict((topic, frozenset(fields))
+                                  for topic, fields in (base64_fields or {}).items())
+        self.chunk_size = max(4, chunk_size // 4 * 4)
+        self.decoded = 0
+        self.fallbacks = 0
+        self._pattern = re.compile(
+            br'"([^"\\]+)":\s*(?:(\[[-0-9.eE+,\s]{%d,}\])|"([A-Za-z0-9+/=]{%d,})")'
+            % (min_array, min_array))
+
+    def loads(self, data):
+        """Decode a frame.
+
+        Args:
+            data (bytes/str): The frame payload.
+
+        Returns:
+            dict: The decoded frame, with NumPy arrays for its big arrays.
+        """
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        header = _PUBLISH_BYTES.match(data)
+        topic = header.group(1).decode('utf-8') if header is not None else None
+        dtypes = self.dtypes.get(topic, {})
+        base64_fields = self.base64_fields.get(topic, ())
+        try:
+            arrays = []
+            pieces = []
+            pos = 0
+            for match in self._pattern.finditer(data):
+                key = match.group(1).decode('utf-8')
+                if match.group(2) is not None:
+                    start, end = match.span(2)
+                    array = self._parse_numbers(data, start + 1, end - 1, key, dtypes.get(key))
+                elif key in base64_fields:
+                    start, end = match.span(3)
+                    array = self._parse_base64(data, start, end, key)
+                    # Replace the quotes too
+                    start, end = start - 1, end + 1
+                else:
+                    continue
+                pieces.append(data[pos:start])
+                pieces.append(json.dumps(_PLACEHOLDER + str(len(arrays))).encode('ascii'))
+                arrays.append(array)
+                pos = end
+            if not arrays:
+                return json.loads(data)
+            pieces.append(data[pos:])
+            skeleton = b''.join(pieces)
+            del pieces
+            msg = json.loads(skeleton)
+            self.decoded += 1
+            return _restore(msg, arrays)
+        except (ValueError, binascii.Error) as exc:
+            logger.debug("Decoding large frame with json: {}".format(exc))
+            self.fallbacks += 1
+            return json.loads(data)
+
+    def _parse_numbers(self, data, start, end, key, dtype=None):
+        """Parse the comma separated numbers of data[start:end]."""
+        if dtype is None:
+            decimal = (data.find(b'.', start, end) >= 0 or data.find(b'e', start, end) >= 0
+                       or data.find(b'E', start, end) >= 0)
+            dtype = np.float64 if decimal else np.int64
+        count = data.count(b',', start, end) + 1
+        out = np.empty(count, dtype)
+        i = 0
+        pos = start
+        with warnings.catch_warnings():
+            # NumPy < 2 only warns about unparsed text, later versions raise
+            warnings.simplefilter('error', DeprecationWarning)
+            while pos < end:
+                cut = pos + self.chunk_size
+                if cut < end:
+                    cut = data.find(b',', cut, end)
+                if cut < 0 or cut > end:
+                    cut = end
+                try:
+                    values = np.fromstring(data[pos:cut], dtype=dtype, sep=',')
+                except DeprecationWarning as exc:
+                    raise ValueError(str(exc))
+                out[i:i + len(values)] = values
+                i += len(values)
+                pos = cut + 1
+        if i != count:
+            raise ValueError("Malformed numeric array of {}".format(key))
+        return out
+
+    def _parse_base64(self, data, start, end, key):
+        """Decode the base64 string data[start:end] into a uint8 array. Use
+        `view()` on it for other element types."""
+        length = end - start
+        if length % 4:
+            raise ValueError("Malformed base64 string of {}".format(key))
+        size = length // 4 * 3 - data.count(b'=', end - 2, end)
+        out = np.empty(size, np.uint8)
+        i = 0
+        for pos in range(start, end, self.chunk_size):
+            decoded = binascii.a2b_base64(data[pos:min(pos + self.chunk_size, end)])
+            out[i:i + len(decoded)] = np.frombuffer(decoded, np.uint8)
+            i += len(decoded)
+        if i != size:
+            raise ValueError("Malformed base64 string of {}".format(key))
+        return out
+
+
+def _restore(obj, arrays):
+    """Put the extracted arrays back in place of their placeholders."""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if isinstance(value, (dict, list)):
+                _restore(value, arrays)
+            elif isinstance(value, basestring) and value.startswith(_PLACEHOLDER):
+                obj[key] = arrays[int(value[len(_PLACEHOLDER):])]
+    elif isinstance(obj, list):
+        for i, value in enumerate(obj):
+            if isinstance(value, (dict, list)):
+                _restore(value, arrays)
+            elif isinstance(value, basestring) and value.startswith(_PLACEHOLDER):
+                obj[i] = arrays[int(value[len(_PLACEHOLDER):])]
+    return obj
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+"""End-to-end latency tracing, and clock offset estimation between the
+client and ROS.
+"""
+
+from __future__ import print_function, absolute_import
+import logging
+import threading
+import time
+from collections import namedtuple
+from .echo import EchoTracker
+from .fieldpath import compile_getter, stamp_to_sec
+from .metrics import Histogram, DEFAULT_BOUNDS
+from .service_client import ServiceClient
+from .subscriber import Subscriber
+
+logger = logging.getLogger(__name__)
+
+ClockOffset = namedtuple('ClockOffset', ['offset', 'delay', 'samples'])
+ClockOffset.__doc__ = """Clock offset estimate: ROS time minus local time,
+the round trip time of the probe it was measured with, and the number of
+successful probes."""
+
+
+def estimate_clock_offset(executor, samples=8, timeout=2.0, service='/rosapi/get_time'):
+    """Estimate the offset of the ROS clock from the local clock, NTP style.
+
+    Each probe calls the rosapi `get_time` service. With t0 and t1 the
+    local times the request was sent and the response received, and T the
+    ROS time of the response, the offset is `T - (t0 + t1) / 2`, within
+    `(t1 - t0) / 2`. The probe with the shortest round trip is kept, as
+    queuing delays are the main source of error.
+
+    Must not be called from the executor's reader thread, e.g. in a
+    subscriber callback, as it waits for the responses.
+
+    Args:
+        executor (ExecutorBase): A connected executor.
+        samples (int, optional): Number of probes. Defaults to 8.
+        timeout (float, optional): Seconds to wait for each response.
+            Defaults to 2.
+        service (str, optional): The get_time service.
+
+    Returns:
+        ClockOffset: The estimate, or None if no probe succeeded.
+    """
+    best = None
+    count = 0
+    for _ in range(samples):
+        done = threading.Event()
+        response = []
+
+        def _clb(success, values):
+            response.append((time.time(), success, values))
+            done.set()
+
+        svc = ServiceClient(executor, service, 'rosapi/GetTime')
+        t0 = time.time()
+        svc.call({}, _clb)
+        if not done.wait(timeout):
+            executor.unregister_service_client(svc)
+            continue
+        t1, success, values = response[0]
+        if not success or not isinstance(values, dict) or not values.get('time'):
+            continue
+        count += 1
+        offset = stamp_to_sec(values['time']) - (t0 + t1) / 2.0
+        if best is None or t1 - t0 < best[1]:
+            best = (offset, t1 - t0)
+    if best is None:
+        return None
+    return ClockOffset(best[0], best[1], count)
+
+
+class LatencyTracer(object):
+    """End-to-end latency of the topics of an executor, in Histograms.
+
+    `age` holds, per topic, the age of the received messages when they
+    are delivered: the local time, corrected by the clock offset with ROS,
+    minus their `header.stamp`. Run `sync_clock` first, unless both clocks
+    are synchronized already.
+
+    `echo` holds, per topic of a local publisher, the time from publishing
+    a message to receiving it back through a subscription to the same
+    topic, i.e. the round trip through rosbridge and ROS. Echoes are
+    matched on the fields the publisher set, ignoring `header.seq`, see
+    `echo_of`, and local delivery must be disabled. `unmatched` counts,
+    per topic, the received messages that matched no published one, e.g.
+    those of other publishers, or echoes altered on the way.
+    """
+
+    def __init__(self, executor, bounds=DEFAULT_BOUNDS):
+        """Constructor.
+
+        Args:
+            executor (ExecutorBase): The executor of the traced topics.
+            bounds (tuple, optional): Histogram bucket bounds, in seconds.
+        """
+        self._executor = executor
+        self._bounds = bounds
+        self.offset = 0.0
+        self.offset_error = None
+        self.age = {}
+        self.echo = {}
+        self.unmatched = {}
+        self._echoes = EchoTracker()
+        self._subscribers = []
+        self._publisher_sinks = []
+
+    def sync_clock(self, samples=8, timeout=2.0, service='/rosapi/get_time'):
+        """Estimate the clock offset with ROS, see `estimate_clock_offset`,
+        and use it for the `age` histograms.
+
+        Returns:
+            ClockOffset: The estimate, or None if ROS did not respond, in
+                which case the previous offset is kept.
+        """
+        estimate = estimate_clock_offset(self._executor, samples, timeout, service)
+        if estimate is None:
+            logger.warning('Clock offset estimation failed, no response from {}'.format(service))
+            return None
+        self.offset = estimate.offset
+        self.offset_error = estimate.delay / 2.0
+        logger.info('Clock offset with ROS: {0:.6f} s (+/- {1:.6f} s)'.format(
+            self.offset, self.offset_error))
+        return estimate
+
+    def now(self):
+        """The current ROS time, estimated from the local clock."""
+        return time.time() + self.offset
+
+    def trace_age(self, topic, message_type, stamp='header.stamp'):
+        """Record the age at delivery of the messages of a topic.
+
+        Args:
+            topic (str): The topic name.
+            message_type (str): The ROS message type.
+            stamp (str, optional): Path of the ROS time field of the messages.
+                Defaults to `header.stamp`.
+
+        Returns:
+            Histogram: The ages, in seconds, also in `age[topic]`.
+        """
+        histogram = self.age.get(topic)
+        if histogram is None:
+            histogram = self.age[topic] = Histogram(self._bounds)
+            subscriber = Subscriber(self._executor, topic, message_type)
+            subscriber.add_sink(_AgeSink(self, histogram, compile_getter(stamp)))
+            self._subscribers.append(subscriber)
+        return histogram
+
+    def trace_echo(self, publisher):
+        """Record the publish to echo latency of the messages of a publisher.
+
+        Args:
+            publisher (Publisher): The publisher.
+
+        Returns:
+            Histogram: The latencies, in seconds, also in `echo[topic]`.
+        """
+        if self._executor.local_delivery:
+            raise ValueError("Echo latency requires local delivery to be disabled")
+        topic = publisher.topic
+        histogram = self.echo.get(topic)
+        if histogram is None:
+            histogram = self.echo[topic] = Histogram(self._bounds)
+            self.unmatched[topic] = 0
+            subscriber = Subscriber(self._executor, topic, publisher.message_type)
+            subscriber.add_sink(_EchoSink(self, topic, histogram))
+            self._subscribers.append(subscriber)
+        sink = _PublishSink(self._echoes, topic)
+        publisher.add_sink(sink)
+        self._publisher_sinks.append((publisher, sink))
+        return histogram
+
+    def close(self):
+        """Stop tracing. The histograms are kept."""
+        for publisher, sink in self._publisher_sinks:
+            publisher.remove_sink(sink)
+        for subscriber in self._subscribers:
+            subscriber.unregister()
+        self._publisher_sinks = []
+        self._subscribers = []
+        self._echoes.clear()
+
+
+class _AgeSink(object):
+    def __init__(self, tracer, histogram, stamp):
+        self._tracer = tracer
+        self._histogram = histogram
+        self._stamp = stamp
+
+    def push(self, msg):
+        try:
+            stamp = stamp_to_sec(self._stamp(msg))
+        except (KeyError, IndexError, TypeError):
+            return
+        if stamp:
+            self._histogram.record(time.time() + self._tracer.offset - stamp)
+
+
+class _PublishSink(object):
+    def __init__(self, echoes, topic):
+        self._echoes = echoes
+        self._topic = topic
+
+    def push(self, msg):
+        self._echoes.expect(self._topic, msg)
+
+
+class _EchoSink(object):
+    def __init__(self, tracer, topic, histogram):
+        self._tracer = tracer
+        self._topic = topic
+        self._histogram = histogram
+
+    def push(self, msg):
+        sent_at = self._tracer._echoes.match(self._topic, msg)
+        if sent_at is not None:
+            self._histogram.record(time.time() - sent_at)
+        else:
+            self._tracer.unmatched[self._topic] += 1
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+"""Lightweight metrics of a connection."""
+
+from __future__ import print_function, absolute_import
+import bisect
+import threading
+
+# Upper bounds in seconds of the default histogram buckets, from 100 us to
+# 10 s, about 4 buckets per decade
+DEFAULT_BOUNDS = tuple(m * 10 ** e for e in range(-4, 1) for m in (1, 2, 3, 5)) + (10.0,)
+
+
+class Histogram(object):
+    """Histogram of durations, e.g. round trip times, in seconds.
+
+    Samples are counted in fixed buckets, so recording is O(log buckets)
+    and memory does not grow with the number of samples. Percentiles are
+    estimated from the buckets.
+    """
+
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        """Constructor.
+
+        Args:
+            bounds (tuple, optional): Sorted upper bounds of the buckets.
+                Larger samples go to an extra overflow bucket.
+        """
+        self.bounds = tuple(bounds)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.buckets = [0] * (len(self.bounds) + 1)
+            self.count = 0
+            self.total = 0.0
+            self.min = None
+            self.max = None
+            self.last = None
+
+    def record(self, value):
+        """Add a sample."""
+        with self._lock:
+            self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+            self.last = value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    @property
+    def mean(self):
+        """Mean of the samples, or None if there are none."""
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def percentile(self, q):
+        """Estimate a percentile of the samples.
+
+        Args:
+            q (float): The percentile, in [0, 100].
+
+        Returns:
+            float: The upper bound of the bucket of the percentile, capped
+                by the max sample, or None if there are no samples.
+        """
+        with self._lock:
+            if not self.count:
+                return None
+            rank = max(1, q / 100.0 * self.count)
+            seen = 0
+            for i, n in enumerate(self.buckets):
+                seen += n
+                if seen >= rank:
+                    break
+            if i == len(self.bounds):
+                return self.max
+            return min(self.bounds[i], self.max)
+
+    def snapshot(self):
+        """Returns a dict of the summary statistics."""
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'min': self.min,
+            'max': self.max,
+            'last': self.last,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+        }
@@ -0,0 +1,492 @@
+# -*- coding: utf-8 -*-
+
+"""Transport-free core of the rosbridge protocol.
+
+`RosbridgeProtocol` keeps the protocol state of a connection: the advertised
+and subscribed topics, the pending service calls and the advertised
+services. It builds the frames of the rosbridge operations and turns the
+received frames into events. It does no I/O. The executors send the
+returned frames over their transport and handle the events, so that the
+protocol logic is shared by all backends and can be run without a socket.
+"""
+
+from __future__ import print_function, absolute_import
+import hashlib
+import json
+import logging
+import re
+from collections import namedtuple
+from .echo import EchoTracker
+from .registry import Registry, Subscription, AtomicCounter
+
+logger = logging.getLogger(__name__)
+
+# Events returned by RosbridgeProtocol.receive
+# A message for the subscribers of a topic
+TopicMessage = namedtuple('TopicMessage', ['topic', 'msg', 'subscribers'])
+# The response to a pending service call
+ServiceResponse = namedtuple('ServiceResponse', ['client', 'result', 'values'])
+# A request for an advertised service
+ServiceRequest = namedtuple('ServiceRequest', ['server', 'id', 'args'])
+
+# Header of the publish frames sent by rosbridge, used to find the topic of
+# a frame without decoding it
+_PUBLISH_TEXT = re.compile(r'^\{"op": "publish", "topic": "([^"]+)"')
+_PUBLISH_BYTES = re.compile(br'^\{"op": "publish", "topic": "([^"]+)"')
+
+
+class RosbridgeProtocol(object):
+    """Protocol state machine of a rosbridge connection.
+
+    Registration methods take the Publisher, Subscriber, ServiceClient and
+    ServiceServer handles, keep them in concurrency-safe registries (see
+    Registry) and return the frame to send, or None if nothing must be sent.
+    `receive` returns the event of a received frame, carrying the handles
+    it is for.
+    """
+
+    def __init__(self, local_delivery=False, cache_last=False, large_frames=None):
+        """Constructor.
+
+        Args:
+            local_delivery (bool, optional): Expect the echo of messages
+                delivered in-process, see `deliver_local`. Defaults to False.
+            cache_last (bool, optional): Keep the last message received on
+                each subscribed topic. Defaults to False.
+            large_frames (LargeFrameDecoder, optional): Decoder of the
+                frames of at least `large_frames.min_size` bytes.
+        """
+        self._ids = AtomicCounter()
+        # Registries are read without locking by the reader thread, see
+        # Registry. Pending service calls are only added and popped, which
+        # is atomic on a plain dict.
+        self.publishers = Registry()
+        self.subscribers = Registry()
+        self.service_clients = {}
+        self.service_servers = Registry()
+        self._local_delivery = local_delivery
+        self._echoes = EchoTracker()
+        self._cache_last = cache_last
+        self._last = {}
+        # Whether some subscription can be prefiltered, see _skip_unmatched
+        self._prefilter = False
+        # (secret, source, dest) and the hash state of that MAC prefix
+        self._auth_prefix = None
+        self._large_frames = large_frames
+
+    @property
+    def local_delivery(self):
+        """Whether messages are delivered in-process and their echo
+        skipped. Getter/Setter property."""
+        return self._local_delivery
+
+    @local_delivery.setter
+    def local_delivery(self, value):
+        self._local_delivery = value
+        if not value:
+            self._echoes.clear()
+
+    @property
+    def cache_last(self):
+        """Whether the last message of each subscribed topic is kept.
+        Getter only property."""
+        return self._cache_last
+
+    def last(self, topic, default=None):
+        """Returns the last message received on a subscribed topic."""
+        return self._last.get(topic, default)
+
+    def gen_id(self):
+        """Returns a new incremental ID, safe to call from several threads."""
+        return next(self._ids)
+
+    # Topics
+
+    def add_publisher(self, publisher, verbose=True):
+        """Add a publisher to the registry.
+
+        Returns:
+            str: The advertise frame to send.
+        """
+        topic = publisher.topic
+        with self.publishers.lock:
+            publishers = self.publishers.get(topic)
+            if publishers is None:
+                if verbose:
+                    logger.info('Advertising topic {} for publishing'.format(topic))
+                publishers = ()
+            self.publishers.set(topic, publishers + (publisher,))
+        return _advertise_frame(publisher)
+
+    def remove_publisher(self, publisher):
+        """Remove a publisher from the registry.
+
+        Returns:
+            str: The unadvertise frame to send.
+        """
+        topic = publisher.topic
+        with self.publishers.lock:
+            publishers = self.publishers.get(topic)
+            if publishers is not None:
+                publishers = tuple(p for p in publishers if p is not publisher)
+                if publishers:
+                    self.publishers.set(topic, publishers)
+                else:
+                    self.publishers.pop(topic)
+        return json.dumps({
+            'op': 'unadvertise',
+            'id': publisher.advertise_id,
+            'topic': topic
+        })
+
+    def publish(self, topic, msg, publish_id):
+        """Returns the publish frame of a message.
+
+        Args:
+            topic (str): The topic name.
+            msg (dict): The message.
+            publish_id: The publisher's ID.
+        """
+        return json.dumps({
+            'op': 'publish',
+            'id': 'publish:{0}:{1}'.format(topic, publish_id),
+            'topic': topic,
+            'msg': msg
+        })
+
+    def add_subscriber(self, subscriber, verbose=True):
+        """Add a subscriber to the registry. Callers sending the frame
+        hold the `subscribers` registry lock until it is sent, so that
+        subscribe and unsubscribe requests go out in order.
+
+        Returns:
+            str: The subscribe frame to send, or None if the topic is
+                already subscribed.
+        """
+        topic = subscriber.topic
+        frame = None
+        with self.subscribers.lock:
+            subscription = self.subscribers.get(topic)
+            if subscription is not None:
+                subscribe_id = subscription.subscribe_id
+                subscribers = subscription.subscribers + (subscriber,)
+            else:
+                subscribe_id = 'subscribe:{}:{}'.format(topic, self.gen_id())
+                if verbose:
+                    logger.info('Sending request to subscribe to topic {}'.format(
+                        topic))
+                frame = _subscribe_frame(topic, subscribe_id, subscriber.message_type)
+                subscribers = (subscriber,)
+            subscriber.subscribe_id = subscribe_id
+            self._set_subscription(topic, subscribe_id, subscribers)
+        return frame
+
+    def remove_subscriber(self, subscriber):
+        """Remove a subscriber from the registry. See `add_subscriber`
+        about locking.
+
+        Returns:
+            str: The unsubscribe frame to send, or None if the topic has
+                other subscribers left.
+        """
+        topic = subscriber.topic
+        with self.subscribers.lock:
+            subscription = self.subscribers.get(topic)
+            if subscription is None:
+                return None
+            subscribers = tuple(
+                s for s in subscription.subscribers if s is not subscriber)
+            if subscribers:
+                if len(subscribers) < len(subscription.subscribers):
+                    self._set_subscription(
+                        topic, subscription.subscribe_id, subscribers)
+                return None
+            logger.info('Sending request to unsubscribe topic {}'.format(
+                topic))
+            self.subscribers.pop(topic)
+            self._last.pop(topic, None)
+            self._prefilter = any(
+                s.needles is not None for s in self.subscribers.values())
+        return json.dumps({
+            'op': 'unsubscribe',
+            'id': subscription.subscribe_id,
+            'topic': topic
+        })
+
+    def _set_subscription(self, topic, subscribe_id, subscribers):
+        """Swap in the subscription of a topic. Called with the subscribers
+        registry lock held."""
+        needles = None
+        if all(s.needles for s in subscribers):
+            needles = [(s.needles, tuple(n.encode('utf-8') for n in s.needles))
+                       for s in subscribers]
+        self.subscribers.set(topic, Subscription(subscribe_id, subscribers, needles))
+        self._prefilter = any(
+            s.needles is not None for s in self.subscribers.values())
+
+    def registration_frames(self):
+        """Returns the frames that restore the advertised topics, the
+        subscriptions and the advertised services on a new connection to
+        rosbridge. Callers hold the `publishers` and `subscribers` registry
+        locks until they are sent. Pending service calls are not sent again,
+        as their services may not be idempotent.
+
+        Returns:
+            list: The advertise, subscribe and advertise_service frames.
+        """
+        frames = [_advertise_frame(publisher)
+                  for publishers in self.publishers.values()
+                  for publisher in publishers]
+        frames.extend(
+            _subscribe_frame(topic, subscription.subscribe_id,
+                             subscription.subscribers[0].message_type)
+            for topic, subscription in self.subscribers.items())
+        frames.extend(_advertise_service_frame(server)
+                      for server in self.service_servers.values())
+        return frames
+
+    # Services
+
+    def call_service(self, client, args):
+        """Register a pending service call.
+
+        Returns:
+            str: The call_service frame to send, or None if a call with
+                the same ID is pending.
+        """
+        _id = client.service_id
+        if self.service_clients.setdefault(_id, client) is not client:
+            logger.info("Service client with id={0} already registered!".format(_id))
+            return None
+        return json.dumps({
+            'op': 'call_service',
+            'id': _id,
+            'service': client.name,
+            'args': args
+        })
+
+    def cancel_service_call(self, client):
+        """Forget a pending service call. A late response is then ignored."""
+        self.service_clients.pop(client.service_id, None)
+
+    def fail_pending(self, reason):
+        """Fail all pending service calls, e.g. when the connection is
+        lost, as their responses will never arrive.
+
+        Args:
+            reason (str): The error message passed to the callbacks.
+
+        Returns:
+            list: A failed ServiceResponse event per pending call.
+        """
+        events = []
+        clients = self.service_clients
+        while clients:
+            try:
+                _, client = clients.popitem()
+            except KeyError:
+                break
+            events.append(ServiceResponse(client, False, reason))
+        return events
+
+    def advertise_service(self, server):
+        """Register a service server.
+
+        Returns:
+            str: The advertise_service frame to send, or None if the
+                service is already advertised.
+        """
+        _name = server.name
+        if self.service_servers.add(_name, server) is not server:
+            logger.info("Service server for {0} already registered!".format(_name))
+            return None
+        logger.info('Advertising service {}'.format(_name))
+        return _advertise_service_frame(server)
+
+    def unadvertise_service(self, server):
+        """Unregister a service server.
+
+        Returns:
+            str: The unadvertise_service frame to send, or None if the
+                server is not the one advertising its service.
+        """
+        _name = server.name
+        with self.service_servers.lock:
+            if self.service_servers.get(_name) is not server:
+                return None
+            self.service_servers.pop(_name)
+        return json.dumps({
+            'op': 'unadvertise_service',
+            'service': _name
+        })
+
+    def service_response(self, service, service_id, result, values):
+        """Returns the service_response frame of an advertised service."""
+        return json.dumps({
+            'op': 'service_response',
+            'service': service,
+            'id': service_id,
+            'result': result,
+            'values': values
+        })
+
+    def auth(self, secret, source_ip, dest_ip, rand, level='admin', t=0, end=0):
+        """Returns the rosauth frame.
+
+        The MAC prefix only changes with the secret and the addresses, its
+        hash state is reused across authentications.
+        """
+        key = (secret, source_ip, dest_ip)
+        if self._auth_prefix is None or self._auth_prefix[0] != key:
+            prefix = (secret + source_ip + dest_ip).encode('utf-8')
+            self._auth_prefix = (key, hashlib.sha512(prefix))
+        mac = self._auth_prefix[1].copy()
+        mac.update((rand + str(t) + level + str(end)).encode('utf-8'))
+        return json.dumps({
+            "op": "auth",
+            "mac": mac.hexdigest(),
+            "client": source_ip,
+            "dest": dest_ip,
+            "rand": rand,
+            "t": t,
+            "level": level,
+            "end": end
+        })
+
+    # Received frames
+
+    def receive(self, data):
+        """Process a received frame.
+
+        Args:
+            data (str/bytes): The frame payload.
+
+        Returns:
+            The TopicMessage, ServiceResponse or ServiceRequest event, or
+            None if there is nothing to handle.
+        """
+        if self._prefilter and not self._cache_last and self._skip_unmatched(data):
+            return None
+        large_frames = self._large_frames
+        if large_frames is not None and len(data) >= large_frames.min_size \
+                and not self._expects_echo(data):
+            data = large_frames.loads(data)
+        else:
+            data = json.loads(data)
+        op = data.get('op')
+        if op == 'publish':
+            topic = data.get('topic')
+            msg = data.get('msg')
+            # Skip the echo of messages already delivered in-process
+            if topic in self._echoes and self._echoes.match(topic, msg) is not None:
+                return None
+            return self._topic_message(topic, msg)
+        if op == 'service_response':
+            client = self.service_clients.pop(data.get('id'), None)
+            if client is not None:
+                return ServiceResponse(client, data.get('result'), data.get('values'))
+        elif op == 'call_service':
+            server = self.service_servers.get(data.get('service'))
+            if server is not None:
+                return ServiceRequest(server, data.get('id'), data.get('args'))
+        return None
+
+    def receive_many(self, frames):
+        """Process received frames in a batch.
+
+        Returns:
+            list: The events, in order.
+        """
+        receive = self.receive
+        events = []
+        for data in frames:
+            event = receive(data)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def deliver_local(self, topic, msg, remote=True):
+        """Route a message published through this connection to its own
+        subscribers of the same topic.
+
+        Args:
+            topic (str): The topic name.
+            msg (dict): The message object, passed as is, not copied.
+            remote (bool, optional): Whether the message is also published
+                to rosbridge, in which case its echo will be skipped.
+                Defaults to True.
+
+        Returns:
+            TopicMessage: The event, or None if there are no subscribers.
+        """
+        if topic not in self.subscribers:
+            return None
+        if remote:
+            self._echoes.expect(topic, msg)
+        return self._topic_message(topic, msg)
+
+    def _topic_message(self, topic, msg):
+        if self._cache_last:
+            self._last[topic] = msg
+        # Subscriptions are immutable, and swapped in as a whole on changes
+        subscription = self.subscribers.get(topic)
+        if subscription is None:
+            return None
+        return TopicMessage(topic, msg, subscription.subscribers)
+
+    def _expects_echo(self, raw):
+        """Whether a raw frame may be the echo of a message delivered
+        in-process, which is matched against the decoded JSON message."""
+        if not self._local_delivery:
+            return False
+        binary = isinstance(raw, bytes)
+        match = (_PUBLISH_BYTES if binary else _PUBLISH_TEXT).match(raw)
+        if match is None:
+            return False
+        topic = match.group(1)
+        return (topic.decode('utf-8') if binary else topic) in self._echoes
+
+    def _skip_unmatched(self, raw):
+        """Whether a raw publish frame can be dropped before decoding, because
+        it lacks the needles of every filtering subscriber of its topic."""
+        binary = isinstance(raw, bytes)
+        match = (_PUBLISH_BYTES if binary else _PUBLISH_TEXT).match(raw)
+        if match is None:
+            return False
+        topic = match.group(1)
+        subscription = self.subscribers.get(topic.decode('utf-8') if binary else topic)
+        if subscription is None or subscription.needles is None:
+            return False
+        needles = subscription.needles
+        for text, encoded in needles:
+            if all(n in raw for n in (encoded if binary else text)):
+                return False
+        return True
+
+
+def _advertise_frame(publisher):
+    return json.dumps({
+        'op': 'advertise',
+        'id': publisher.advertise_id,
+        'topic': publisher.topic,
+        'type': publisher.message_type,
+        'latch': publisher.latch,
+        'queue_size': publisher.queue_size
+    })
+
+
+def _subscribe_frame(topic, subscribe_id, message_type):
+    return json.dumps({
+        'op': 'subscribe',
+        'id': subscribe_id,
+        'topic': topic,
+        'type': message_type
+    })
+
+
+def _advertise_service_frame(server):
+    return json.dumps({
+        'op': 'advertise_service',
+        'type': server.type,
+        'service': server.name
+    })
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import print_function
-import json
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -9,7 +8,8 @@ logger = logging.getLogger(__name__)
 
 
 class Publisher(object):
-    def __init__(self, executor, topic_name, message_type, latch=False, queue_size=1):
+    def __init__(self, executor, topic_name, message_type, latch=False, queue_size=1, remote=True,
+                 register=True):
         """Constructor.
 
         Args:
@@ -18,6 +18,12 @@ class Publisher(object):
             message_type (str): The ROS message type, such as `std_msgs/String`.
             latch (bool, optional): Whether the topic is latched when publishing. Defaults to False.
             queue_size (int): The queue created at bridge side for re-publishing. Defaults to 1.
+            remote (bool, optional): Whether messages are sent to rosbridge. With local
+                delivery enabled on the executor and no subscribers outside this process,
+                set to False to skip rosbridge entirely. Defaults to True.
+            register (bool, optional): Advertise the topic at once. Set to False
+                when registering many publishers with `executor.register_many`.
+                Defaults to True.
         """
         self._id = executor.gen_id()
         self._advertise_id = 'advertise:{}:{}'.format(topic_name, self._id)
@@ -26,7 +32,10 @@ class Publisher(object):
         self._message_type = message_type
         self._latch = latch
         self._queue_size = queue_size
-        self._register()
+        self._remote = remote
+        self._sinks = ()
+        if register:
+            self._register()
 
     @property
     def id(self):
@@ -58,19 +67,70 @@ class Publisher(object):
         """Getter only property. Returns publishing topic name."""
         return self._topic_name
 
+    @property
+    def remote(self):
+        """Whether messages are sent to rosbridge. Getter only property"""
+        return self._remote
+
     def publish(self, message):
         """Publish a ROS message
 
         Args:
             message (dict): A message to send.
         """
+        frame = self._prepare(message)
+        if frame is not None:
+            self._executor.send(frame)
+
+    def _prepare(self, message):
+        """Deliver a message locally if enabled, and build its publish frame.
+
+        Returns:
+            str: The frame to send, or None if not published remotely.
+        """
         logger.info("Publishing to topic [{0}]: {1}".format(self._topic_name, message))
-        self._executor.send(json.dumps({
-            'op': 'publish',
-            'id': 'publish:{0}:{1}'.format(self._topic_name, self._id),
-            'topic': self._topic_name,
-            'msg': message
-        }))
+        if self._executor.local_delivery:
+            self._executor.deliver_local(self._topic_name, message, self._remote)
+        if not self._remote:
+            return None
+        for sink in self._sinks:
+            sink.push(message)
+        return self._executor.protocol.publish(self._topic_name, message, self._id)
+
+    def add_sink(self, sink):
+        """Feed the messages published to rosbridge to a sink, e.g. a
+        latency tracer.
+
+        Args:
+            sink: Any object with a `push(msg)` method. It is called from
+                the publishing thread, before the message is sent.
+        """
+        # Copy on write, as for Subscriber sinks
+        self._sinks = self._sinks + (sink,)
+
+    def remove_sink(self, sink):
+        """Stop feeding published messages to a sink."""
+        self._sinks = tuple(s for s in self._sinks if s is not sink)
+
+    def publish_periodic(self, rate, provider, phase=0.0):
+        """Publish messages at a fixed rate, from the executor's scheduler
+        thread, instead of a `publish(); time.sleep()` loop.
+
+        Ticks are aligned to absolute deadlines, so the rate does not drift,
+        and the streams of an executor due at the same tick are sent in one
+        write burst.
+
+        Args:
+            rate (float): Publishing rate in Hz.
+            provider (function): Called at each tick, returns the message to
+                publish, or None to skip the tick.
+            phase (float, optional): Offset of the ticks on the shared rate
+                grid, in seconds. Defaults to 0.
+
+        Returns:
+            PeriodicTask: The task, call `cancel()` to stop it.
+        """
+        return self._executor.scheduler.add(self, rate, provider, phase)
 
     def unregister(self):
         """Reduce the usage of the publisher. If the usage is 0, unadvertise this topic."""
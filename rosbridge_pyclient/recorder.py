@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+
+"""Columnar recording of subscribed messages into chunked .npz files."""
+
+from __future__ import print_function, absolute_import
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import zipfile
+
+import numpy as np
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+logger = logging.getLogger(__name__)
+
+try:
+    basestring
+except NameError:
+    # Python3 compatibility
+    basestring = str
+
+TIME_COLUMN = '__time__'
+# Suffixes of the two arrays that store a variable length array column
+VALUES = '@values'
+OFFSETS = '@offsets'
+
+
+def flatten(msg, prefix='', out=None):
+    """Flatten a message into a dict of dotted field names to values.
+
+    Nested messages are expanded. Arrays of numbers are kept as lists,
+    arrays of messages are serialized to JSON strings. Empty arrays are
+    kept as lists, and encoded as JSON too by `_column` when other rows
+    hold JSON strings.
+
+    Args:
+        msg (dict): The message object.
+        prefix (str, optional): Prefix of the field names.
+
+    Returns:
+        dict: Field name to value.
+    """
+    if out is None:
+        out = {}
+    for key, value in msg.items():
+        name = prefix + key
+        if isinstance(value, dict):
+            flatten(value, name + '.', out)
+        elif isinstance(value, list) and value and isinstance(value[0], (dict, list)):
+            out[name] = json.dumps(value)
+        else:
+            out[name] = value
+    return out
+
+
+def _column(values):
+    """Convert the values of a field over a chunk into arrays.
+
+    Returns:
+        dict: Suffix ('' or VALUES/OFFSETS) to array.
+    """
+    sample = next((v for v in values if v is not None), None)
+    if isinstance(sample, list) and any(isinstance(v, basestring) for v in values):
+        # Arrays of messages are JSON strings, except the empty ones that
+        # flatten can not tell from empty arrays of numbers
+        sample = ''
+        values = [json.dumps(v) if isinstance(v, list) else v for v in values]
+    if isinstance(sample, list):
+        lengths = [len(v) if v is not None else 0 for v in values]
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        flat = [x for v in values if v is not None for x in v]
+        data = np.asarray(flat) if flat else np.zeros(0)
+        if data.dtype == object:
+            return {'': np.asarray([json.dumps(v) for v in values])}
+        return {VALUES: data, OFFSETS: offsets}
+    if isinstance(sample, basestring):
+        return {'': np.asarray([v if isinstance(v, basestring) else
+                                json.dumps(v) if v is not None else '' for v in values])}
+    if any(v is None for v in values):
+        return {'': np.asarray([v if v is not None else np.nan for v in values],
+                               dtype=np.float64)}
+    data = np.asarray(values)
+    if data.dtype == object:
+        return {'': np.asarray([json.dumps(v) for v in values])}
+    return {'': data}
+
+
+def to_columns(times, messages):
+    """Convert a chunk of messages into named column arrays.
+
+    Args:
+        times (list): Reception time of every message.
+        messages (list): The message objects, of a single type.
+
+    Returns:
+        dict: Array name to array, ready for `numpy.savez`.
+    """
+    rows = [flatten(m) for m in messages]
+    names = []
+    seen = set()
+    for row in rows:
+        for name in row:
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+    arrays = {TIME_COLUMN: np.asarray(times, dtype=np.float64)}
+    for name in names:
+        for suffix, data in _column([row.get(name) for row in rows]).items():
+            arrays[name + suffix] = data
+    return arrays
+
+
+class Recorder(object):
+    """Subscriber sink that records messages into columnar chunk files.
+
+    Received messages are buffered as is, together with their reception
+    time. Every `chunk_size` messages, the chunk is handed to a background
+    thread, which flattens the messages into columns and writes them as
+    `<directory>/<prefix>-<index>.npz`. Use `load` to read a recording.
+
+    Buffered messages must not be modified by other subscribers.
+    """
+
+    def __init__(self, directory, prefix='chunk', chunk_size=10000,
+                 compress=True, on_close=None):
+        """Constructor.
+
+        Args:
+            directory (str): Output directory, created if missing.
+            prefix (str, optional): Chunk file name prefix. Defaults to 'chunk'.
+            chunk_size (int, optional): Messages per chunk. Defaults to 10000.
+            compress (bool, optional): Write compressed chunks.
+                Defaults to True.
+            on_close (function, optional): Called with the recorder once,
+                when it is closed.
+        """
+        if chunk_size < 1:
+            raise ValueError("Recorder chunk_size must be positive")
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._directory = directory
+        self._prefix = prefix
+        self._chunk_size = chunk_size
+        self._save = np.savez_compressed if compress else np.savez
+        self._on_close = on_close
+        self._lock = threading.Lock()
+        self._times = []
+        self._messages = []
+        # Continue after the chunks of a previous recording
+        self._index = len([c for c in glob.glob(self._chunk_path('[0-9]*'))
+                           if not c.endswith('.tmp.npz')])
+        self._recorded = 0
+        self._closed = False
+        self._queue = Queue()
+        self._writer = threading.Thread(target=self._write_chunks)
+        self._writer.daemon = True
+        self._writer.start()
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def recorded(self):
+        """Number of messages recorded so far."""
+        return self._recorded
+
+    def _chunk_path(self, index):
+        if isinstance(index, int):
+            index = '{:06d}'.format(index)
+        return os.path.join(self._directory, '{}-{}.npz'.format(self._prefix, index))
+
+    def push(self, msg):
+        """Buffer a message. Called by the Subscriber on every message."""
+        with self._lock:
+            if self._closed:
+                return
+            self._times.append(time.time())
+            self._messages.append(msg)
+            self._recorded += 1
+            if len(self._messages) >= self._chunk_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._messages:
+            return
+        self._queue.put((self._index, self._times, self._messages))
+        self._index += 1
+        self._times = []
+        self._messages = []
+
+    def flush(self):
+        """Hand the buffered messages to the writer as a, possibly short,
+        chunk."""
+        with self._lock:
+            self._flush()
+
+    def close(self, timeout=None):
+        """Write the buffered messages and wait for the writer to finish.
+
+        Args:
+            timeout (float, optional): Max seconds to wait for the writer.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._flush()
+            self._queue.put(None)
+        self._writer.join(timeout)
+        if self._on_close is not None:
+            self._on_close(self)
+
+    def _write_chunks(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            index, times, messages = chunk
+            try:
+                path = self._chunk_path(index)
+                # Write under a temporary name, so that a loader never
+                # sees a partial chunk
+                tmp = path[:-len('.npz')] + '.tmp.npz'
+                self._save(tmp, **to_columns(times, messages))
+                os.rename(tmp, path)
+            except Exception as exc:
+                logger.error("Failed to write chunk {0}: {1}".format(index, exc))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class RaggedColumn(object):
+    """A variable length array column, e.g. `position` of JointState."""
+
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def as_matrix(self):
+        """Returns a (rows, length) view if all rows have the same length."""
+        lengths = np.diff(self.offsets)
+        if len(lengths) == 0:
+            return self.values.reshape(0, 0)
+        if np.any(lengths != lengths[0]):
+            raise ValueError("Rows have different lengths")
+        return self.values.reshape(len(lengths), lengths[0])
+
+
+class Recording(object):
+    """Memory mapped columns of a recording. See `load`."""
+
+    def __init__(self, arrays):
+        self._arrays = arrays
+        self.columns = sorted(set(
+            n.split('@')[0] for n in arrays if n != TIME_COLUMN))
+
+    @property
+    def time(self):
+        """Reception time of every message."""
+        return self._arrays[TIME_COLUMN]
+
+    def __len__(self):
+        return len(self.time)
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, name):
+        if name in self._arrays:
+            return self._arrays[name]
+        if name + OFFSETS in self._arrays:
+            return RaggedColumn(self._arrays[name + VALUES],
+                                self._arrays[name + OFFSETS])
+        raise KeyError(name)
+
+
+def _npz_headers(path):
+    """Read the shape and dtype of every array of an .npz file, without
+    decompressing the data."""
+    headers = {}
+    with zipfile.ZipFile(path) as archive:
+        for member in archive.namelist():
+            with archive.open(member) as f:
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+                else:
+                    shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+            headers[member[:-len('.npy')]] = (shape, dtype)
+    return headers
+
+
+def _consolidate(chunks, out_dir):
+    """Concatenate the arrays of all chunks into one .npy file per array."""
+    headers = [_npz_headers(c) for c in chunks]
+    rows = [h[TIME_COLUMN][0][0] for h in headers]
+    names = []
+    for h in headers:
+        names.extend(n for n in h if n not in names)
+    layout = {}
+    for name in names:
+        dtypes = [h[name][1] for h in headers if name in h]
+        dtype = np.result_type(*dtypes)
+        if name.endswith(OFFSETS):
+            # Chunk offsets are rebased, and chunks without the column
+            # contribute empty rows
+            lengths = [r + 1 for r in rows]
+            total = sum(rows) + 1
+        elif name.endswith(VALUES):
+            lengths = [h[name][0][0] if name in h else 0 for h in headers]
+            total = sum(lengths)
+        else:
+            lengths = rows
+            total = sum(rows)
+            if dtype.kind in 'iub':
+                # Chunks without the column are filled with NaN
+                if any(name not in h for h in headers):
+                    dtype = np.dtype(np.float64)
+        layout[name] = (dtype, total, lengths)
+
+    arrays = {}
+    for name, (dtype, total, _) in layout.items():
+        arrays[name] = np.lib.format.open_memmap(
+            os.path.join(out_dir, name + '.npy'), mode='w+',
+            dtype=dtype, shape=(total,))
+    positions = dict((name, 0) for name in names)
+    base = dict((name, 0) for name in names if name.endswith(OFFSETS))
+    for chunk, header, n in zip(chunks, headers, rows):
+        with np.load(chunk) as data:
+            for name in names:
+                out = arrays[name]
+                pos = positions[name]
+                if name.endswith(OFFSETS):
+                    if name in header:
+                        offsets = data[name]
+                    else:
+                        offsets = np.zeros(n + 1, dtype=np.int64)
+                    out[pos:pos + n + 1] = offsets + base[name]
+                    base[name] += offsets[-1]
+                    # The next chunk overwrites the last offset
+                    positions[name] = pos + n
+                elif name.endswith(VALUES):
+                    if name in header:
+                        values = data[name]
+                        out[pos:pos + len(values)] = values
+                        positions[name] = pos + len(values)
+                else:
+                    if name in header:
+                        out[pos:pos + n] = data[name]
+                    elif out.dtype.kind in 'US':
+                        out[pos:pos + n] = ''
+                    else:
+                        out[pos:pos + n] = np.nan
+                    positions[name] = pos + n
+    for out in arrays.values():
+        out.flush()
+    return names
+
+
+def load(directory, prefix='chunk', mmap=True):
+    """Load a recording written by a Recorder.
+
+    On first load, the chunks are consolidated into one .npy file per column
+    under `<directory>/<prefix>.columns`, which are then memory mapped. The
+    consolidation is redone only when chunks were added.
+
+    Args:
+        directory (str): The recording directory.
+        prefix (str, optional): Chunk file name prefix. Defaults to 'chunk'.
+        mmap (bool, optional): Memory map the columns, read-only. If False,
+            they are read into memory. Defaults to True.
+
+    Returns:
+        Recording: The columns, by dotted field name.
+    """
+    chunks = sorted(glob.glob(os.path.join(directory, '{}-[0-9]*.npz'.format(prefix))))
+    chunks = [c for c in chunks if not c.endswith('.tmp.npz')]
+    out_dir = os.path.join(directory, '{}.columns'.format(prefix))
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    chunk_names = [os.path.basename(c) for c in chunks]
+    manifest = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    if manifest is None or manifest.get('chunks') != chunk_names:
+        if not os.path.isdir(out_dir):
+            os.makedirs(out_dir)
+        for stale in glob.glob(os.path.join(out_dir, '*.npy')):
+            os.remove(stale)
+        names = _consolidate(chunks, out_dir) if chunks else []
+        manifest = {'chunks': chunk_names, 'arrays': names}
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+    mode = 'r' if mmap else None
+    arrays = dict((name, np.load(os.path.join(out_dir, name + '.npy'), mmap_mode=mode))
+                  for name in manifest['arrays'])
+    if TIME_COLUMN not in arrays:
+        arrays[TIME_COLUMN] = np.zeros(0)
+    return Recording(arrays)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""Concurrency-safe registries used by the executors."""
+
+from __future__ import print_function, absolute_import
+import itertools
+import threading
+from collections import namedtuple
+
+# A topic subscription of an executor. `subscribers` is a tuple, `needles`
+# the prefilter needles of each subscriber, or None if one does not filter.
+Subscription = namedtuple('Subscription', ['subscribe_id', 'subscribers', 'needles'])
+
+
+class Registry(object):
+    """Copy-on-write mapping.
+
+    Readers, e.g. the executor's reader thread, use the current snapshot
+    without locking. Writers copy the mapping under `lock`, modify the copy
+    and swap it in, so a reader never sees a mapping change while iterating
+    it. Writes are O(n) and meant to be rare compared to reads.
+
+    Compound updates (read, then write) must hold `lock`, which is
+    reentrant.
+    """
+
+    def __init__(self):
+        self._map = {}
+        self.lock = threading.RLock()
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def __getitem__(self, key):
+        return self._map[key]
+
+    def __iter__(self):
+        return iter(self._map)
+
+    def __len__(self):
+        return len(self._map)
+
+    def get(self, key, default=None):
+        return self._map.get(key, default)
+
+    def keys(self):
+        return list(self._map.keys())
+
+    def values(self):
+        return list(self._map.values())
+
+    def items(self):
+        return list(self._map.items())
+
+    def snapshot(self):
+        """Returns the current mapping. It must not be modified."""
+        return self._map
+
+    def set(self, key, value):
+        with self.lock:
+            new = dict(self._map)
+            new[key] = value
+            self._map = new
+
+    def add(self, key, value):
+        """Set `key` unless it is already set.
+
+        Returns:
+            The value registered for `key`, `value` if it was added.
+        """
+        with self.lock:
+            current = self._map.get(key)
+            if current is not None:
+                return current
+            self.set(key, value)
+            return value
+
+    def pop(self, key, default=None):
+        with self.lock:
+            if key not in self._map:
+                return default
+            new = dict(self._map)
+            value = new.pop(key)
+            self._map = new
+            return value
+
+    def clear(self):
+        with self.lock:
+            self._map = {}
+
+
+class AtomicCounter(object):
+    """Thread-safe incrementing counter.
+
+    `itertools.count` is implemented in C and its increment runs under
+    the GIL, so concurrent `next()` calls never return the same value.
+    """
+
+    def __init__(self, start=1):
+        self._count = itertools.count(start)
+
+    def next(self):
+        return next(self._count)
+
+    __next__ = next
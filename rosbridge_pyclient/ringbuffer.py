@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""Fixed-capacity ring buffers backed by preallocated NumPy arrays."""
+
+from __future__ import print_function, absolute_import
+
+import numpy as np
+
+
+class RingBuffer(object):
+    """Fixed-capacity ring buffer of fixed-width rows.
+
+    Every row is written twice, at `i` and `i + capacity`, so that the
+    valid rows (oldest to newest) are always available as a single
+    contiguous view of the underlying array, without copying or rolling.
+    """
+
+    def __init__(self, capacity, width=1, dtype=np.float64):
+        """Constructor.
+
+        Args:
+            capacity (int): Maximum number of rows kept.
+            width (int, optional): Number of columns per row. Defaults to 1.
+            dtype (numpy.dtype, optional): Element type.
+                Defaults to numpy.float64.
+        """
+        if capacity < 1:
+            raise ValueError("RingBuffer capacity must be positive")
+        self._capacity = int(capacity)
+        self._width = int(width)
+        self._data = np.zeros((2 * self._capacity, self._width), dtype=dtype)
+        self._head = 0
+        self._count = 0
+
+    @property
+    def capacity(self):
+        """Maximum number of rows. Getter only property"""
+        return self._capacity
+
+    @property
+    def width(self):
+        """Number of columns per row. Getter only property"""
+        return self._width
+
+    def __len__(self):
+        return self._count
+
+    def append(self, row):
+        """Append a single row, overwriting the oldest one when full.
+
+        Args:
+            row (array_like): `width` values.
+        """
+        head = self._head
+        self._data[head] = row
+        self._data[head + self._capacity] = row
+        self._head = (head + 1) % self._capacity
+        if self._count < self._capacity:
+            self._count += 1
+
+    def extend(self, rows):
+        """Append many rows at once.
+
+        Args:
+            rows (array_like): A (n, width) array of rows, oldest first.
+        """
+        rows = np.asarray(rows, dtype=self._data.dtype).reshape(-1, self._width)
+        n = rows.shape[0]
+        if n == 0:
+            return
+        if n >= self._capacity:
+            rows = rows[-self._capacity:]
+            n = self._capacity
+        cap = self._capacity
+        idx = (self._head + np.arange(n)) % cap
+        self._data[idx] = rows
+        self._data[idx + cap] = rows
+        self._head = (self._head + n) % cap
+        self._count = min(self._count + n, cap)
+
+    def replace_last(self, row):
+        """Overwrite the newest row in place.
+
+        Args:
+            row (array_like): `width` values.
+        """
+        if self._count == 0:
+            self.append(row)
+            return
+        last = (self._head - 1) % self._capacity
+        self._data[last] = row
+        self._data[last + self._capacity] = row
+
+    def view(self):
+        """Returns a (len, width) view of the valid rows, oldest first.
+
+        The view aliases the internal storage and is only valid until
+        the next write.
+        """
+        start = (self._head - self._count) % self._capacity
+        return self._data[start:start + self._count]
+
+    def last(self):
+        """Returns the newest row, or None if the buffer is empty."""
+        if self._count == 0:
+            return None
+        return self._data[(self._head - 1) % self._capacity]
+
+    def clear(self):
+        """Drop all rows."""
+        self._head = 0
+        self._count = 0
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+"""Periodic publishing driven by a single timer thread per executor."""
+
+from __future__ import print_function, absolute_import
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+try:
+    _clock = time.monotonic
+except AttributeError:
+    # Python 2
+    _clock = time.time
+
+
+class PeriodicTask(object):
+    """A periodic publishing stream, returned by `Publisher.publish_periodic`."""
+
+    def __init__(self, scheduler, publisher, period, provider, start):
+        self._scheduler = scheduler
+        self._publisher = publisher
+        self._period = period
+        self._provider = provider
+        self._start = start
+        self._tick = 0
+        self._published = 0
+        self._missed = 0
+        self._cancelled = False
+
+    @property
+    def publisher(self):
+        return self._publisher
+
+    @property
+    def period(self):
+        return self._period
+
+    @property
+    def published(self):
+        """Number of messages published so far."""
+        return self._published
+
+    @property
+    def missed(self):
+        """Number of ticks skipped because the scheduler ran late."""
+        return self._missed
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def deadline(self):
+        """Absolute time of the next tick, on the scheduler clock."""
+        return self._start + self._tick * self._period
+
+    def cancel(self):
+        """Stop publishing."""
+        self._cancelled = True
+        self._scheduler.wakeup()
+
+    def _advance(self, now):
+        """Move to the next deadline after `now`. Deadlines stay multiples of
+        the period from the start time, so lateness never accumulates."""
+        self._tick += 1
+        late = int((now - self.deadline()) // self._period) + 1
+        if late > 0:
+            self._tick += late
+            self._missed += late
+
+
+class PeriodicScheduler(object):
+    """Publishes many periodic streams from one thread.
+
+    Tasks are kept in a heap ordered by their next absolute deadline. On
+    every wake up, all the tasks due are run and their messages are sent in
+    a single write burst through `executor.send_many`. Deadlines are on a
+    grid shared by all tasks, multiples of their period plus their phase on
+    the scheduler clock, so streams of commensurate rates tick together,
+    whenever they were added.
+    """
+
+    def __init__(self, executor, tolerance=0.001):
+        """Constructor.
+
+        Args:
+            executor (ExecutorBase): The executor to publish through.
+            tolerance (float, optional): Tasks due within this many seconds
+                are run in the same burst. Defaults to 1 ms.
+        """
+        self._executor = executor
+        self._tolerance = tolerance
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        # Bumped by every start, a thread exits once it is not current
+        self._generation = 0
+
+    def add(self, publisher, rate, provider, phase=0.0):
+        """Publish the messages of `provider` at a fixed rate.
+
+        Args:
+            publisher (Publisher): The publisher.
+            rate (float): Publishing rate in Hz.
+            provider (function): Called at each tick, returns the message
+                to publish, or None to skip the tick.
+            phase (float, optional): Offset of the ticks from the shared
+                grid, in seconds. Streams with the same rate and phase tick
+                together.
+
+        Returns:
+            PeriodicTask: The task.
+        """
+        if rate <= 0:
+            raise ValueError("Publishing rate must be positive")
+        period = 1.0 / rate
+        # First tick on the grid, so that it lines up with the other tasks
+        start = math.ceil((_clock() - phase) / period) * period + phase
+        task = PeriodicTask(self, publisher, period, provider, start)
+        with self._cond:
+            heapq.heappush(self._heap, (task.deadline(), next(self._seq), task))
+            self._ensure_running()
+            self._cond.notify()
+        return task
+
+    def _ensure_running(self):
+        if self._running:
+            return
+        self._running = True
+        self._generation += 1
+        self._thread = threading.Thread(
+            target=self._run, args=(self._generation,), name='PeriodicScheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def wakeup(self):
+        with self._cond:
+            self._cond.notify()
+
+    def stop(self):
+        """Stop the scheduler thread. Tasks are dropped."""
+        with self._cond:
+            self._running = False
+            self._heap = []
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def __len__(self):
+        with self._cond:
+            return sum(1 for _, _, task in self._heap if not task.cancelled)
+
+    def _run(self, generation):
+        while True:
+            with self._cond:
+                due = self._wait_due(generation)
+                if due is None:
+                    return
+            frames = []
+            for task in due:
+                frame = self._run_task(task)
+                if frame is not None:
+                    frames.append(frame)
+            if frames:
+                try:
+                    self._executor.send_many(frames)
+                except Exception as exc:
+                    logger.error("Periodic publishing failed: {}".format(exc))
+
+    def _wait_due(self, generation):
+        """Wait for the next deadline and pop the tasks due, or return None
+        once the scheduler is stopped or restarted by another thread. Called
+        with the condition held."""
+        while self._running and self._generation == generation:
+            heap = self._heap
+            while heap and heap[0][2].cancelled:
+                heapq.heappop(heap)
+            if not heap:
+                self._cond.wait()
+                continue
+            now = _clock()
+            remaining = heap[0][0] - now
+            if remaining > self._tolerance:
+                self._cond.wait(remaining)
+                continue
+            due = []
+            while heap and heap[0][0] - now <= self._tolerance:
+                task = heapq.heappop(heap)[2]
+                if task.cancelled:
+                    continue
+                due.append(task)
+                task._advance(now)
+                heapq.heappush(heap, (task.deadline(), next(self._seq), task))
+            return due
+        return None
+
+    def _run_task(self, task):
+        try:
+            message = task._provider()
+            if message is None:
+                return None
+            task._published += 1
+            return task._publisher._prepare(message)
+        except Exception as exc:
+            logger.error("Periodic message provider for {0} failed: {1}".format(
+                task._publisher.topic, exc))
+            return None
@@ -0,0 +1,160 @@
+from __future__ import print_function
+import threading
+import logging
+
+try:
+    from queue import Queue, Full
+except ImportError:
+    # Python2 compatibility
+    from Queue import Queue, Full
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceServer(object):
+    def __init__(self, executor, service_name, service_type, handler,
+                 workers=1, queue_size=100):
+        """Constructor for ServiceServer.
+
+        Requests are not handled on the executor's reader thread. They are
+        queued and processed by a pool of `workers` threads, so at most
+        `workers` handlers run concurrently and slow handlers do not
+        block topic traffic.
+
+        Args:
+            executor  (Executor/ExecutorThreaded/ExecutorTornado): The ROSBridgeClient object.
+            service_name (str): The ROS service name.
+            service_type (str): The ROS service type.
+            handler (function): Called with the request arguments (dict).
+                Returns the response values (dict). If it raises, a failed
+                response is sent with the error message.
+            workers (int, optional): Size of the worker pool, i.e. the max
+                number of concurrently running handlers. Defaults to 1.
+            queue_size (int, optional): Max number of pending requests.
+                Requests beyond that are answered with a failed response.
+                Defaults to 100.
+        """
+        self._executor = executor
+        self._service_name = service_name
+        self._service_type = service_type
+        self._handler = handler
+        self._id = self._executor.gen_id()
+        self._advertise_id = 'service_server:{}:{}'.format(self._service_name, self._id)
+        self._queue = Queue(maxsize=queue_size)
+        self._stopped = threading.Event()
+        self._workers = []
+        for i in range(max(1, workers)):
+            worker = threading.Thread(
+                target=self._work,
+                name='ServiceServer:{}:{}'.format(self._service_name, i))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+        self._register()
+
+    @property
+    def advertise_id(self):
+        """Service advertise id, mainly used for internal rosbridge protocol implementation"""
+        return self._advertise_id
+
+    @property
+    def id(self):
+        """Service unique numerical id. Getter only property"""
+        return self._id
+
+    @property
+    def name(self):
+        """Service Name property. Getter only"""
+        return self._service_name
+
+    @property
+    def type(self):
+        """Service type property. Getter only"""
+        return self._service_type
+
+    @property
+    def workers(self):
+        """Size of the worker pool. Getter only"""
+        return len(self._workers)
+
+    @property
+    def pending(self):
+        """Approximate number of queued requests. Getter only"""
+        return self._queue.qsize()
+
+    def run_handler(self, args):
+        """Run the request handler.
+
+        Args:
+            args (dict): The request arguments.
+
+        Returns:
+            tuple: (result, values). result is False if the handler raised,
+                in which case values is the error message.
+        """
+        try:
+            return True, self._handler(args)
+        except Exception as exc:
+            logger.error("Service handler of [{0}] raised: {1}".format(
+                self._service_name, exc))
+            return False, str(exc)
+
+    def dispatch(self, request_id, args):
+        """Queue a request for the worker pool. Called by the executor
+        when a `call_service` op for this service is received.
+
+        Args:
+            request_id (str): The id of the call_service op.
+            args (dict): The request arguments.
+        """
+        if self._stopped.is_set():
+            self._executor.send_service_response(
+                self._service_name, request_id, False,
+                "Service {} is shutting down".format(self._service_name))
+            return
+        try:
+            self._queue.put_nowait((request_id, args))
+        except Full:
+            logger.warning("Service [{}] request queue is full".format(
+                self._service_name))
+            self._executor.send_service_response(
+                self._service_name, request_id, False,
+                "Service {} is busy".format(self._service_name))
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                # Pass the stop on to the next worker
+                self._post_stop()
+                return
+            request_id, args = item
+            result, values = self.run_handler(args)
+            try:
+                self._executor.send_service_response(
+                    self._service_name, request_id, result, values)
+            except Exception as exc:
+                logger.error("Failed to send response of [{0}]: {1}".format(
+                    self._service_name, exc))
+            if self._stopped.is_set():
+                # The stop may not have fit in the full queue
+                self._post_stop()
+
+    def _post_stop(self):
+        """Queue the stop marker behind the pending requests, unless the
+        queue is full, in which case a worker retries after its request."""
+        try:
+            self._queue.put_nowait(None)
+        except Full:
+            pass
+
+    def unregister(self):
+        """Unadvertise the service and stop the worker pool once the
+        already queued requests are handled. Does not block.
+        """
+        self._executor.unregister_service_server(self)
+        self._stopped.set()
+        self._post_stop()
+
+    def _register(self):
+        self._executor.register_service_server(self)
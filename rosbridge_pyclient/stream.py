@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+"""Pull-style consumption of subscribed messages through bounded buffers."""
+
+from __future__ import print_function, absolute_import
+import threading
+import time
+from collections import deque
+
+
+class StreamClosed(Exception):
+    """Raised by `MessageStream.get` once the stream is closed and drained."""
+
+
+class MessageStream(object):
+    """Bounded buffer of messages, fed by a Subscriber and consumed as a
+    blocking iterator, in batches, or as an async iterator.
+
+    Messages are pushed from the executor's reader thread. When the buffer
+    is full, either the oldest buffered message or the incoming one is
+    dropped, so that a slow consumer never stalls the connection.
+    """
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+
+    def __init__(self, maxlen=100, policy=DROP_OLDEST, on_close=None):
+        """Constructor.
+
+        Args:
+            maxlen (int, optional): Max buffered messages. Defaults to 100.
+            policy (str, optional): What to drop when the buffer is full,
+                `MessageStream.DROP_OLDEST` or `MessageStream.DROP_NEWEST`.
+                Defaults to DROP_OLDEST.
+            on_close (function, optional): Called with the stream once, when
+                it is closed.
+        """
+        if maxlen < 1:
+            raise ValueError("MessageStream maxlen must be positive")
+        if policy not in (self.DROP_OLDEST, self.DROP_NEWEST):
+            raise ValueError("Unknown MessageStream policy: {}".format(policy))
+        self._maxlen = maxlen
+        self._policy = policy
+        self._on_close = on_close
+        self._buffer = deque()
+        self._cond = threading.Condition(threading.Lock())
+        self._closed = False
+        self._dropped = 0
+        # Pending (loop, future) of an async consumer
+        self._waiter = None
+
+    @property
+    def maxlen(self):
+        """Max buffered messages. Getter only property"""
+        return self._maxlen
+
+    @property
+    def policy(self):
+        """Drop policy. Getter only property"""
+        return self._policy
+
+    @property
+    def dropped(self):
+        """Number of messages dropped because the buffer was full."""
+        return self._dropped
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def push(self, msg):
+        """Buffer a message. Called by the Subscriber on every message."""
+        with self._cond:
+            if self._closed:
+                return
+            self._enqueue(msg)
+
+    def _enqueue(self, msg, oldest=False):
+        """Hand a message to the pending async consumer, or buffer it by the
+        drop policy. `oldest` puts it in front of the buffered messages.
+        Called with the condition held."""
+        waiter = self._waiter
+        if waiter is not None:
+            self._waiter = None
+            loop, future = waiter
+            loop.call_soon_threadsafe(self._resolve, future, msg)
+            return
+        buf = self._buffer
+        if len(buf) >= self._maxlen:
+            self._dropped += 1
+            if self._policy == self.DROP_NEWEST:
+                if not oldest:
+                    return
+                buf.pop()
+            else:
+                if oldest:
+                    return
+                buf.popleft()
+        if oldest:
+            buf.appendleft(msg)
+        else:
+            buf.append(msg)
+        self._cond.notify()
+
+    def get(self, timeout=None):
+        """Wait for the next message.
+
+        Args:
+            timeout (float, optional): Max seconds to wait. Wait forever
+                if None.
+
+        Returns:
+            dict: The message object, or None on timeout.
+
+        Raises:
+            StreamClosed: If the stream is closed and drained.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while not self._buffer:
+                if self._closed:
+                    raise StreamClosed("Message stream is closed")
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return None
+                    self._cond.wait(remaining)
+            return self._buffer.popleft()
+
+    def next_batch(self, n, timeout=None):
+        """Wait until `n` messages are buffered, the timeout expires or the
+        stream is closed, and return up to `n` messages, oldest first.
+
+        Args:
+            n (int): Max batch size.
+            timeout (float, optional): Max seconds to wait. Wait forever
+                if None.
+
+        Returns:
+            list: The messages. Empty if none arrived in time.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while len(self._buffer) < n and not self._closed:
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            buf = self._buffer
+            if len(buf) <= n:
+                batch = list(buf)
+                buf.clear()
+            else:
+                batch = [buf.popleft() for _ in range(n)]
+            return batch
+
+    def close(self):
+        """Stop buffering messages. Consumers drain what is buffered and
+        then stop iterating."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            waiter = self._waiter
+            self._waiter = None
+            self._cond.notify_all()
+        if waiter is not None:
+            loop, future = waiter
+            loop.call_soon_threadsafe(self._resolve, future, None, True)
+        if self._on_close is not None:
+            self._on_close(self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return self.get()
+        except StreamClosed:
+            raise StopIteration
+
+    next = __next__
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        """Return an awaitable for the next message. Must be awaited on the
+        running event loop, e.g. the one of an ExecutorTornado."""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._cond:
+            if self._buffer:
+                future.set_result(self._buffer.popleft())
+            elif self._closed:
+                future.set_exception(StopAsyncIteration())
+            else:
+                self._waiter = (loop, future)
+        return future
+
+    def _resolve(self, future, msg, closed=False):
+        """Hand a message to an async consumer, on its event loop."""
+        if future.cancelled():
+            if not closed:
+                # Keep the message for the next consumer, it is the oldest one
+                with self._cond:
+                    self._enqueue(msg, oldest=True)
+            return
+        if closed:
+            future.set_exception(StopAsyncIteration())
+        else:
+            future.set_result(msg)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import print_function
-import json
 import logging
-from pydispatch import dispatcher
+from .fieldpath import compile_getter, compile_predicate, compile_needles
+from .stream import MessageStream
 
 try:
     basestring
@@ -16,13 +16,23 @@ logger = logging.getLogger(__name__)
 
 
 class Subscriber(object):
-    def __init__(self, executor, topic_name, message_type='', clb=None):
+    def __init__(self, executor, topic_name, message_type='', clb=None,
+                 where=None, projection=None, register=True):
         """Constructor.
 
         Args:
             executor (ExecutorThreaded/ExecutorTornado): An executor object.
             topic_name (str): The ROS topic name.
             clb (function): A function will be called when a message is received on that topic.
+                May be None if messages are only consumed through sinks, e.g. `stream()`.
+            where (dict/function, optional): Only deliver messages matching these
+                conditions, a dict of field path to expected value(s), e.g.
+                `{'header.frame_id': 'map'}`, or a function taking the message.
+            projection (str, optional): Deliver only this field of the messages
+                to the callback and sinks, e.g. `status[0].level`.
+            register (bool, optional): Subscribe at once. Set to False when
+                registering many subscribers with `executor.register_many`.
+                Defaults to True.
         """
         self._executor = executor
         self._topic_name = topic_name
@@ -30,7 +40,15 @@ class Subscriber(object):
         self._message_type = message_type
         self._id = executor.gen_id()
         self._subscribe_id = ""
-        self._register()
+        self._sinks = ()
+        self._predicate = None
+        self._needles = ()
+        if where is not None:
+            self._predicate = compile_predicate(where)
+            self._needles = compile_needles(where)
+        self._project = compile_getter(projection) if projection else None
+        if register:
+            self._register()
 
     @property
     def topic(self):
@@ -57,9 +75,99 @@ class Subscriber(object):
         if isinstance(value, basestring):
             self._subscribe_id = value
 
+    @property
+    def needles(self):
+        """Substrings that a raw message frame must contain to possibly match
+        the `where` conditions. Empty if no prefiltering is possible."""
+        return self._needles
+
     def callback(self, msg):
         """On-Message callback function. Getter only property"""
-        self._clb(msg)
+        if self._predicate is not None and not self._predicate(msg):
+            return
+        if self._project is not None:
+            try:
+                msg = self._project(msg)
+            except (KeyError, IndexError, TypeError):
+                return
+        if self._clb is not None:
+            self._clb(msg)
+        for sink in self._sinks:
+            sink.push(msg)
+
+    def add_sink(self, sink):
+        """Feed received messages to a sink, besides the callback function.
+
+        Args:
+            sink: Any object with a `push(msg)` method. It is called from
+                the executor's reader thread and must not block.
+        """
+        # Copy on write, the reader thread iterates without locking
+        self._sinks = self._sinks + (sink,)
+
+    def remove_sink(self, sink):
+        """Stop feeding messages to a sink."""
+        self._sinks = tuple(s for s in self._sinks if s is not sink)
+
+    def stream(self, maxlen=100, policy=MessageStream.DROP_OLDEST):
+        """Consume received messages from a bounded buffer, instead of a
+        callback function.
+
+        The returned MessageStream is a blocking iterator, offers batch
+        retrieval through `next_batch(n, timeout)` and is an async iterator
+        on event-loop backends. Closing it detaches it from this subscriber.
+
+        Args:
+            maxlen (int, optional): Max buffered messages. Defaults to 100.
+            policy (str, optional): What to drop when the buffer is full,
+                `MessageStream.DROP_OLDEST` or `MessageStream.DROP_NEWEST`.
+                Defaults to DROP_OLDEST.
+
+        Returns:
+            MessageStream: The stream object.
+        """
+        stream = MessageStream(maxlen, policy, on_close=self.remove_sink)
+        self.add_sink(stream)
+        return stream
+
+    def timeseries(self, fields, capacity=10000, stamp=None):
+        """Capture numeric fields of received messages into a fixed-size
+        NumPy time series. See `TimeSeries` for the field path syntax and
+        the windowed queries.
+
+        Args:
+            fields (list): Field paths, e.g. `['pose.position.x', 'position[0:6]']`.
+            capacity (int, optional): Number of rows kept. Defaults to 10000.
+            stamp (str, optional): Path of a ROS time field used as timestamp,
+                e.g. `header.stamp`. Defaults to the reception time.
+
+        Returns:
+            TimeSeries: The time series, fed until removed with `remove_sink`.
+        """
+        # NumPy based sinks are imported on first use
+        from .timeseries import TimeSeries
+        series = TimeSeries(fields, capacity, stamp)
+        self.add_sink(series)
+        return series
+
+    def record(self, directory, prefix='chunk', chunk_size=10000, compress=True):
+        """Record received messages into columnar .npz chunk files, written
+        by a background thread. Read them back with `recorder.load`.
+
+        Args:
+            directory (str): Output directory.
+            prefix (str, optional): Chunk file name prefix. Defaults to 'chunk'.
+            chunk_size (int, optional): Messages per chunk. Defaults to 10000.
+            compress (bool, optional): Write compressed chunks. Defaults to True.
+
+        Returns:
+            Recorder: The recorder. Closing it detaches it from this subscriber.
+        """
+        from .recorder import Recorder
+        recorder = Recorder(directory, prefix, chunk_size, compress,
+                            on_close=self.remove_sink)
+        self.add_sink(recorder)
+        return recorder
 
     def unregister(self):
         """Remove the current callback function from listening to the topic,
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+"""Synchronization of messages of several subscribers by `header.stamp`."""
+
+from __future__ import print_function, absolute_import
+import bisect
+import logging
+import threading
+
+from .fieldpath import stamp_to_sec
+
+logger = logging.getLogger(__name__)
+
+
+class _SyncInput(object):
+    """Subscriber sink feeding one input of a synchronizer."""
+
+    def __init__(self, synchronizer, index):
+        self._synchronizer = synchronizer
+        self._index = index
+
+    def push(self, msg):
+        self._synchronizer.add(self._index, msg)
+
+
+class ApproximateTimeSynchronizer(object):
+    """Calls back with one message per subscriber, once their header stamps
+    lie within `slop` seconds of each other.
+
+    Every input keeps a bounded queue sorted by stamp. When a message
+    arrives, the nearest message of every other input is found by bisection
+    and the set is emitted if its stamps span at most `slop`. Emitted and
+    older messages are then dropped. A message also expires once another
+    input has moved past it by more than `slop` without a candidate, as
+    topics are received in order.
+    """
+
+    def __init__(self, subscribers, clb, queue_size=10, slop=0.1):
+        """Constructor.
+
+        Args:
+            subscribers (list): The Subscriber objects. Their messages must
+                have a `header.stamp`.
+            clb (function): Called with the matched messages, in the order
+                of `subscribers`, from the thread that received the last one.
+            queue_size (int, optional): Max queued messages per subscriber.
+                Defaults to 10.
+            slop (float, optional): Max stamp difference in seconds.
+                Defaults to 0.1.
+        """
+        if queue_size < 1:
+            raise ValueError("Synchronizer queue_size must be positive")
+        self._clb = clb
+        self._queue_size = queue_size
+        self._slop = slop
+        self._lock = threading.Lock()
+        # Per input, sorted stamps and their messages
+        self._stamps = [[] for _ in subscribers]
+        self._msgs = [[] for _ in subscribers]
+        self._latest = [None for _ in subscribers]
+        self._dropped = 0
+        self._inputs = []
+        for i, subscriber in enumerate(subscribers):
+            sink = _SyncInput(self, i)
+            subscriber.add_sink(sink)
+            self._inputs.append((subscriber, sink))
+
+    @property
+    def slop(self):
+        return self._slop
+
+    @property
+    def dropped(self):
+        """Number of messages dropped without being matched."""
+        return self._dropped
+
+    def add(self, index, msg):
+        """Queue a message of an input and emit a match if there is one.
+
+        Args:
+            index (int): Index of the input subscriber.
+            msg (dict): The message.
+        """
+        try:
+            stamp = stamp_to_sec(msg['header']['stamp'])
+        except (KeyError, TypeError):
+            logger.debug("Skipping message without header.stamp")
+            return
+        with self._lock:
+            stamps = self._stamps[index]
+            pos = bisect.bisect_right(stamps, stamp)
+            stamps.insert(pos, stamp)
+            self._msgs[index].insert(pos, msg)
+            if self._latest[index] is None or stamp > self._latest[index]:
+                self._latest[index] = stamp
+            if len(stamps) > self._queue_size:
+                self._pop(index, 1)
+                self._dropped += 1
+            matched = self._match(index, stamp)
+            self._expire()
+        if matched is not None:
+            self._clb(*matched)
+
+    def _pop(self, index, n):
+        del self._stamps[index][:n]
+        del self._msgs[index][:n]
+
+    def _nearest(self, index, stamp):
+        """Position of the queued stamp of an input nearest to `stamp`."""
+        stamps = self._stamps[index]
+        pos = bisect.bisect_left(stamps, stamp)
+        if pos == len(stamps):
+            return pos - 1
+        if pos > 0 and stamp - stamps[pos - 1] <= stamps[pos] - stamp:
+            return pos - 1
+        return pos
+
+    def _match(self, index, stamp):
+        picks = []
+        for i, stamps in enumerate(self._stamps):
+            if not stamps:
+                return None
+            if i == index:
+                picks.append(bisect.bisect_left(stamps, stamp))
+            else:
+                picks.append(self._nearest(i, stamp))
+        chosen = [self._stamps[i][p] for i, p in enumerate(picks)]
+        if max(chosen) - min(chosen) > self._slop:
+            return None
+        matched = tuple(self._msgs[i][p] for i, p in enumerate(picks))
+        for i, p in enumerate(picks):
+            self._dropped += p
+            self._pop(i, p + 1)
+        return matched
+
+    def _expire(self):
+        slop = self._slop
+        for i, stamps in enumerate(self._stamps):
+            n = 0
+            for stamp in stamps:
+                if not self._expired(i, stamp - slop, stamp + slop):
+                    break
+                n += 1
+            if n:
+                self._dropped += n
+                self._pop(i, n)
+
+    def _expired(self, index, lo, hi):
+        """Whether some other input has moved past [lo, hi] without a
+        message in it."""
+        for i, stamps in enumerate(self._stamps):
+            if i == index or self._latest[i] is None or self._latest[i] <= hi:
+                continue
+            pos = bisect.bisect_left(stamps, lo)
+            if pos == len(stamps) or stamps[pos] > hi:
+                return True
+        return False
+
+    def unregister(self):
+        """Detach from the subscribers and drop queued messages."""
+        for subscriber, sink in self._inputs:
+            subscriber.remove_sink(sink)
+        self._inputs = []
+        with self._lock:
+            for i in range(len(self._stamps)):
+                self._pop(i, len(self._stamps[i]))
+
+
+class TimeSynchronizer(ApproximateTimeSynchronizer):
+    """Calls back with one message per subscriber, once they all carry the
+    exact same `header.stamp`."""
+
+    def __init__(self, subscribers, clb, queue_size=10):
+        """Constructor.
+
+        Args:
+            subscribers (list): The Subscriber objects.
+            clb (function): Called with the matched messages, in the order
+                of `subscribers`.
+            queue_size (int, optional): Max queued messages per subscriber.
+                Defaults to 10.
+        """
+        super(TimeSynchronizer, self).__init__(subscribers, clb, queue_size, slop=0.0)
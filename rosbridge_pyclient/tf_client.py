@@ -3,15 +3,576 @@
 
 from __future__ import print_function, absolute_import
 
+import threading
+import logging
+
+import numpy as np
+
+from .fieldpath import stamp_to_sec
+from .subscriber import Subscriber
+from .action_client import ActionClient, Goal
+from .ringbuffer import RingBuffer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Row layout of an edge ring buffer: [stamp, tx, ty, tz, qx, qy, qz, qw]
+_ROW_WIDTH = 8
+
+
+class TransformLookupError(Exception):
+    """Raised when a transform can not be resolved from the buffer."""
+    pass
+
+
+def _normalize_frame(frame_id):
+    return frame_id.lstrip('/')
+
+
+def _quat_multiply(a, b):
+    ax, ay, az, aw = np.moveaxis(a, -1, 0)
+    bx, by, bz, bw = np.moveaxis(b, -1, 0)
+    return np.stack([aw * bx + ax * bw + ay * bz - az * by,
+                     aw * by - ax * bz + ay * bw + az * bx,
+                     aw * bz + ax * by - ay * bx + az * bw,
+                     aw * bw - ax * bx - ay * by - az * bz], axis=-1)
+
+
+def _quat_conjugate(q):
+    return q * np.array([-1.0, -1.0, -1.0, 1.0])
+
+
+def _quat_rotate(q, v):
+    u = q[..., :3]
+    w = q[..., 3:4]
+    uv = np.cross(u, v)
+    return v + 2.0 * (w * uv + np.cross(u, uv))
+
+
+def _quat_to_matrix(q):
+    x, y, z, w = q
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]
+    ])
+
+
+def _slerp(q0, q1, s):
+    """Spherical linear interpolation of (n, 4) quaternion arrays."""
+    dot = np.sum(q0 * q1, axis=-1)
+    q1 = np.where((dot < 0.0)[..., None], -q1, q1)
+    dot = np.clip(np.abs(dot), 0.0, 1.0)
+    theta = np.arccos(dot)
+    sin_theta = np.sin(theta)
+    near = sin_theta < 1e-6
+    safe_sin = np.where(near, 1.0, sin_theta)
+    w0 = np.where(near, 1.0 - s, np.sin((1.0 - s) * theta) / safe_sin)
+    w1 = np.where(near, s, np.sin(s * theta) / safe_sin)
+    q = w0[..., None] * q0 + w1[..., None] * q1
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+class Transform(object):
+    """A rigid body transform, stored as a translation vector and a
+    (x, y, z, w) quaternion.
+
+    Both members may carry a leading batch dimension, in which case
+    every operation is applied element-wise over the batch.
+    """
+    __slots__ = ('translation', 'rotation')
+
+    def __init__(self, translation=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0, 1.0)):
+        self.translation = np.asarray(translation, dtype=np.float64)
+        self.rotation = np.asarray(rotation, dtype=np.float64)
+
+    def __mul__(self, other):
+        return Transform(
+            self.translation + _quat_rotate(self.rotation, other.translation),
+            _quat_multiply(self.rotation, other.rotation))
+
+    def __repr__(self):
+        return "Transform(translation={0}, rotation={1})".format(
+            self.translation.tolist(), self.rotation.tolist())
+
+    def inverse(self):
+        """Returns the inverse transform."""
+        q_inv = _quat_conjugate(self.rotation)
+        return Transform(-_quat_rotate(q_inv, self.translation), q_inv)
+
+    def as_matrix(self):
+        """Returns the 4x4 homogeneous matrix of a single transform."""
+        m = np.eye(4)
+        m[:3, :3] = _quat_to_matrix(self.rotation)
+        m[:3, 3] = self.translation
+        return m
+
+    def apply(self, points):
+        """Transform a batch of points in one vectorized operation.
+
+        Args:
+            points (array_like): A (n, 3) array of points.
+
+        Returns:
+            numpy.ndarray: The (n, 3) transformed points.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        if self.rotation.ndim == 1:
+            return points.dot(_quat_to_matrix(self.rotation).T) + self.translation
+        return _quat_rotate(self.rotation, points) + self.translation
+
+    def to_msg(self):
+        """Returns a `geometry_msgs/Transform` dict of a single transform."""
+        t = self.translation
+        q = self.rotation
+        return {
+            'translation': {'x': t[0], 'y': t[1], 'z': t[2]},
+            'rotation': {'x': q[0], 'y': q[1], 'z': q[2], 'w': q[3]}
+        }
+
+
+class TransformBuffer(object):
+    """In-memory transform tree.
+
+    Keeps a time-indexed ring buffer per frame edge (parent -> child)
+    and caches the resolved edge chain between frame pairs.
+    """
+
+    def __init__(self, buffer_size=1000):
+        """Constructor.
+
+        Args:
+            buffer_size (int, optional): Number of samples kept per
+                dynamic frame edge. Defaults to 1000.
+        """
+        self._buffer_size = buffer_size
+        self._parents = {}
+        self._edges = {}
+        self._static = {}
+        self._chains = {}
+        self._lock = threading.RLock()
+
+    @property
+    def frames(self):
+        """List of all known frame ids. Getter only property"""
+        with self._lock:
+            frames = set(self._parents)
+            frames.update(self._parents.values())
+        return sorted(frames)
+
+    def clear(self):
+        """Drop all transforms."""
+        with self._lock:
+            self._parents.clear()
+            self._edges.clear()
+            self._static.clear()
+            self._chains.clear()
+
+    def _set_parent(self, child, parent):
+        if self._parents.get(child) != parent:
+            self._parents[child] = parent
+            self._chains.clear()
+
+    def set_transform(self, parent, child, stamp, translation, rotation, static=False):
+        """Insert a single parent -> child transform.
+
+        Samples older than the newest sample of the edge are dropped.
+
+        Args:
+            parent (str): The parent frame id.
+            child (str): The child frame id.
+            stamp (float): Time of the sample in seconds.
+            translation (array_like): (x, y, z).
+            rotation (array_like): (x, y, z, w).
+            static (bool, optional): Whether this is a static, time
+                independent transform. Defaults to False.
+        """
+        parent = _normalize_frame(parent)
+        child = _normalize_frame(child)
+        with self._lock:
+            self._set_parent(child, parent)
+            if static:
+                self._edges.pop(child, None)
+                self._static[child] = Transform(translation, rotation)
+                return
+            self._static.pop(child, None)
+            ring = self._edges.get(child)
+            if ring is None:
+                ring = RingBuffer(self._buffer_size, _ROW_WIDTH)
+                self._edges[child] = ring
+            last = ring.last()
+            row = np.empty(_ROW_WIDTH)
+            row[0] = stamp
+            row[1:4] = translation
+            row[4:8] = rotation
+            if last is None or stamp > last[0]:
+                ring.append(row)
+            elif stamp == last[0]:
+                ring.replace_last(row)
+
+    def set_transforms(self, transforms, static=False):
+        """Insert a list of `geometry_msgs/TransformStamped` messages,
+        as found in `tf2_msgs/TFMessage`.
+
+        Args:
+            transforms (list): The TransformStamped message dicts.
+            static (bool, optional): Whether these come from `/tf_static`.
+                Defaults to False.
+        """
+        for tf in transforms:
+            header = tf.get('header', {})
+            t = tf['transform']['translation']
+            q = tf['transform']['rotation']
+            self.set_transform(header.get('frame_id', ''),
+                               tf['child_frame_id'],
+                               stamp_to_sec(header.get('stamp')),
+                               (t['x'], t['y'], t['z']),
+                               (q['x'], q['y'], q['z'], q['w']),
+                               static=static)
+
+    def _path_to_root(self, frame):
+        path = [frame]
+        seen = set(path)
+        while frame in self._parents:
+            frame = self._parents[frame]
+            if frame in seen:
+                raise TransformLookupError(
+                    "Loop detected in tf tree at frame [{}]".format(frame))
+            seen.add(frame)
+            path.append(frame)
+        return path
+
+    def _chain(self, target, source):
+        """Returns the child frames of the edges walked from `source` and
+        from `target` up to their common ancestor.
+        """
+        key = (target, source)
+        chain = self._chains.get(key)
+        if chain is not None:
+            return chain
+        if target not in self._parents and target not in self._parents.values():
+            raise TransformLookupError("Frame [{}] does not exist".format(target))
+        if source not in self._parents and source not in self._parents.values():
+            raise TransformLookupError("Frame [{}] does not exist".format(source))
+        source_path = self._path_to_root(source)
+        target_path = self._path_to_root(target)
+        target_index = dict((f, i) for i, f in enumerate(target_path))
+        for i, frame in enumerate(source_path):
+            if frame in target_index:
+                chain = (source_path[:i], target_path[:target_index[frame]])
+                self._chains[key] = chain
+                return chain
+        raise TransformLookupError(
+            "Frames [{0}] and [{1}] are not connected".format(target, source))
+
+    def _sample(self, child, times):
+        """Interpolate the edge of `child` at the given times.
+
+        Returns:
+            Transform: Batched over `times`.
+        """
+        static = self._static.get(child)
+        if static is not None:
+            n = times.shape[0]
+            return Transform(np.tile(static.translation, (n, 1)),
+                             np.tile(static.rotation, (n, 1)))
+        rows = self._edges[child].view()
+        stamps = rows[:, 0]
+        oldest = stamps[0]
+        newest = stamps[-1]
+        if times.min() < oldest or times.max() > newest:
+            raise TransformLookupError(
+                "Lookup of [{0}] -> [{1}] requires extrapolation: requested "
+                "[{2}, {3}], available [{4}, {5}]".format(
+                    self._parents[child], child, times.min(), times.max(),
+                    oldest, newest))
+        if rows.shape[0] == 1:
+            return Transform(np.tile(rows[0, 1:4], (times.shape[0], 1)),
+                             np.tile(rows[0, 4:8], (times.shape[0], 1)))
+        upper = np.clip(np.searchsorted(stamps, times, side='left'), 1, rows.shape[0] - 1)
+        r0 = rows[upper - 1]
+        r1 = rows[upper]
+        s = (times - r0[:, 0]) / (r1[:, 0] - r0[:, 0])
+        translation = r0[:, 1:4] + s[:, None] * (r1[:, 1:4] - r0[:, 1:4])
+        rotation = _slerp(r0[:, 4:8], r1[:, 4:8], s)
+        return Transform(translation, rotation)
+
+    def _latest_common_time(self, frames):
+        newest = [self._edges[f].last()[0] for f in frames if f in self._edges]
+        return min(newest) if newest else 0.0
+
+    def _compose(self, frames, times):
+        result = None
+        for child in frames:
+            edge = self._sample(child, times)
+            result = edge if result is None else edge * result
+        return result
+
+    def lookup_transforms(self, target_frame, source_frame, times):
+        """Vectorized lookup of the `target_frame` <- `source_frame`
+        transform at many points in time.
+
+        Args:
+            target_frame (str): The frame to transform into.
+            source_frame (str): The frame to transform from.
+            times (array_like): Times in seconds.
+
+        Returns:
+            Transform: The transforms, batched over `times`.
+        """
+        target = _normalize_frame(target_frame)
+        source = _normalize_frame(source_frame)
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        n = times.shape[0]
+        with self._lock:
+            if target == source:
+                return Transform(np.zeros((n, 3)), np.tile([0.0, 0.0, 0.0, 1.0], (n, 1)))
+            source_chain, target_chain = self._chain(target, source)
+            source_tf = self._compose(source_chain, times)
+            target_tf = self._compose(target_chain, times)
+        if target_tf is None:
+            return source_tf
+        if source_tf is None:
+            return target_tf.inverse()
+        return target_tf.inverse() * source_tf
+
+    def lookup_transform(self, target_frame, source_frame, time=0.0):
+        """Returns the transform that maps data from `source_frame` to
+        `target_frame` at the given time.
+
+        Args:
+            target_frame (str): The frame to transform into.
+            source_frame (str): The frame to transform from.
+            time (float, optional): Time in seconds. Zero selects the
+                latest time for which the whole chain is available.
+                Defaults to 0.
+
+        Returns:
+            Transform: The resolved transform.
+        """
+        target = _normalize_frame(target_frame)
+        source = _normalize_frame(source_frame)
+        if time == 0.0:
+            with self._lock:
+                if target != source:
+                    source_chain, target_chain = self._chain(target, source)
+                    time = self._latest_common_time(source_chain + target_chain)
+        tf = self.lookup_transforms(target, source, [time])
+        return Transform(tf.translation[0], tf.rotation[0])
+
+    def can_transform(self, target_frame, source_frame, time=0.0):
+        """Returns True if `lookup_transform` would succeed."""
+        try:
+            self.lookup_transform(target_frame, source_frame, time)
+        except TransformLookupError:
+            return False
+        return True
+
+    def transform_points(self, points, target_frame, source_frame, time=0.0):
+        """Transform a (n, 3) array of points from `source_frame` to
+        `target_frame` in a single vectorized call.
+
+        Args:
+            points (array_like): A (n, 3) array of points.
+            target_frame (str): The frame to transform into.
+            source_frame (str): The frame the points are expressed in.
+            time (float, optional): Time in seconds. Defaults to 0 (latest).
+
+        Returns:
+            numpy.ndarray: The (n, 3) transformed points.
+        """
+        return self.lookup_transform(target_frame, source_frame, time).apply(points)
+
+
 class TFClient(object):
-    def __init__(self, executor, frame_id, clb):
+    def __init__(self, executor, frame_id=None, clb=None, buffer_size=1000,
+                 republisher=False, server_name='/tf2_web_republisher',
+                 rate=10.0, angular_thres=2.0, trans_thres=0.01, update_delay=0.05):
         """Constructor.
 
-        Kwargs:
+        By default it subscribes to `/tf` and `/tf_static` and keeps all
+        received transforms in an in-memory TransformBuffer.
+
+        In republisher mode the raw tf topics are not subscribed. Instead
+        a `tf2_web_republisher` action goal is sent for the frames
+        requested via `subscribe()`, and the server streams
+        `frame_id` <- frame transforms only when they change by more than
+        the given thresholds, at most `rate` times per second. As the
+        frames of a goal can not be changed, the goal is cancelled and a
+        new one sent when they do. Like roslibjs, changes are batched over
+        `update_delay` seconds, so that a burst of `subscribe()` and
+        `unsubscribe()` calls sends a single goal.
+
+        Args:
             executor (ExecutorThreaded/ExecutorTornado): An executor object.
-            frame_id (str): The base tf frame id.
-            clb (function): A function will be called when a message is received on that topic.
+            frame_id (str, optional): The base tf frame id. Required in
+                republisher mode, where it is the fixed target frame.
+            clb (function, optional): A function called with every received
+                transforms message, after it has been buffered.
+            buffer_size (int, optional): Number of samples kept per frame
+                edge. Defaults to 1000.
+            republisher (bool, optional): Use tf2_web_republisher instead of
+                raw `/tf` subscriptions. Defaults to False.
+            server_name (str, optional): The tf2_web_republisher action
+                server name. Defaults to '/tf2_web_republisher'.
+            rate (float, optional): Max update rate in Hz. Defaults to 10.
+            angular_thres (float, optional): Min rotation change (rad) that
+                triggers an update. Defaults to 2.0.
+            trans_thres (float, optional): Min translation change (m) that
+                triggers an update. Defaults to 0.01.
+            update_delay (float, optional): Seconds to batch the frame
+                changes for, before updating the republisher goal, 0 to
+                update it on every change. Defaults to 0.05.
         """
+        self._executor = executor
         self._frame_id_base = frame_id
-        # Registration of callback function is handled by the Subscriber
-        Subscriber.__init__(self, executor, clb)
+        self._clb = clb
+        self._buffer = TransformBuffer(buffer_size)
+        self._republisher = republisher
+        self._rate = rate
+        self._angular_thres = angular_thres
+        self._trans_thres = trans_thres
+        self._update_delay = update_delay
+        self._source_frames = set()
+        self._goal = None
+        self._goal_frames = ()
+        self._update_timer = None
+        self._lock = threading.Lock()
+        if republisher:
+            if frame_id is None:
+                raise ValueError("TFClient republisher mode requires a frame_id")
+            self._action_client = ActionClient(
+                executor, server_name, 'tf2_web_republisher/TFSubscription')
+        else:
+            self._tf_sub = Subscriber(executor, '/tf', 'tf2_msgs/TFMessage',
+                                      self._on_tf)
+            self._tf_static_sub = Subscriber(executor, '/tf_static',
+                                             'tf2_msgs/TFMessage',
+                                             self._on_tf_static)
+
+    @property
+    def frame_id(self):
+        """The base tf frame id. Getter only property"""
+        return self._frame_id_base
+
+    @property
+    def buffer(self):
+        """The underlying TransformBuffer. Getter only property"""
+        return self._buffer
+
+    @property
+    def source_frames(self):
+        """Frames streamed by the republisher. Getter only property"""
+        return sorted(self._source_frames)
+
+    def _on_tf(self, msg):
+        self._buffer.set_transforms(msg.get('transforms', []))
+        if callable(self._clb):
+            self._clb(msg)
+
+    def _on_tf_static(self, msg):
+        self._buffer.set_transforms(msg.get('transforms', []), static=True)
+        if callable(self._clb):
+            self._clb(msg)
+
+    def _on_republished(self, feedback, status, header=None):
+        self._on_tf(feedback)
+
+    def _request_update(self):
+        """Update the goal after the batching delay. Called with the lock
+        held."""
+        if self._update_delay <= 0:
+            self._update_goal()
+        elif self._update_timer is None:
+            self._update_timer = threading.Timer(self._update_delay, self._flush_update)
+            self._update_timer.daemon = True
+            self._update_timer.start()
+
+    def _flush_update(self):
+        with self._lock:
+            self._update_timer = None
+            self._update_goal()
+
+    def _update_goal(self):
+        """Replace the goal if the frames changed. Called with the lock held."""
+        frames = tuple(sorted(self._source_frames))
+        if frames == self._goal_frames:
+            return
+        if self._goal is not None:
+            self._action_client.cancel_goal(self._goal.id)
+            self._goal = None
+        self._goal_frames = frames
+        if not frames:
+            return
+        self._goal = Goal({
+            'source_frames': list(frames),
+            'target_frame': self._frame_id_base,
+            'angular_thres': self._angular_thres,
+            'trans_thres': self._trans_thres,
+            'rate': self._rate
+        }, on_feedback=self._on_republished)
+        self._action_client.send_goal(self._goal)
+
+    def subscribe(self, *frame_ids):
+        """Request the given frames from the republisher. The goal is
+        updated after `update_delay`, with all the changes made meanwhile.
+
+        Has no effect unless in republisher mode, where every frame on
+        `/tf` is received anyway.
+
+        Args:
+            *frame_ids (str): The frames to stream.
+        """
+        if not self._republisher:
+            return
+        frames = set(_normalize_frame(f) for f in frame_ids)
+        with self._lock:
+            if frames - self._source_frames:
+                self._source_frames.update(frames)
+                self._request_update()
+
+    def unsubscribe(self, *frame_ids):
+        """Stop streaming the given frames from the republisher.
+
+        Args:
+            *frame_ids (str): The frames to drop.
+        """
+        if not self._republisher:
+            return
+        frames = set(_normalize_frame(f) for f in frame_ids)
+        with self._lock:
+            if frames & self._source_frames:
+                self._source_frames.difference_update(frames)
+                self._request_update()
+
+    def lookup_transform(self, target_frame, source_frame, time=0.0):
+        """Returns the `target_frame` <- `source_frame` transform.
+        See TransformBuffer.lookup_transform.
+        """
+        return self._buffer.lookup_transform(target_frame, source_frame, time)
+
+    def lookup_transforms(self, target_frame, source_frame, times):
+        """Vectorized lookup over many times.
+        See TransformBuffer.lookup_transforms.
+        """
+        return self._buffer.lookup_transforms(target_frame, source_frame, times)
+
+    def transform_points(self, points, target_frame, source_frame, time=0.0):
+        """Transform a batch of points.
+        See TransformBuffer.transform_points.
+        """
+        return self._buffer.transform_points(points, target_frame, source_frame, time)
+
+    def unregister(self):
+        """Stop receiving transforms."""
+        if self._republisher:
+            with self._lock:
+                if self._update_timer is not None:
+                    self._update_timer.cancel()
+                    self._update_timer = None
+                self._source_frames.clear()
+                self._update_goal()
+            self._action_client.unregister()
+        else:
+            self._tf_sub.unregister()
+            self._tf_static_sub.unregister()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+"""Capture of numeric message fields into fixed-size NumPy time series."""
+
+from __future__ import print_function, absolute_import
+import logging
+import threading
+import time
+
+import numpy as np
+
+from .fieldpath import compile_fields, compile_getter, stamp_to_sec
+from .ringbuffer import RingBuffer
+
+logger = logging.getLogger(__name__)
+
+try:
+    basestring
+except NameError:
+    # Python3 compatibility
+    basestring = str
+
+
+class TimeSeries(object):
+    """Subscriber sink that extracts numeric fields of every message into a
+    preallocated ring buffer, with a timestamp per row.
+
+    Field paths are compiled once into a single extractor, so each message
+    costs one function call and a couple of array writes. Memory is fixed
+    by `capacity`. Queries return copies and are safe to run from other
+    threads.
+
+    Messages missing a field, or with a slice shorter than declared, are
+    skipped and counted in `skipped`.
+    """
+
+    def __init__(self, fields, capacity=10000, stamp=None, dtype=np.float64):
+        """Constructor.
+
+        Args:
+            fields (list): Field paths, e.g.
+                `['pose.position.x', 'pose.position.y', 'position[0:6]']`.
+                A slice expands to one column per element and must have an
+                explicit end.
+            capacity (int, optional): Number of rows kept. Defaults to 10000.
+            stamp (str, optional): Path of a ROS time field used as the row
+                timestamp, e.g. `header.stamp`. Defaults to the time the
+                message was received.
+            dtype (numpy.dtype, optional): Value type. Timestamps are
+                always kept as numpy.float64. Defaults to numpy.float64.
+        """
+        if isinstance(fields, basestring):
+            fields = [fields]
+        self._extract, self._columns = compile_fields(fields)
+        self._stamp = None
+        if stamp is not None:
+            self._stamp = compile_getter(stamp)
+        self._times = RingBuffer(capacity, 1, np.float64)
+        self._buffer = RingBuffer(capacity, len(self._columns), dtype)
+        self._row = np.zeros(len(self._columns), dtype=dtype)
+        self._lock = threading.Lock()
+        self._skipped = 0
+
+    @property
+    def columns(self):
+        """Column names, one per extracted value. Getter only property"""
+        return list(self._columns)
+
+    @property
+    def capacity(self):
+        return self._buffer.capacity
+
+    @property
+    def skipped(self):
+        """Number of messages that could not be extracted."""
+        return self._skipped
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def column(self, name):
+        """Returns the index of a column in the values arrays."""
+        return self._columns.index(name)
+
+    def push(self, msg):
+        """Extract a message into the buffer. Called by the Subscriber."""
+        try:
+            stamp = stamp_to_sec(self._stamp(msg)) if self._stamp else time.time()
+            row = self._row
+            row[:] = self._extract(msg)
+        except (KeyError, IndexError, TypeError, ValueError) as exc:
+            self._skipped += 1
+            logger.debug("Skipping message: {}".format(exc))
+            return
+        with self._lock:
+            self._times.append(stamp)
+            self._buffer.append(row)
+
+    def clear(self):
+        with self._lock:
+            self._times.clear()
+            self._buffer.clear()
+
+    def data(self):
+        """Returns all rows.
+
+        Returns:
+            tuple: (times, values) arrays of shape (n,) and (n, columns).
+        """
+        with self._lock:
+            return self._times.view()[:, 0].copy(), self._buffer.view().copy()
+
+    def last(self, n=1):
+        """Returns the newest `n` rows as (times, values), empty if `n`
+        is not positive."""
+        with self._lock:
+            count = len(self._buffer)
+            start = count - min(max(n, 0), count)
+            return (self._times.view()[start:, 0].copy(),
+                    self._buffer.view()[start:].copy())
+
+    def window(self, seconds, end=None):
+        """Returns the rows of the last `seconds`.
+
+        Args:
+            seconds (float): Window length.
+            end (float, optional): Window end time. Defaults to the newest
+                timestamp.
+
+        Returns:
+            tuple: (times, values) arrays.
+        """
+        with self._lock:
+            times = self._times.view()[:, 0]
+            if end is None:
+                end = times[-1] if len(times) else 0.0
+            lo = np.searchsorted(times, end - seconds, side='left')
+            hi = np.searchsorted(times, end, side='right')
+            return times[lo:hi].copy(), self._buffer.view()[lo:hi].copy()
+
+    def mean(self, seconds=None):
+        """Per column mean, over the last `seconds` or over all rows."""
+        if seconds is None:
+            _, values = self.data()
+        else:
+            _, values = self.window(seconds)
+        if len(values) == 0:
+            return np.full(len(self._columns), np.nan)
+        return values.mean(axis=0)
+
+    def resample(self, period, seconds=None):
+        """Linearly interpolate the series onto a uniform time grid.
+
+        Args:
+            period (float): Grid spacing in seconds.
+            seconds (float, optional): Only resample the last `seconds`.
+
+        Returns:
+            tuple: (times, values) arrays on the grid.
+        """
+        if seconds is None:
+            times, values = self.data()
+        else:
+            times, values = self.window(seconds)
+        if len(times) == 0:
+            return times, values
+        grid = np.arange(times[0], times[-1] + period * 0.5, period)
+        out = np.empty((len(grid), values.shape[1]), dtype=values.dtype)
+        for i in range(values.shape[1]):
+            out[:, i] = np.interp(grid, times, values[:, i])
+        return grid, out
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""Tornado backend of the executor class.
+
+Imported on first use of `ExecutorTornado`, so that tornado is only loaded
+by applications that need it.
+"""
+
+from __future__ import print_function, absolute_import
+from ws4py.client.tornadoclient import TornadoWebSocketClient
+from tornado.ioloop import IOLoop
+from .executor import ExecutorBase, logger
+
+
+class ExecutorTornado(ExecutorBase, TornadoWebSocketClient):
+    """Tornado backend implementation of the Executor class."""
+    def __init__(self, *args, **kwargs):
+        """Constructor.
+
+        Warning: there is a known issue regarding resolving localhost to
+        IPv6 address.
+
+        Args:
+            ip (str, optional): Rosbridge instance IPv4/Host address.
+            Defaults to 'localhost'.
+            port (int, optional): Rosbridge instance listening port number.
+            Defaults to 9090.
+        """
+        ioloop = kwargs.pop("ioloop", None)
+        ExecutorBase.__init__(self, *args, **kwargs)
+        TornadoWebSocketClient.__init__(self, self._uri)
+        if ioloop is None:
+            self._ioLoop = IOLoop.current()
+        else:
+            self._ioLoop = ioloop
+
+    @property
+    def IOLoop(self):
+        """Reference to the IOLoop instance. Getter/Setter property."""
+        return self._ioLoop
+
+    @IOLoop.setter
+    def IOLoop(self, ioloop):
+        self._ioLoop = ioloop
+
+    def start(self):
+        """Start executor. Establishes connection to the ROSBridge
+        websocket server
+        """
+        self.connect()
+        if self._ioLoop._running:
+            return
+        logger.info("Starting current IOLoop.")
+        self._ioLoop.start()
+
+    def send_ping(self, data):
+        """Send a websocket ping from the IOLoop thread."""
+        self._ioLoop.add_callback(self.ping, data)
+
+    def abort_connection(self):
+        """Drop the connection from the IOLoop thread."""
+        self._ioLoop.add_callback(self.close_connection)
+
+    def stop(self):
+        """Stop executor and terminate the IOLoop instance."""
+        self.close()
+        logger.info("Terminating current IOLoop")
+        self._ioLoop.stop()
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+
+"""Raw TCP transport, an alternative to the ws4py websocket clients.
+
+rosbridge_tcp, in its default JSON mode, exchanges JSON messages over a
+plain TCP connection, concatenated with no delimiter or length prefix, see
+`JSONStreamCodec`. There is no upgrade handshake, websocket framing or
+masking. `TCPClient` offers the part of the ws4py client interface that
+`ExecutorBase` relies on, so it can be mixed with it the same way, see
+`ExecutorTCP`. The BSON mode of rosbridge_tcp is not supported.
+"""
+
+from __future__ import print_function, absolute_import
+import logging
+import re
+import socket
+import struct
+
+logger = logging.getLogger(__name__)
+
+
+class Message(object):
+    """A received message, with the `data` attribute of the ws4py messages."""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+
+# Bytes that change the state of the JSON scanner, outside and inside strings
+_JSON_TOKENS = re.compile(br'[{}"]')
+_STRING_TOKENS = re.compile(br'["\\]')
+_WHITESPACE = frozenset(b' \t\r\n')
+
+
+class JSONStreamCodec(object):
+    """Splits a stream of concatenated JSON objects, the wire format of
+    rosbridge_tcp in JSON mode. Messages are sent as is.
+
+    The end of an object is found by tracking the nesting of braces outside
+    strings. The scan resumes where it stopped when more bytes arrive, so
+    the parsing state belongs to a single connection, see `reset`.
+    """
+
+    def __init__(self, max_size=1 << 30):
+        """Constructor.
+
+        Args:
+            max_size (int, optional): Max length of a received message, in
+                bytes. Longer ones are a protocol error. Defaults to 1 GiB.
+        """
+        self.max_size = max_size
+        self.reset()
+
+    def reset(self):
+        """Forget the partially scanned message, for a new connection."""
+        # Scanned bytes of the current object, and the state at its end
+        self._scanned = 0
+        self._depth = 0
+        self._in_string = False
+
+    def encode(self, payload):
+        """Returns the frame of a message, its UTF-8 encoding.
+
+        Args:
+            payload (bytes/str): The message.
+        """
+        if not isinstance(payload, bytes):
+            payload = payload.encode('utf-8')
+        return payload
+
+    def split(self, buf, start, end):
+        """Find the first complete message of buf[start:end].
+
+        Args:
+            buf (bytearray): The receive buffer.
+            start (int): Start of the unparsed bytes.
+            end (int): End of the received bytes.
+
+        Returns:
+            tuple: (payload start, frame end) of the message, or (None, 0)
+                if it is not complete yet.
+
+        Raises:
+            ValueError: If the stream is not a sequence of JSON objects, or
+                the message is longer than `max_size`.
+        """
+        while start < end and buf[start] in _WHITESPACE:
+            start += 1
+        if start == end:
+            return None, 0
+        if not self._scanned and buf[start] != 0x7b:
+            raise ValueError("Received data is not a JSON object")
+        pos = start + self._scanned
+        depth = self._depth
+        in_string = self._in_string
+        while True:
+            if in_string:
+                match = _STRING_TOKENS.search(buf, pos, end)
+                if match is None:
+                    pos = end
+                    break
+                pos = match.end()
+                if buf[pos - 1] == 0x5c:
+                    if pos == end:
+                        # Scan the escape again with the escaped byte
+                        pos -= 1
+                        break
+                    pos += 1
+                else:
+                    in_string = False
+            else:
+                match = _JSON_TOKENS.search(buf, pos, end)
+                if match is None:
+                    pos = end
+                    break
+                pos = match.end()
+                token = buf[pos - 1]
+                if token == 0x22:
+                    in_string = True
+                elif token == 0x7b:
+                    depth += 1
+                else:
+                    depth -= 1
+                    if not depth:
+                        self.reset()
+                        return start, pos
+        if pos - start > self.max_size:
+            raise ValueError("Received message exceeds {} bytes".format(self.max_size))
+        self._scanned = pos - start
+        self._depth = depth
+        self._in_string = in_string
+        return None, 0
+
+
+class LengthPrefixCodec(object):
+    """Frames messages with their length as a 4 byte big endian integer.
+
+    Not the wire format of a stock rosbridge_tcp, which streams plain JSON,
+    see `JSONStreamCodec`, but of servers patched to frame messages this
+    way, which spares the scan for the end of each message.
+    """
+
+    header = struct.Struct('!I')
+
+    def __init__(self, max_size=1 << 30):
+        """Constructor.
+
+        Args:
+            max_size (int, optional): Max length of a received message, in
+                bytes. Longer ones are a protocol error. Defaults to 1 GiB.
+        """
+        self.max_size = max_size
+
+    def encode(self, payload):
+        """Returns the frame of a message.
+
+        Args:
+            payload (bytes/str): The message.
+        """
+        if not isinstance(payload, bytes):
+            payload = payload.encode('utf-8')
+        return self.header.pack(len(payload)) + payload
+
+    def reset(self):
+        pass
+
+    def split(self, buf, start, end):
+        """Find the first complete frame of buf[start:end].
+
+        Returns:
+            tuple: (payload start, frame end) of the frame, or (None, size)
+                if it is not complete yet, with the frame size if its
+                header was received, else 0.
+
+        Raises:
+            ValueError: If the message is longer than `max_size`.
+        """
+        header = self.header.size
+        if end - start < header:
+            return None, 0
+        size = self.header.unpack_from(buf, start)[0]
+        if size > self.max_size:
+            raise ValueError("Received message of {} bytes exceeds the limit".format(size))
+        if end - start < header + size:
+            return None, header + size
+        return start + header, start + header + size
+
+
+class FrameBuffer(object):
+    """Receive buffer of a connection.
+
+    Socket reads go straight into a preallocated buffer with `recv_into`,
+    and frames are parsed in place. The only per-message allocation is the
+    copy of its payload. Unparsed bytes are moved to the front of the
+    buffer only when the free space at its end runs out, and the buffer
+    grows for messages larger than itself.
+    """
+
+    def __init__(self, codec, size=65536):
+        codec.reset()
+        self._codec = codec
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+        # Size of the incomplete frame at _start, 0 if not known
+        self._pending = 0
+
+    def __len__(self):
+        """Number of buffered, unparsed bytes."""
+        return self._end - self._start
+
+    @property
+    def capacity(self):
+        return len(self._buf)
+
+    def recv_into(self, sock):
+        """Read available bytes from a socket.
+
+        Returns:
+            int: The number of bytes read, 0 if the peer closed the connection.
+        """
+        if self._end == len(self._buf):
+            self._make_room()
+        n = sock.recv_into(self._view[self._end:])
+        self._end += n
+        return n
+
+    def feed(self, data):
+        """Append bytes, e.g. in tests. Returns the complete messages."""
+        data = memoryview(data)
+        while data:
+            if self._end == len(self._buf):
+                self._make_room()
+            n = min(len(data), len(self._buf) - self._end)
+            self._buf[self._end:self._end + n] = data[:n]
+            self._end += n
+            data = data[n:]
+        return list(self.messages())
+
+    def messages(self):
+        """Yield the payloads of the complete buffered frames."""
+        split = self._codec.split
+        buf = self._buf
+        while self._start < self._end:
+            start, end = split(buf, self._start, self._end)
+            if start is None:
+                self._pending = end
+                break
+            self._pending = 0
+            self._start = end
+            yield bytes(buf[start:end])
+        if self._start == self._end:
+            self._start = self._end = 0
+
+    def _make_room(self):
+        used = self._end - self._start
+        needed = max(self._pending, used + 1)
+        if needed > len(self._buf):
+            size = len(self._buf)
+            while size < needed:
+                size *= 2
+            buf = bytearray(size)
+            buf[:used] = self._buf[self._start:self._end]
+            self._view.release()
+            self._buf = buf
+            self._view = memoryview(buf)
+        else:
+            self._buf[:used] = self._buf[self._start:self._end]
+        self._start = 0
+        self._end = used
+
+
+class TCPClient(object):
+    """Raw TCP client connection to rosbridge_tcp.
+
+    Messages are read by `run_forever`, on the calling thread, and passed
+    to `received_message`. The `opened`, `closed`, `received_message` and
+    `unhandled_error` callbacks are implemented by the executor.
+    """
+
+    def __init__(self, host, port, codec=None, buffer_size=65536):
+        """Constructor.
+
+        Args:
+            host (str): Rosbridge host address.
+            port (int): Rosbridge TCP port.
+            codec (JSONStreamCodec/LengthPrefixCodec, optional): The
+                message framing. Defaults to a JSONStreamCodec.
+            buffer_size (int, optional): Initial size of the receive buffer.
+                Defaults to 64 KiB.
+        """
+        self.host = host
+        self.port = port
+        self.codec = codec or JSONStreamCodec()
+        self.sock = None
+        self.terminated = True
+        self._buffer = FrameBuffer(self.codec, buffer_size)
+        self._close_reason = (1006, 'Going away')
+
+    def connect(self):
+        """Connect to the server. Calls `opened` once connected."""
+        self.sock = socket.create_connection((self.host, self.port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.terminated = False
+        self.opened()
+
+    def send(self, payload, binary=False):
+        """Send a message.
+
+        Args:
+            payload (bytes/str): The message.
+            binary (bool, optional): Unused, all messages are sent as is.
+        """
+        self._write(self.codec.encode(payload))
+
+    def _write(self, b):
+        if self.terminated:
+            raise RuntimeError("Cannot send on a terminated connection")
+        self.sock.sendall(b)
+
+    def run_forever(self):
+        """Read and dispatch messages until the connection is closed."""
+        buffer = self._buffer
+        try:
+            while not self.terminated:
+                try:
+                    if not buffer.recv_into(self.sock):
+                        break
+                except (socket.error, OSError) as exc:
+                    if not self.terminated:
+                        self.unhandled_error(exc)
+                    break
+                try:
+                    for payload in buffer.messages():
+                        self.received_message(Message(payload))
+                except ValueError as exc:
+                    self._close_reason = (1009, str(exc))
+                    break
+        finally:
+            self._terminate()
+
+    def close(self, code=1000, reason=''):
+        """Close the connection. The reader thread then calls `closed`."""
+        if self.terminated:
+            return
+        self.terminated = True
+        self._close_reason = (code, reason)
+        try:
+            # Wakes up the reader blocked in recv_into
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except (socket.error, OSError):
+            pass
+
+    def _terminate(self):
+        self.terminated = True
+        code, reason = self._close_reason
+        try:
+            self.closed(code, reason)
+        finally:
+            try:
+                self.sock.close()
+            except (socket.error, OSError):
+                pass
+
+    def opened(self):
+        pass
+
+    def closed(self, code, reason=None):
+        pass
+
+    def received_message(self, message):
+        pass
+
+    def unhandled_error(self, error):
+        logger.error("Unhandled error: {}".format(error))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""In-process executor used by the offline tests."""
+
+from __future__ import print_function
+import threading
+import time
+import json
+from rosbridge_pyclient.executor import ExecutorBase
+
+
+def split_json_stream(buf):
+    """Split concatenated JSON objects, as rosbridge_tcp reads them.
+
+    Returns:
+        tuple: (messages, unparsed rest of buf).
+    """
+    decoder = json.JSONDecoder()
+    text = buf.decode('utf-8')
+    messages = []
+    pos = 0
+    while True:
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        try:
+            msg, pos = decoder.raw_decode(text, pos)
+        except ValueError:
+            break
+        messages.append(msg)
+    return messages, text[pos:].encode('utf-8')
+
+
+class FakeMessage(object):
+    def __init__(self, data):
+        self.data = json.dumps(data)
+
+
+class LoopbackExecutor(ExecutorBase):
+    """Executor that records outgoing frames instead of sending them.
+
+    If `responder` is given, it is called with every outgoing
+    `call_service` frame and returns (delay, result, values), or None to
+    never respond.
+    """
+    def __init__(self, *args, **kwargs):
+        self._responder = kwargs.pop('responder', None)
+        ExecutorBase.__init__(self, *args, **kwargs)
+        self.sent = []
+        self.cond = threading.Condition()
+
+    def send(self, payload, binary=False):
+        data = json.loads(payload)
+        with self.cond:
+            self.sent.append(data)
+            self.cond.notify_all()
+        if data['op'] == 'call_service' and self._responder is not None:
+            response = self._responder(data)
+            if response is not None:
+                delay, result, values = response
+                timer = threading.Timer(delay, self.inject, [{
+                    'op': 'service_response', 'service': data['service'],
+                    'id': data['id'], 'result': result, 'values': values}])
+                timer.daemon = True
+                timer.start()
+
+    def inject(self, data):
+        """Feed a frame as if it was received from rosbridge."""
+        self.received_message(FakeMessage(data))
+
+    def wait_for(self, op, count, timeout=2.0):
+        deadline = time.time() + timeout
+        with self.cond:
+            while True:
+                frames = [m for m in self.sent if m['op'] == op]
+                if len(frames) >= count or time.time() > deadline:
+                    return frames
+                self.cond.wait(0.05)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import time
+import json
+import struct
+import zlib
+from rosbridge_pyclient import Executor, Publisher, Subscriber, PerMessageDeflate
+from rosbridge_pyclient.deflate import FrameInflater
+
+
+def server_frame(payload, opcode=0x1, rsv1=False, fin=True):
+    first = (0x80 if fin else 0) | (0x40 if rsv1 else 0) | opcode
+    n = len(payload)
+    if n < 126:
+        return struct.pack("!BB", first, n) + payload
+    if n < 65536:
+        return struct.pack("!BBH", first, 126, n) + payload
+    return struct.pack("!BBQ", first, 127, n) + payload
+
+
+def parse_frames(data):
+    """Split unmasked client frames into (rsv1, payload) tuples."""
+    frames = []
+    while data:
+        rsv1 = bool(data[0] & 0x40)
+        length = data[1] & 0x7f
+        pos = 2
+        if length == 126:
+            length = struct.unpack_from("!H", data, 2)[0]
+            pos = 4
+        elif length == 127:
+            length = struct.unpack_from("!Q", data, 2)[0]
+            pos = 10
+        frames.append((rsv1, data[pos:pos + length]))
+        data = data[pos + length:]
+    return frames
+
+
+class WriteRecordingExecutor(Executor):
+    """Executor that records socket writes instead of sending them."""
+    def __init__(self, *args, **kwargs):
+        Executor.__init__(self, *args, **kwargs)
+        self.writes = []
+
+    def _write(self, b):
+        self.writes.append(b)
+
+
+def joint_state(seq):
+    return {'header': {'seq': seq, 'frame_id': 'base_link'},
+            'name': ['joint_{}'.format(i) for i in range(50)],
+            'position': [0.0] * 50, 'velocity': [0.0] * 50}
+
+
+class DeflateTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._deflate = PerMessageDeflate(threshold=256, topics={'/chatter': False})
+        self._exec = WriteRecordingExecutor(compression=self._deflate)
+        self._exec.stream.always_mask = False
+        self._exec.extensions = [b'permessage-deflate; client_max_window_bits=12']
+        self._exec.opened()
+        # Server side codecs
+        self._inflate = zlib.decompressobj(-15)
+        self._compress = zlib.compressobj(6, zlib.DEFLATED, -15)
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def sent(self):
+        frames = []
+        for rsv1, payload in parse_frames(b''.join(self._exec.writes)):
+            if rsv1:
+                payload = self._inflate.decompress(payload + b'\x00\x00\xff\xff')
+            frames.append((rsv1, json.loads(payload.decode('utf-8'))))
+        del self._exec.writes[:]
+        return frames
+
+    def compressed(self, data):
+        payload = json.dumps(data).encode('utf-8')
+        return self._compress.compress(payload) + self._compress.flush(zlib.Z_SYNC_FLUSH)[:-4]
+
+    def test_offer(self):
+        headers = dict(self._exec.handshake_headers)
+        self.assertEqual(headers['Sec-WebSocket-Extensions'],
+                         'permessage-deflate; client_max_window_bits=15')
+        self.assertTrue(self._deflate.enabled)
+        declined = PerMessageDeflate()
+        self.assertFalse(declined.negotiate([b'x-webkit-deflate-frame']))
+
+    def test_send_rule(self):
+        odom = Publisher(self._exec, '/odom', 'sensor_msgs/JointState')
+        chatter = Publisher(self._exec, '/chatter', 'sensor_msgs/JointState')
+        self.sent()
+        for seq in range(3):
+            odom.publish(joint_state(seq))
+        odom.publish({'data': 'small'})
+        chatter.publish(joint_state(3))
+        frames = self.sent()
+        # Context takeover: the stream inflates in order across messages
+        self.assertEqual([m['msg']['header']['seq'] for _, m in frames[:3]], [0, 1, 2])
+        self.assertEqual([rsv1 for rsv1, _ in frames], [True, True, True, False, False])
+        stats = self._deflate.stats
+        self.assertEqual(stats.compressed, 3)
+        self.assertGreater(stats.ratio, 5)
+        self.assertGreater(stats.compress_seconds, 0)
+
+    def test_send_many(self):
+        self._exec.register_many(
+            publish=[("/pub/{}".format(i), "sensor_msgs/JointState") for i in range(20)])
+        self.assertEqual(len(self._exec.writes), 1)
+        frames = self.sent()
+        self.assertEqual([m['topic'] for _, m in frames],
+                         ["/pub/{}".format(i) for i in range(20)])
+
+    def test_receive(self):
+        received = []
+        Subscriber(self._exec, '/odom', 'sensor_msgs/JointState', received.append)
+        data = b''
+        for seq in range(3):
+            data += server_frame(self.compressed(
+                {'op': 'publish', 'topic': '/odom', 'msg': joint_state(seq)}), rsv1=True)
+        data += server_frame(json.dumps(
+            {'op': 'publish', 'topic': '/odom', 'msg': {'plain': True}}).encode('utf-8'))
+        # Fed in small reads, as from the socket
+        for i in range(0, len(data), 7):
+            self.assertTrue(self._exec.process(data[i:i + 7]))
+        self.assertEqual([m.get('header', {}).get('seq') for m in received], [0, 1, 2, None])
+        self.assertEqual(self._deflate.stats.inflated, 3)
+
+    def test_fragmented(self):
+        inflater = FrameInflater(self._deflate)
+        payload = self.compressed({'op': 'publish', 'topic': '/odom', 'msg': joint_state(0)})
+        half = len(payload) // 2
+        data = (server_frame(payload[:half], rsv1=True, fin=False) +
+                server_frame(b'ping', opcode=0x9) +
+                server_frame(payload[half:], opcode=0x0))
+        frames = inflater.feed(data)
+        self.assertEqual(len(frames), 2)
+        # The ping passes through, the message is rebuilt as one plain frame
+        self.assertEqual(frames[0], server_frame(b'ping', opcode=0x9))
+        self.assertEqual(frames[1][0], 0x81)
+        self.assertEqual(inflater.needed, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
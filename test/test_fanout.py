@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import time
+from rosbridge_pyclient.fleet import call_service_all
+from loopback import LoopbackExecutor
+
+
+class FanoutTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_parallel_gather(self):
+        executors = [LoopbackExecutor(responder=lambda req, d=0.02 * i: (d, True, {"robot": d}))
+                     for i in range(10)]
+        start = time.time()
+        results = list(call_service_all(executors, "/rosapi/nodes", "rosapi/Nodes", {}, timeout=2))
+        elapsed = time.time() - start
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(r.success for r in results))
+        # Results arrive fastest first and total time tracks the slowest robot.
+        self.assertEqual([r.executor for r in results], executors)
+        self.assertLess(elapsed, 0.5)
+
+    def test_partial_results_on_timeout(self):
+        fast = LoopbackExecutor(responder=lambda req: (0.0, True, {}))
+        dead = LoopbackExecutor(responder=lambda req: None)
+        results = list(call_service_all([dead, fast], "/health", "std_srvs/Trigger", {}, timeout=0.2))
+        self.assertEqual(results[0].executor, fast)
+        self.assertFalse(results[0].timed_out)
+        self.assertEqual(results[1].executor, dead)
+        self.assertTrue(results[1].timed_out)
+        self.assertEqual(dead.protocol.service_clients, {})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
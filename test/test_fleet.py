@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import socket
+import time
+from rosbridge_pyclient.fleet import FleetManager, ConnectionHealth
+from loopback import LoopbackExecutor
+
+
+class StandinExecutor(object):
+    """Executor stand-in on one end of a socketpair, driven by the fleet
+    poller. A frame starting with b'big' announces an oversized message."""
+    def __init__(self, fail_connect=False):
+        self.sock, self.peer = socket.socketpair()
+        self.fail_connect = fail_connect
+        self.remote_uri = 'ws://standin-{}:9090'.format(self.sock.fileno())
+        self.terminated = False
+        self.is_opened = False
+        self.reading_buffer_size = 0
+        self.received = []
+        self.close_code = None
+
+    def connect(self):
+        if self.fail_connect:
+            raise socket.error("Connection refused")
+
+    def opened(self):
+        self.is_opened = True
+
+    def once(self):
+        data = self.sock.recv(4096)
+        if not data:
+            return False
+        self.received.append(data)
+        if data.startswith(b'big'):
+            self.reading_buffer_size = 1 << 20
+        return True
+
+    def close(self, code=1000, reason=''):
+        self.close_code = code
+
+    def terminate(self):
+        self.terminated = True
+        self.sock.close()
+        self.peer.close()
+
+
+class FleetLoopback(LoopbackExecutor):
+    # Not connected, so never registered with the poller
+    sock = None
+
+
+class ListSink(object):
+    def __init__(self):
+        self.messages = []
+
+    def push(self, msg):
+        self.messages.append(msg)
+
+
+def _wait(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class FleetManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._fleet = FleetManager(poll_timeout=0.01, max_message_size=1024,
+                                   stale_after=0.1)
+        self._fleet.start()
+
+    def tearDown(self):
+        self._fleet.running = False
+        self._fleet.join(1.0)
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def _states(self):
+        return dict((h['uri'], h['state']) for h in self._fleet.health())
+
+    def test_connect_all(self):
+        executors = [StandinExecutor(fail_connect=(i % 3 == 0)) for i in range(9)]
+        failed = self._fleet.connect_all(executors, parallel=4)
+        self.assertEqual(set(failed), set(executors[::3]))
+        managed = [e for e in executors if e not in failed]
+        self.assertEqual(set(self._fleet.executors), set(managed))
+        self.assertTrue(all(e.is_opened for e in managed))
+        self.assertEqual(len(self._fleet.health()), 6)
+
+    def test_health_states(self):
+        up, quiet, lost = [StandinExecutor() for _ in range(3)]
+        self._fleet.connect_all([up, quiet, lost])
+        up.peer.sendall(b'{}')
+        self.assertTrue(_wait(lambda: up.received))
+        self.assertEqual(self._states()[up.remote_uri], ConnectionHealth.UP)
+        time.sleep(0.15)
+        up.peer.sendall(b'{}')
+        self.assertTrue(_wait(lambda: len(up.received) == 2))
+        lost.peer.close()
+        self.assertTrue(_wait(lambda: lost.terminated))
+        states = self._states()
+        self.assertEqual(states[up.remote_uri], ConnectionHealth.UP)
+        self.assertEqual(states[quiet.remote_uri], ConnectionHealth.STALE)
+        self.assertEqual(states[lost.remote_uri], ConnectionHealth.DOWN)
+        # The end of stream is not counted as a read
+        reads = dict((h['uri'], h['reads']) for h in self._fleet.health())
+        self.assertEqual(reads[up.remote_uri], 2)
+        self.assertEqual(reads[lost.remote_uri], 0)
+        self.assertNotIn(lost, self._fleet.executors)
+        self._fleet.remove(lost)
+        self._fleet.remove(quiet)
+        self.assertEqual(list(self._states()), [up.remote_uri])
+        self.assertEqual(self._fleet.executors, [up])
+
+    def test_oversized_message(self):
+        big, small = StandinExecutor(), StandinExecutor()
+        self._fleet.connect_all([big, small])
+        big.peer.sendall(b'big')
+        small.peer.sendall(b'{}')
+        self.assertTrue(_wait(lambda: big.terminated and small.received))
+        self.assertEqual(big.close_code, 1009)
+        self.assertEqual(self._fleet.executors, [small])
+        self.assertEqual(self._states()[big.remote_uri], ConnectionHealth.DOWN)
+
+
+    def test_endpoints(self):
+        first, second = FleetLoopback(), FleetLoopback()
+        executors = [first, second]
+        self._fleet.subscribe('/status', 'std_msgs/String', lambda e, m: None,
+                              executors=executors)
+        publishers = self._fleet.advertise('/cmd', 'std_msgs/String', executors=executors)
+        sink = ListSink()
+        publishers[0].add_sink(sink)
+        self.assertEqual(self._fleet.publish('/cmd', 'std_msgs/String', {'data': 'go'},
+                                             executors=executors), [])
+        # Sent through the fleet publisher of each executor
+        for executor, publisher in zip(executors, publishers):
+            frame = executor.wait_for('publish', 1)[0]
+            self.assertEqual(frame['id'], 'publish:/cmd:{}'.format(publisher.id))
+            self.assertEqual(len(executor.wait_for('advertise', 1)), 1)
+        self.assertEqual(sink.messages, [{'data': 'go'}])
+        self._fleet.remove(first)
+        self.assertEqual(list(self._fleet._publishers), [(second, '/cmd')])
+        self.assertEqual([sub._executor for sub in self._fleet._subscribers['/status']],
+                         [second])
+        self._fleet.unsubscribe('/status')
+        self._fleet.unadvertise('/cmd')
+        self.assertEqual(len(second.wait_for('unadvertise', 1)), 1)
+        self.assertEqual(first.wait_for('unadvertise', 1, timeout=0.05), [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import threading
+import time
+from rosbridge_pyclient import (ActionClient, Goal, GoalStatus, GoalTimeoutError,
+                                wait_any, wait_all)
+from loopback import LoopbackExecutor
+
+
+def _finish(goal, delay, status=GoalStatus.SUCCEEDED):
+    def _run():
+        time.sleep(delay)
+        goal.result_received({'sequence': [0, 1, 1]},
+                             {'status': status, 'goal_id': {'id': goal.id}})
+    t = threading.Thread(target=_run)
+    t.daemon = True
+    t.start()
+    return t
+
+
+class GoalFutureTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_result_blocks_until_done(self):
+        goal = Goal({'order': 3})
+        _finish(goal, 0.05)
+        self.assertEqual(goal.result(timeout=2), {'sequence': [0, 1, 1]})
+        self.assertTrue(goal.done())
+        self.assertEqual(goal.status, GoalStatus.SUCCEEDED)
+
+    def test_result_timeout(self):
+        goal = Goal({'order': 3})
+        self.assertRaises(GoalTimeoutError, goal.result, 0.05)
+
+    def test_wait_any(self):
+        goals = [Goal({'order': i}) for i in range(50)]
+        _finish(goals[17], 0.05)
+        done, not_done = wait_any(goals, timeout=2)
+        self.assertEqual(done, [goals[17]])
+        self.assertEqual(len(not_done), 49)
+
+    def test_wait_all(self):
+        goals = [Goal({'order': i}) for i in range(20)]
+        for i, goal in enumerate(goals):
+            _finish(goal, 0.001 * i)
+        done, not_done = wait_all(goals, timeout=2)
+        self.assertEqual(len(done), 20)
+        self.assertEqual(not_done, [])
+
+    def test_wait_all_timeout(self):
+        goals = [Goal({'order': i}) for i in range(3)]
+        _finish(goals[0], 0.01)
+        done, not_done = wait_all(goals, timeout=0.1)
+        self.assertEqual(done, [goals[0]])
+        self.assertEqual(not_done, goals[1:])
+
+    def test_done_callback_and_cancelled(self):
+        goal = Goal({'order': 3})
+        seen = []
+        goal.add_done_callback(seen.append)
+        _finish(goal, 0.01, GoalStatus.PREEMPTED).join()
+        self.assertEqual(seen, [goal])
+        self.assertTrue(goal.cancelled())
+        self.assertFalse(goal.cancel())
+
+
+def _status(goal, code):
+    return {'goal_id': {'id': goal.id, 'stamp': {'secs': 0, 'nsecs': 0}}, 'status': code}
+
+
+class ActionClientTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._exec = LoopbackExecutor()
+        self._client = ActionClient(self._exec, '/fibonacci', 'actionlib_tutorials/Fibonacci',
+                                    history_size=2, result_grace=0.05)
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def _inject(self, suffix, msg):
+        self._exec.inject({'op': 'publish', 'topic': '/fibonacci/' + suffix, 'msg': msg})
+
+    def test_indexed_status(self):
+        statuses = []
+        goals = [Goal({'order': i}, on_status=lambda s, header: statuses.append(s))
+                 for i in range(3)]
+        for goal in goals:
+            self._client.send_goal(goal)
+        self.assertEqual(len(self._exec.wait_for('publish', 3)), 3)
+        self.assertIs(self._client.get_goal(goals[1].id), goals[1])
+        status_list = [_status(goals[2], GoalStatus.ACTIVE), _status(goals[0], GoalStatus.PENDING)]
+        self._inject('status', {'status_list': status_list})
+        self.assertEqual(goals[0].status, GoalStatus.PENDING)
+        self.assertIsNone(goals[1].status)
+        self.assertEqual(goals[2].status, GoalStatus.ACTIVE)
+        # Each listed goal gets the whole status list
+        self.assertEqual(statuses, [status_list, status_list])
+
+    def test_evict_on_result(self):
+        goals = [self._client.send_goal(Goal({'order': i})) for i in range(4)]
+        for goal in goals:
+            self._inject('result', {'status': _status(goal, GoalStatus.SUCCEEDED),
+                                    'result': {'sequence': [0]}})
+        self.assertEqual(self._client.active_goals, 0)
+        self.assertEqual(list(self._client._history), [goals[2].id, goals[3].id])
+        self.assertIsNone(self._client.get_goal(goals[0].id))
+        self.assertIs(self._client.get_goal(goals[3].id), goals[3])
+
+    def test_evict_on_terminal_status(self):
+        aborted = self._client.send_goal(Goal({'order': 1}))
+        active = self._client.send_goal(Goal({'order': 2}))
+        status_list = [_status(aborted, GoalStatus.ABORTED), _status(active, GoalStatus.ACTIVE)]
+        self._inject('status', {'status_list': status_list})
+        # Kept during the grace period, for the result message
+        self.assertEqual(self._client.active_goals, 2)
+        time.sleep(0.1)
+        self._inject('status', {'status_list': status_list})
+        self.assertEqual(self._client.active_goals, 1)
+        self.assertIs(self._client.get_goal(aborted.id), aborted)
+        self.assertEqual(self._client._terminal, {})
+
+    def test_terminal_status_without_result(self):
+        results = []
+        goals = [Goal({'order': i}, on_result=lambda r, s, h: results.append(r))
+                 for i in range(3)]
+        for goal in goals:
+            self._client.send_goal(goal)
+        codes = [GoalStatus.REJECTED, GoalStatus.PREEMPTED, GoalStatus.SUCCEEDED]
+        status_list = [_status(goal, code) for goal, code in zip(goals, codes)]
+        self._inject('status', {'status_list': status_list})
+        # The result message of the last goal arrives during the grace period
+        self._inject('result', {'status': status_list[2], 'result': {'sequence': [0, 1]}})
+        self.assertFalse(goals[0].done())
+        time.sleep(0.1)
+        self._inject('status', {'status_list': []})
+        done, not_done = wait_all(goals, timeout=1)
+        self.assertEqual(not_done, [])
+        self.assertIsNone(goals[0].result())
+        self.assertEqual(goals[0].status, GoalStatus.REJECTED)
+        self.assertTrue(goals[1].cancelled())
+        self.assertEqual(goals[2].result(), {'sequence': [0, 1]})
+        self.assertEqual(results, [{'sequence': [0, 1]}, None, None])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import threading
+import time
+from rosbridge_pyclient.graph import GraphWatcher, GraphChange, NodeInfo
+from loopback import LoopbackExecutor
+
+
+class FakeRosapi(object):
+    """rosapi responder of a LoopbackExecutor, serving a mutable graph."""
+    def __init__(self, types=True):
+        self.types = types
+        self.down = False
+        # Nodes whose details are not served
+        self.failing = set()
+        self.calls = []
+        self.topics = {'/chatter': 'std_msgs/String', '/rosout': 'rosgraph_msgs/Log'}
+        self.nodes = {
+            '/talker': {'publishing': ['/chatter', '/rosout'], 'subscribing': [],
+                        'services': ['/talker/get_loggers']},
+            '/listener': {'publishing': ['/rosout'], 'subscribing': ['/chatter'],
+                          'services': []},
+        }
+
+    def __call__(self, request):
+        service, args = request['service'], request['args']
+        self.calls.append(service)
+        if self.down:
+            return None
+        if service == '/rosapi/topics':
+            values = {'topics': sorted(self.topics)}
+            if self.types:
+                values['types'] = [self.topics[t] for t in values['topics']]
+        elif service == '/rosapi/nodes':
+            values = {'nodes': sorted(self.nodes)}
+        elif service == '/rosapi/services':
+            values = {'services': sorted(s for n in self.nodes.values() for s in n['services'])}
+        elif service == '/rosapi/node_details':
+            if args['node'] in self.failing:
+                return None
+            values = self.nodes[args['node']]
+        elif service == '/rosapi/topic_type':
+            values = {'type': self.topics[args['topic']]}
+        else:
+            return None
+        return 0, True, values
+
+
+class GraphWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._rosapi = FakeRosapi()
+        self._exec = LoopbackExecutor(responder=self._rosapi)
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_snapshot(self):
+        watcher = GraphWatcher(self._exec)
+        changes = watcher.refresh()
+        self.assertEqual(len(changes), 5)
+        self.assertTrue(all(c.change == 'added' for c in changes))
+        self.assertEqual(watcher.topic_type('/chatter'), 'std_msgs/String')
+        self.assertEqual(watcher.publishers('/rosout'), ('/listener', '/talker'))
+        self.assertEqual(watcher.subscribers('/chatter'), ('/listener',))
+        self.assertEqual(watcher.services(), {'/talker/get_loggers': '/talker'})
+        self.assertEqual(watcher.nodes()['/listener'],
+                         NodeInfo(('/rosout',), ('/chatter',), ()))
+        self.assertEqual(watcher.calls, 5)
+
+    def test_incremental(self):
+        watcher = GraphWatcher(self._exec)
+        watcher.refresh()
+        del self._rosapi.calls[:]
+        # Unchanged lists, node details are not fetched again
+        self.assertEqual(watcher.refresh(), [])
+        self.assertEqual(len(self._rosapi.calls), 3)
+        self._rosapi.topics['/odom'] = 'nav_msgs/Odometry'
+        self._rosapi.nodes['/talker']['publishing'].append('/odom')
+        self._rosapi.topics['/chatter'] = 'std_msgs/Header'
+        del self._rosapi.nodes['/listener']
+        changes = watcher.refresh()
+        self.assertEqual([(c.kind, c.name, c.change) for c in changes], [
+            ('topic', '/chatter', 'changed'), ('topic', '/odom', 'added'),
+            ('node', '/listener', 'removed'), ('node', '/talker', 'changed')])
+        self.assertEqual(changes[0], GraphChange(
+            'topic', '/chatter', 'changed', 'std_msgs/String', 'std_msgs/Header'))
+        self.assertEqual(watcher.subscribers('/chatter'), ())
+
+    def test_failed_details(self):
+        self._rosapi.failing.add('/listener')
+        watcher = GraphWatcher(self._exec, timeout=0.05, full_refresh=0)
+        watcher.refresh()
+        self.assertEqual(watcher.nodes()['/listener'], NodeInfo(None, None, None))
+        self.assertEqual(watcher.subscribers('/chatter'), ())
+        # Retried at the next refresh, without a full refresh
+        self._rosapi.failing.clear()
+        del self._rosapi.calls[:]
+        changes = watcher.refresh()
+        self.assertEqual([(c.name, c.change) for c in changes], [('/listener', 'changed')])
+        self.assertEqual(self._rosapi.calls.count('/rosapi/node_details'), 1)
+        self.assertEqual(watcher.subscribers('/chatter'), ('/listener',))
+        for _ in range(3):
+            watcher.refresh()
+        self.assertEqual(self._rosapi.calls.count('/rosapi/node_details'), 1)
+        with self.assertRaises(ValueError):
+            GraphWatcher(self._exec, full_refresh=-1)
+
+    def test_topic_types(self):
+        self._rosapi.types = False
+        watcher = GraphWatcher(self._exec, details=False)
+        watcher.refresh()
+        self.assertEqual(watcher.topic_type('/rosout'), 'rosgraph_msgs/Log')
+        self.assertEqual(self._rosapi.calls.count('/rosapi/topic_type'), 2)
+        self.assertNotIn('/rosapi/node_details', self._rosapi.calls)
+        self._rosapi.topics['/odom'] = 'nav_msgs/Odometry'
+        watcher.refresh()
+        self.assertEqual(self._rosapi.calls.count('/rosapi/topic_type'), 3)
+
+    def test_no_response(self):
+        watcher = GraphWatcher(self._exec, timeout=0.05)
+        watcher.refresh()
+        self._rosapi.down = True
+        self.assertIsNone(watcher.refresh())
+        self.assertIn('/chatter', watcher.topics())
+        self.assertEqual(self._exec.protocol.service_clients, {})
+
+    def test_background(self):
+        watcher = GraphWatcher(self._exec, min_interval=0.01, max_interval=0.04)
+        changes = []
+        changed = threading.Event()
+
+        def _listener(change):
+            changes.append(change)
+            if change.name == '/odom':
+                changed.set()
+        watcher.add_listener(_listener)
+        watcher.start()
+        self.assertTrue(watcher.wait_ready(1.0))
+        time.sleep(0.15)
+        self.assertEqual(watcher.interval, 0.04)
+        self._rosapi.topics['/odom'] = 'nav_msgs/Odometry'
+        watcher.wakeup()
+        self.assertTrue(changed.wait(1.0))
+        watcher.stop()
+        self.assertEqual(len(changes), 6)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
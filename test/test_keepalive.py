@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import time
+import socket
+import threading
+from rosbridge_pyclient import ExecutorTCP, Publisher, Subscriber, ServiceClient
+from rosbridge_pyclient.keepalive import Keepalive
+from rosbridge_pyclient.metrics import Histogram
+from loopback import split_json_stream
+
+
+class PingRecorder(object):
+    """Executor stand-in of the Keepalive thread."""
+    remote_uri = 'ws://test'
+
+    def __init__(self, answer=True):
+        self.keepalive = None
+        self.answer = answer
+        self.pings = []
+        self.aborted = threading.Event()
+
+    def send_ping(self, data):
+        self.pings.append(data)
+        if self.answer:
+            self.keepalive.ponged(data.encode('ascii'))
+
+    def abort_connection(self):
+        self.aborted.set()
+
+
+class ReconnectingTCPServer(threading.Thread):
+    """rosbridge_tcp stand-in accepting `connections` connections in turn.
+    The first connection is dropped after `drop_after` received frames."""
+    def __init__(self, connections=2, drop_after=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(1)
+        self.port = self.listener.getsockname()[1]
+        self.connections = connections
+        self.drop_after = drop_after
+        self.received = []
+
+    def run(self):
+        for _ in range(self.connections):
+            conn, _ = self.listener.accept()
+            frames = []
+            self.received.append(frames)
+            buf = b''
+            drop_after = self.drop_after if len(self.received) == 1 else None
+            while drop_after is None or len(frames) < drop_after:
+                data = conn.recv(65536)
+                if not data:
+                    break
+                messages, buf = split_json_stream(buf + data)
+                frames.extend(messages)
+            conn.close()
+        self.listener.close()
+
+
+class KeepaliveTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_histogram(self):
+        hist = Histogram(bounds=(0.001, 0.01, 0.1))
+        self.assertIsNone(hist.percentile(50))
+        for value in (0.0005, 0.002, 0.003, 0.05, 0.5):
+            hist.record(value)
+        self.assertEqual(hist.buckets, [1, 2, 1, 1])
+        self.assertEqual(hist.percentile(50), 0.01)
+        self.assertEqual(hist.percentile(100), 0.5)
+        snapshot = hist.snapshot()
+        self.assertEqual((snapshot['count'], snapshot['min'], snapshot['last']), (5, 0.0005, 0.5))
+        self.assertAlmostEqual(hist.mean, 0.1111)
+
+    def test_rtt(self):
+        executor = PingRecorder()
+        keepalive = executor.keepalive = Keepalive(interval=0.02, max_missed=2)
+        keepalive.start(executor)
+        time.sleep(0.15)
+        keepalive.stop()
+        self.assertGreaterEqual(keepalive.rtt.count, 3)
+        self.assertEqual(keepalive.rtt.count, len(executor.pings))
+        self.assertEqual(keepalive.missed, 0)
+        self.assertFalse(executor.aborted.is_set())
+
+    def test_dead_link(self):
+        executor = PingRecorder(answer=False)
+        keepalive = executor.keepalive = Keepalive(interval=0.02, max_missed=3)
+        keepalive.start(executor)
+        self.assertTrue(executor.aborted.wait(1.0))
+        self.assertEqual((keepalive.missed, keepalive.dead_links), (3, 1))
+        self.assertEqual(keepalive.rtt.count, 0)
+        # Received data keeps the link alive without pongs
+        executor = PingRecorder(answer=False)
+        keepalive = executor.keepalive = Keepalive(interval=0.02, max_missed=2)
+        keepalive.start(executor)
+        for _ in range(10):
+            keepalive.touched = True
+            time.sleep(0.01)
+        keepalive.stop()
+        self.assertFalse(executor.aborted.is_set())
+
+
+class ReconnectTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def _executor(self, server, **kwargs):
+        server.start()
+        executor = ExecutorTCP(port=server.port, reconnect=True, **kwargs)
+        executor.RECONNECT_DELAY = 0.01
+        opened = threading.Semaphore(0)
+        executor._bind_callbacks(onopen=opened.release)
+        executor.start()
+        return executor, opened
+
+    def test_restore_registrations(self):
+        # The first connection is dropped after the advertise and subscribe
+        server = ReconnectingTCPServer(connections=2, drop_after=2)
+        executor, opened = self._executor(server)
+        Publisher(executor, "/cmd", "std_msgs/String")
+        sub = Subscriber(executor, "/odom", "std_msgs/String", lambda msg: None)
+        self.assertTrue(opened.acquire(timeout=2.0))
+        self.assertTrue(opened.acquire(timeout=2.0))
+        deadline = time.time() + 2.0
+        while len(server.received) < 2 or len(server.received[1]) < 2:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+        first, second = server.received
+        self.assertEqual([f['op'] for f in second], ['advertise', 'subscribe'])
+        self.assertEqual(first[1]['id'], second[1]['id'])
+        sub.unregister()
+        executor.close()
+        server.join(2.0)
+
+    def test_abort_and_close(self):
+        server = ReconnectingTCPServer(connections=2)
+        executor, opened = self._executor(server, keepalive=Keepalive(interval=1))
+        self.assertTrue(opened.acquire(timeout=2.0))
+        self.assertEqual(executor.sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE), 1)
+        executor.abort_connection()
+        self.assertTrue(opened.acquire(timeout=2.0))
+        # A connection closed by the client is not reestablished
+        executor.close()
+        server.join(2.0)
+        self.assertFalse(server.is_alive())
+        time.sleep(0.1)
+        self.assertFalse(opened.acquire(timeout=0.1))
+
+
+    def test_pending_calls_fail(self):
+        # The connection is dropped after the service call is received
+        server = ReconnectingTCPServer(connections=2, drop_after=1)
+        executor, opened = self._executor(server)
+        self.assertTrue(opened.acquire(timeout=2.0))
+        results = []
+        failed = threading.Event()
+
+        def _clb(success, values):
+            results.append((success, values))
+            failed.set()
+        ServiceClient(executor, "/slow", "std_srvs/Trigger").call({}, _clb)
+        self.assertTrue(failed.wait(2.0))
+        self.assertFalse(results[0][0])
+        self.assertEqual(executor.protocol.service_clients, {})
+        self.assertTrue(opened.acquire(timeout=2.0))
+        executor.close()
+        server.join(2.0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
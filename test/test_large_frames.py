@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import base64
+import json
+import time
+import numpy as np
+from rosbridge_pyclient import Subscriber
+from rosbridge_pyclient.largeframe import LargeFrameDecoder
+from loopback import LoopbackExecutor
+
+
+def occupancy_grid(width, height):
+    cells = [(i % 202) - 1 for i in range(width * height)]
+    return {'op': 'publish', 'topic': '/map', 'msg': {
+        'header': {'frame_id': 'map', 'stamp': {'secs': 1, 'nsecs': 2}},
+        'info': {'width': width, 'height': height, 'resolution': 0.05,
+                 'origin': {'position': {'x': -10.0, 'y': -10.0, 'z': 0.0}}},
+        'data': cells}}
+
+
+class LargeFrameDecoderTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        # Small chunks, to cross chunk boundaries
+        self._decoder = LargeFrameDecoder(min_size=0, min_array=64, chunk_size=100)
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_numeric_arrays(self):
+        frame = occupancy_grid(40, 30)
+        frame['msg']['ranges'] = [i * 0.25 for i in range(300)]
+        frame['msg']['small'] = [1, 2, 3]
+        data = self._decoder.loads(json.dumps(frame))
+        msg = data['msg']
+        self.assertEqual(msg['data'].dtype, np.int64)
+        self.assertEqual(msg['data'].tolist(), frame['msg']['data'])
+        self.assertEqual(msg['ranges'].dtype, np.float64)
+        self.assertEqual(msg['ranges'].tolist(), frame['msg']['ranges'])
+        self.assertEqual(msg['small'], [1, 2, 3])
+        self.assertEqual(msg['info'], frame['msg']['info'])
+        self.assertEqual(self._decoder.decoded, 1)
+
+    def test_dtypes(self):
+        decoder = LargeFrameDecoder(min_size=0, min_array=64, dtypes={'/map': {'data': np.int8}})
+        data = decoder.loads(json.dumps(occupancy_grid(20, 20)).encode('utf-8'))
+        self.assertEqual(data['msg']['data'].dtype, np.int8)
+        self.assertEqual(data['msg']['data'][0], -1)
+        # Other topics keep the default dtype
+        frame = occupancy_grid(20, 20)
+        frame['topic'] = '/costmap'
+        self.assertEqual(decoder.loads(json.dumps(frame))['msg']['data'].dtype, np.int64)
+
+    def test_base64(self):
+        decoder = LargeFrameDecoder(min_size=0, min_array=64, chunk_size=100,
+                                    base64_fields={'/points': ('data',)})
+        points = np.arange(1000, dtype=np.float32)
+        frame = {'op': 'publish', 'topic': '/points', 'msg': {
+            'fields': [{'name': 'x', 'offset': 0, 'datatype': 7, 'count': 1}],
+            'data': base64.b64encode(points.tobytes()).decode('ascii')}}
+        data = decoder.loads(json.dumps(frame))
+        self.assertEqual(data['msg']['data'].dtype, np.uint8)
+        self.assertTrue((data['msg']['data'].view(np.float32) == points).all())
+        self.assertEqual(data['msg']['fields'], frame['msg']['fields'])
+        # Other long strings are left alone
+        frame['msg']['text'] = 'A' * 200
+        self.assertEqual(decoder.loads(json.dumps(frame))['msg']['text'], 'A' * 200)
+        # Not decoded by default
+        self.assertIsInstance(self._decoder.loads(json.dumps(frame))['msg']['data'], str)
+
+    def test_string_data(self):
+        decoder = LargeFrameDecoder(min_size=0, min_array=64,
+                                    base64_fields={'/points': ('data',)})
+        frame = {'op': 'publish', 'topic': '/chatter', 'msg': {'data': 'QUJD' * 2000}}
+        data = decoder.loads(json.dumps(frame))
+        self.assertEqual(data['msg']['data'], 'QUJD' * 2000)
+        self.assertEqual(decoder.decoded, 0)
+
+    def test_nested(self):
+        frame = {'markers': [{'points': list(range(100))}, {'points': list(range(50, 150))}]}
+        data = self._decoder.loads(json.dumps(frame))
+        self.assertEqual([m['points'].tolist() for m in data['markers']],
+                         [m['points'] for m in frame['markers']])
+
+    def test_fallback(self):
+        # NaN is not matched, and malformed base64 falls back to json
+        decoder = LargeFrameDecoder(min_size=0, min_array=64, base64_fields={'/points': ('data',)})
+        frame = {'op': 'publish', 'topic': '/points', 'msg': {
+            'a': [float('nan')] + [1.0] * 50, 'data': 'QUJD' * 20 + 'QQ'}}
+        data = decoder.loads(json.dumps(frame))
+        self.assertIsInstance(data['msg']['a'], list)
+        self.assertEqual(data['msg']['data'], frame['msg']['data'])
+        self.assertEqual(decoder.fallbacks, 1)
+        # Unparsed text in a declared int array falls back to json as well
+        decoder = LargeFrameDecoder(min_size=0, min_array=64, dtypes={'/map': {'data': np.int8}})
+        frame = occupancy_grid(20, 20)
+        frame['msg']['data'][5] = 0.5
+        data = decoder.loads(json.dumps(frame))
+        self.assertEqual(data['msg']['data'], frame['msg']['data'])
+        self.assertEqual(decoder.fallbacks, 1)
+
+
+class LargeFrameExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_min_size(self):
+        decoder = LargeFrameDecoder(min_size=4096, min_array=64)
+        executor = LoopbackExecutor(large_frames=decoder)
+        received = []
+        Subscriber(executor, "/map", "nav_msgs/OccupancyGrid", received.append)
+        executor.inject(occupancy_grid(10, 10))
+        executor.inject(occupancy_grid(100, 100))
+        self.assertIsInstance(received[0]['data'], list)
+        self.assertIsInstance(received[1]['data'], np.ndarray)
+        self.assertEqual(received[1]['info']['width'], 100)
+        self.assertEqual(decoder.decoded, 1)
+
+    def test_defaults(self):
+        executor = LoopbackExecutor(large_frames=True)
+        self.assertIsInstance(executor.protocol._large_frames, LargeFrameDecoder)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
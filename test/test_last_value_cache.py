@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import time
+from rosbridge_pyclient import Subscriber
+from loopback import LoopbackExecutor
+
+
+class LastValueCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._exec = LoopbackExecutor(cache_last=True)
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def _publish(self, topic, data):
+        self._exec.inject({'op': 'publish', 'topic': topic, 'msg': {"data": data}})
+
+    def test_get_last(self):
+        self.assertIsNone(self._exec.get_last("/map"))
+        sub = Subscriber(self._exec, "/map", "std_msgs/String", lambda msg: None)
+        self._publish("/map", "a")
+        self._publish("/map", "b")
+        self.assertEqual(self._exec.get_last("/map"), {"data": "b"})
+        sub.unregister()
+        self.assertIsNone(self._exec.get_last("/map"))
+
+    def test_replay_to_late_subscriber(self):
+        first, late = [], []
+        Subscriber(self._exec, "/map", "std_msgs/String", first.append)
+        self._publish("/map", "a")
+        Subscriber(self._exec, "/map", "std_msgs/String", late.append)
+        self.assertEqual(late, [{"data": "a"}])
+        self.assertEqual(len(self._exec.wait_for('subscribe', 1)), 1)
+        self._publish("/map", "b")
+        self.assertEqual(first, [{"data": "a"}, {"data": "b"}])
+        self.assertEqual(late, [{"data": "a"}, {"data": "b"}])
+
+    def test_disabled(self):
+        executor = LoopbackExecutor()
+        late = []
+        Subscriber(executor, "/map", "std_msgs/String", lambda msg: None)
+        executor.inject({'op': 'publish', 'topic': '/map', 'msg': {"data": "a"}})
+        Subscriber(executor, "/map", "std_msgs/String", late.append)
+        self.assertEqual(late, [])
+        self.assertIsNone(executor.get_last("/map"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
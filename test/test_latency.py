@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import time
+from rosbridge_pyclient import Publisher
+from rosbridge_pyclient.latency import estimate_clock_offset
+from loopback import LoopbackExecutor
+
+# ROS clock of the responder, ahead of the local clock
+OFFSET = 100.0
+
+
+def ros_time(t):
+    return {'secs': int(t), 'nsecs': int((t % 1) * 1e9)}
+
+
+def get_time(request):
+    if request['service'] != '/rosapi/get_time':
+        return None
+    return 0.005, True, {'time': ros_time(time.time() + OFFSET)}
+
+
+class LatencyTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._exec = LoopbackExecutor(responder=get_time)
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_clock_offset(self):
+        estimate = estimate_clock_offset(self._exec, samples=3)
+        self.assertEqual(estimate.samples, 3)
+        self.assertAlmostEqual(estimate.offset, OFFSET, delta=0.05)
+        self.assertGreater(estimate.delay, 0.004)
+        self.assertIsNone(estimate_clock_offset(
+            self._exec, samples=1, timeout=0.05, service='/rosapi/missing'))
+        self.assertEqual(self._exec.protocol.service_clients, {})
+
+    def test_age(self):
+        tracer = self._exec.latency
+        self.assertIs(self._exec.latency, tracer)
+        tracer.sync_clock(samples=2)
+        histogram = tracer.trace_age('/scan', 'sensor_msgs/LaserScan')
+        stamp = tracer.now() - 0.25
+        self._exec.inject({'op': 'publish', 'topic': '/scan',
+                           'msg': {'header': {'stamp': ros_time(stamp)}}})
+        self._exec.inject({'op': 'publish', 'topic': '/scan', 'msg': {}})
+        self.assertEqual(histogram.count, 1)
+        self.assertAlmostEqual(histogram.last, 0.25, delta=0.05)
+        tracer.close()
+        self.assertEqual(len(self._exec.wait_for('unsubscribe', 1)), 1)
+
+    def test_echo(self):
+        tracer = self._exec.latency
+        pub = Publisher(self._exec, '/cmd', 'std_msgs/String')
+        histogram = tracer.trace_echo(pub)
+        for i in range(3):
+            pub.publish({'data': str(i)})
+        time.sleep(0.01)
+        echoes = self._exec.wait_for('publish', 3)
+        # The first message is lost
+        for frame in echoes[1:]:
+            self._exec.inject({'op': 'publish', 'topic': '/cmd', 'msg': frame['msg']})
+        self.assertEqual(histogram.count, 2)
+        self.assertGreaterEqual(histogram.min, 0.01)
+        tracer.close()
+        pub.publish({'data': 'x'})
+        self._exec.inject({'op': 'publish', 'topic': '/cmd', 'msg': {'data': 'x'}})
+        self.assertEqual(histogram.count, 2)
+
+    def test_echo_stamped(self):
+        tracer = self._exec.latency
+        pub = Publisher(self._exec, '/pose', 'geometry_msgs/PoseStamped')
+        histogram = tracer.trace_echo(pub)
+        stamp = ros_time(time.time())
+        pub.publish({'header': {'seq': 0, 'stamp': stamp, 'frame_id': 'map'},
+                     'pose': {'position': {'x': 1.0}}})
+        self.assertEqual(len(self._exec.wait_for('publish', 1)), 1)
+        # Defaults filled in and the sequence number rewritten on the way
+        self._exec.inject({'op': 'publish', 'topic': '/pose', 'msg': {
+            'header': {'seq': 7, 'stamp': stamp, 'frame_id': 'map'},
+            'pose': {'position': {'x': 1.0, 'y': 0.0, 'z': 0.0},
+                     'orientation': {'x': 0.0, 'y': 0.0, 'z': 0.0, 'w': 1.0}}}})
+        self.assertEqual(histogram.count, 1)
+        self.assertEqual(tracer.unmatched['/pose'], 0)
+        self._exec.inject({'op': 'publish', 'topic': '/pose', 'msg': {
+            'header': {'seq': 8, 'stamp': stamp, 'frame_id': 'odom'}}})
+        self.assertEqual(histogram.count, 1)
+        self.assertEqual(tracer.unmatched['/pose'], 1)
+        tracer.close()
+
+    def test_local_delivery(self):
+        executor = LoopbackExecutor(local_delivery=True)
+        pub = Publisher(executor, '/cmd', 'std_msgs/String')
+        with self.assertRaises(ValueError):
+            executor.latency.trace_echo(pub)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
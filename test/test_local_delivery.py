@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import time
+from rosbridge_pyclient import Publisher, Subscriber
+from loopback import LoopbackExecutor
+
+
+class LocalDeliveryTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._exec = LoopbackExecutor(local_delivery=True)
+        self._received = []
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def _subscribe(self, topic):
+        return Subscriber(self._exec, topic, "std_msgs/String",
+                          lambda msg: self._received.append(msg))
+
+    def test_delivered_once(self):
+        self._subscribe("/local")
+        pub = Publisher(self._exec, "/local", "std_msgs/String")
+        msg = {"data": "hello"}
+        pub.publish(msg)
+        self.assertEqual(len(self._received), 1)
+        self.assertIs(self._received[0], msg)
+        self.assertEqual(len(self._exec.wait_for('publish', 1)), 1)
+        # The echo of the local copy is skipped, other messages are not
+        self._exec.inject({'op': 'publish', 'topic': '/local', 'msg': {"data": "hello"}})
+        self._exec.inject({'op': 'publish', 'topic': '/local', 'msg': {"data": "remote"}})
+        self.assertEqual([m["data"] for m in self._received], ["hello", "remote"])
+
+    def test_partial_echo(self):
+        self._subscribe("/pose")
+        pub = Publisher(self._exec, "/pose", "geometry_msgs/Pose")
+        pub.publish({"position": {"x": 1.0}})
+        # rosbridge fills in the fields left out
+        self._exec.inject({'op': 'publish', 'topic': '/pose', 'msg': {
+            "position": {"x": 1.0, "y": 0.0, "z": 0.0},
+            "orientation": {"x": 0.0, "y": 0.0, "z": 0.0, "w": 1.0}}})
+        self.assertEqual(len(self._received), 1)
+        self._exec.inject({'op': 'publish', 'topic': '/pose', 'msg': {
+            "position": {"x": 2.0, "y": 0.0, "z": 0.0}}})
+        self.assertEqual(len(self._received), 2)
+
+    def test_float32_echo(self):
+        self._subscribe("/vel")
+        pub = Publisher(self._exec, "/vel", "geometry_msgs/Vector3")
+        pub.publish({"x": 0.1, "y": 1, "z": True})
+        # float32 fields come back widened to float64
+        self._exec.inject({'op': 'publish', 'topic': '/vel', 'msg': {
+            "x": 0.10000000149011612, "y": 1.0, "z": True}})
+        self.assertEqual(len(self._received), 1)
+        self._exec.inject({'op': 'publish', 'topic': '/vel', 'msg': {
+            "x": 0.1001, "y": 1.0, "z": True}})
+        self.assertEqual(len(self._received), 2)
+
+    def test_stamped_echo(self):
+        self._subscribe("/stamped")
+        pub = Publisher(self._exec, "/stamped", "std_msgs/Header")
+        stamp = {"secs": 10, "nsecs": 5}
+        pub.publish({"header": {"seq": 0, "stamp": stamp, "frame_id": "map"}})
+        # rospy rewrites the sequence number
+        self._exec.inject({'op': 'publish', 'topic': '/stamped', 'msg': {
+            "header": {"seq": 42, "stamp": stamp, "frame_id": "map"}}})
+        self.assertEqual(len(self._received), 1)
+        self.assertNotIn("/stamped", self._exec.protocol._echoes)
+
+    def test_echo_expiry(self):
+        self._subscribe("/local")
+        self._exec.protocol._echoes._ttl = 0.02
+        pub = Publisher(self._exec, "/local", "std_msgs/String")
+        pub.publish({"data": "hello"})
+        time.sleep(0.05)
+        self._exec.inject({'op': 'publish', 'topic': '/local', 'msg': {"data": "hello"}})
+        self.assertEqual(len(self._received), 2)
+        self.assertNotIn("/local", self._exec.protocol._echoes)
+
+    def test_local_only(self):
+        self._subscribe("/local")
+        pub = Publisher(self._exec, "/local", "std_msgs/String", remote=False)
+        pub.publish({"data": "hello"})
+        self.assertEqual(len(self._received), 1)
+        self.assertEqual(self._exec.wait_for('publish', 1, timeout=0.1), [])
+
+    def test_disabled(self):
+        self._exec.local_delivery = False
+        self._subscribe("/local")
+        pub = Publisher(self._exec, "/local", "std_msgs/String")
+        pub.publish({"data": "hello"})
+        self.assertEqual(self._received, [])
+        self._exec.inject({'op': 'publish', 'topic': '/local', 'msg': {"data": "hello"}})
+        self.assertEqual(len(self._received), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
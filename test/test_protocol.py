@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import time
+import json
+from rosbridge_pyclient.protocol import (
+    RosbridgeProtocol, TopicMessage, ServiceResponse, ServiceRequest)
+
+
+class Handle(object):
+    """Minimal publisher/subscriber/service handle, no executor needed."""
+    def __init__(self, topic=None, name=None, **kwargs):
+        self.topic = topic
+        self.name = name
+        self.message_type = 'std_msgs/String'
+        self.type = 'std_srvs/Trigger'
+        self.advertise_id = 'advertise:{}'.format(topic)
+        self.latch = False
+        self.queue_size = 10
+        self.needles = ()
+        self.subscribe_id = ''
+        self.service_id = 'call_service:{}'.format(name)
+        self.__dict__.update(kwargs)
+
+
+def publish(topic, msg):
+    return json.dumps({'op': 'publish', 'topic': topic, 'msg': msg})
+
+
+class ProtocolTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._proto = RosbridgeProtocol()
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_subscriptions(self):
+        first, second = Handle('/odom'), Handle('/odom')
+        frame = json.loads(self._proto.add_subscriber(first))
+        self.assertEqual(frame['op'], 'subscribe')
+        self.assertIsNone(self._proto.add_subscriber(second))
+        self.assertEqual(second.subscribe_id, frame['id'])
+        event = self._proto.receive(publish('/odom', {'x': 1}))
+        self.assertEqual(event, TopicMessage('/odom', {'x': 1}, (first, second)))
+        self.assertIsNone(self._proto.receive(publish('/other', {})))
+        self.assertIsNone(self._proto.remove_subscriber(first))
+        frame = json.loads(self._proto.remove_subscriber(second))
+        self.assertEqual((frame['op'], frame['id']), ('unsubscribe', second.subscribe_id))
+        self.assertIsNone(self._proto.receive(publish('/odom', {'x': 2})))
+
+    def test_services(self):
+        client = Handle(name='/add')
+        frame = json.loads(self._proto.call_service(client, {'a': 1}))
+        self.assertEqual((frame['op'], frame['args']), ('call_service', {'a': 1}))
+        # Another call with a pending ID is not sent
+        self.assertIsNone(self._proto.call_service(Handle(name='/add'), {'a': 1}))
+        response = json.dumps({'op': 'service_response', 'id': client.service_id,
+                               'result': True, 'values': {'sum': 1}})
+        self.assertEqual(self._proto.receive(response), ServiceResponse(client, True, {'sum': 1}))
+        # Responses are routed once
+        self.assertIsNone(self._proto.receive(response))
+        server = Handle(name='/trigger')
+        self.assertEqual(json.loads(self._proto.advertise_service(server))['op'],
+                         'advertise_service')
+        request = json.dumps({'op': 'call_service', 'service': '/trigger', 'id': 'r1', 'args': {}})
+        self.assertEqual(self._proto.receive(request), ServiceRequest(server, 'r1', {}))
+        self.assertIsNone(self._proto.unadvertise_service(Handle(name='/trigger')))
+        self.assertIsNotNone(self._proto.unadvertise_service(server))
+        self.assertIsNone(self._proto.receive(request))
+
+    def test_fail_pending(self):
+        clients = [Handle(name='/svc/{}'.format(i)) for i in range(3)]
+        for client in clients:
+            self._proto.call_service(client, {})
+        events = self._proto.fail_pending('lost')
+        self.assertEqual(set(e.client for e in events), set(clients))
+        self.assertTrue(all(e == ServiceResponse(e.client, False, 'lost') for e in events))
+        self.assertEqual(self._proto.service_clients, {})
+        self.assertEqual(self._proto.fail_pending('lost'), [])
+
+    def test_receive_many(self):
+        sub = Handle('/chatter')
+        self._proto.add_subscriber(sub)
+        frames = [publish('/chatter', {'data': i}) for i in range(5)]
+        frames.insert(2, json.dumps({'op': 'status', 'level': 'info', 'msg': ''}))
+        events = self._proto.receive_many(frames)
+        self.assertEqual([e.msg['data'] for e in events], list(range(5)))
+
+    def test_registration_frames(self):
+        self._proto.add_publisher(Handle('/cmd'))
+        self._proto.add_publisher(Handle('/cmd'))
+        first, second = Handle('/odom'), Handle('/odom')
+        subscribe = json.loads(self._proto.add_subscriber(first))
+        self._proto.add_subscriber(second)
+        self._proto.advertise_service(Handle(name='/trigger'))
+        self._proto.call_service(Handle(name='/add'), {})
+        frames = [json.loads(f) for f in self._proto.registration_frames()]
+        self.assertEqual([f['op'] for f in frames],
+                         ['advertise', 'advertise', 'subscribe', 'advertise_service'])
+        self.assertEqual(frames[2], subscribe)
+
+    def test_local_delivery(self):
+        proto = RosbridgeProtocol(local_delivery=True, cache_last=True)
+        sub = Handle('/chatter')
+        proto.add_subscriber(sub)
+        event = proto.deliver_local('/chatter', {'data': 'a'})
+        self.assertEqual(event.subscribers, (sub,))
+        # The echo is skipped, other messages are delivered
+        self.assertIsNone(proto.receive(publish('/chatter', {'data': 'a'})))
+        self.assertIsNotNone(proto.receive(publish('/chatter', {'data': 'a'})))
+        self.assertEqual(proto.last('/chatter'), {'data': 'a'})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import shutil
+import tempfile
+import json
+import time
+import numpy as np
+from rosbridge_pyclient import recorder
+from loopback import LoopbackExecutor
+
+
+def joint_state(i, n=3):
+    return {"header": {"seq": i, "frame_id": "base"},
+            "name": ["j{}".format(k) for k in range(n)],
+            "position": [float(i + k) for k in range(n)]}
+
+
+class RecorderTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_flatten(self):
+        flat = recorder.flatten({"a": {"b": 1, "c": [1, 2]}, "d": [{"e": 1}]})
+        self.assertEqual(flat, {"a.b": 1, "a.c": [1, 2], "d": '[{"e": 1}]'})
+
+    def test_empty_message_arrays(self):
+        for statuses in ([[], [{"a": 1}], []], [[{"a": 1}], [], [{"a": 2}]]):
+            columns = recorder.to_columns([0, 1, 2], [{"status": s} for s in statuses])
+            self.assertNotIn("status@values", columns)
+            self.assertEqual(columns["status"].tolist(),
+                             [json.dumps(s) for s in statuses])
+
+    def test_record_and_load(self):
+        executor = LoopbackExecutor()
+        rec = executor.record("/joint_states", "sensor_msgs/JointState",
+                              self._dir, chunk_size=4)
+        for i in range(10):
+            # The last messages have fewer joints
+            msg = joint_state(i, 3 if i < 8 else 2)
+            executor.inject({'op': 'publish', 'topic': '/joint_states', 'msg': msg})
+        rec.close()
+        self.assertEqual(executor.sent[-1]['op'], 'unsubscribe')
+
+        data = recorder.load(self._dir)
+        self.assertEqual(len(data), 10)
+        self.assertIsInstance(data["header.seq"], np.memmap)
+        np.testing.assert_array_equal(data["header.seq"], np.arange(10))
+        self.assertEqual(data["header.frame_id"][9], "base")
+        position = data["position"]
+        self.assertEqual(len(position), 10)
+        np.testing.assert_allclose(position[5], [5, 6, 7])
+        np.testing.assert_allclose(position[9], [9, 10])
+        self.assertRaises(ValueError, position.as_matrix)
+        self.assertTrue(np.all(np.diff(data.time) >= 0))
+
+    def test_missing_columns(self):
+        rec = recorder.Recorder(self._dir, chunk_size=2)
+        rec.push({"x": 1, "y": 2})
+        rec.push({"x": 2, "y": 3})
+        rec.push({"x": 3})
+        rec.close()
+        data = recorder.load(self._dir, mmap=False)
+        np.testing.assert_array_equal(data["x"], [1, 2, 3])
+        np.testing.assert_array_equal(data["y"][:2], [2, 3])
+        self.assertTrue(np.isnan(data["y"][2]))
+        # Consolidated columns are reused until chunks are added
+        with recorder.Recorder(self._dir, chunk_size=2) as rec:
+            rec.push({"x": 4, "y": 5})
+        np.testing.assert_array_equal(recorder.load(self._dir)["x"], [1, 2, 3, 4])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
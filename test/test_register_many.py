@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import time
+from rosbridge_pyclient import Executor, Publisher, Subscriber
+from loopback import LoopbackExecutor
+
+
+class WriteRecordingExecutor(Executor):
+    """Executor that records socket writes instead of sending them."""
+    def __init__(self, *args, **kwargs):
+        Executor.__init__(self, *args, **kwargs)
+        self.writes = []
+
+    def _write(self, b):
+        self.writes.append(b)
+
+
+class RegisterManyTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._exec = LoopbackExecutor()
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_manifest(self):
+        existing_pub = Publisher(self._exec, "/cmd_vel", "geometry_msgs/Twist")
+        Subscriber(self._exec, "/odom", "nav_msgs/Odometry")
+        del self._exec.sent[:]
+        received = []
+        publishers, subscribers = self._exec.register_many(
+            publish=[("/cmd_vel", "geometry_msgs/Twist"),
+                     {"topic": "/goal", "type": "geometry_msgs/PoseStamped", "latch": True},
+                     ("/goal", "geometry_msgs/PoseStamped")],
+            subscribe=[("/odom", "nav_msgs/Odometry", received.append),
+                       {"topic": "/scan", "type": "sensor_msgs/LaserScan"},
+                       ("/scan", "sensor_msgs/LaserScan")])
+        self.assertIs(publishers["/cmd_vel"], existing_pub)
+        self.assertTrue(publishers["/goal"].latch)
+        self.assertEqual(len(subscribers), 3)
+        # Only the new topics are advertised and subscribed
+        self.assertEqual([(f['op'], f['topic']) for f in self._exec.sent],
+                         [('advertise', '/goal'), ('subscribe', '/scan')])
+        self._exec.inject({'op': 'publish', 'topic': '/odom', 'msg': {'x': 1}})
+        self.assertEqual(received, [{'x': 1}])
+        for subscriber in subscribers:
+            subscriber.unregister()
+        self.assertEqual([f['op'] for f in self._exec.sent[2:]], ['unsubscribe'])
+
+    def test_single_write(self):
+        executor = WriteRecordingExecutor()
+        # Unmasked frames, to look into the payloads
+        executor.stream.always_mask = False
+        try:
+            executor.register_many(
+                publish=[("/pub/{}".format(i), "std_msgs/String") for i in range(100)],
+                subscribe=[("/sub/{}".format(i), "std_msgs/String") for i in range(100)])
+            self.assertEqual(len(executor.writes), 1)
+            self.assertEqual(executor.writes[0].count(b'"op": "advertise"'), 100)
+            self.assertEqual(executor.writes[0].count(b'"op": "subscribe"'), 100)
+        finally:
+            executor.sock.close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import threading
+import time
+from rosbridge_pyclient import Publisher, Subscriber
+from loopback import LoopbackExecutor
+
+THREADS = 32
+ROUNDS = 50
+
+
+class RegistryStressTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._exec = LoopbackExecutor()
+        self._errors = []
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def _run(self, target, n=THREADS):
+        def guarded(i):
+            try:
+                target(i)
+            except Exception as exc:
+                self._errors.append(exc)
+        threads = [threading.Thread(target=guarded, args=(i,)) for i in range(n)]
+        for t in threads:
+            t.start()
+        return threads
+
+    def test_unique_ids(self):
+        ids = [[] for _ in range(THREADS)]
+
+        def gen(i):
+            for _ in range(1000):
+                ids[i].append(self._exec.gen_id())
+        for t in self._run(gen):
+            t.join()
+        flat = [x for chunk in ids for x in chunk]
+        self.assertEqual(len(set(flat)), len(flat))
+
+    def test_concurrent_pub_sub(self):
+        stop = threading.Event()
+        received = [0]
+
+        def reader():
+            # Reader thread delivering messages while registries change
+            while not stop.is_set():
+                for k in range(4):
+                    self._exec.inject({'op': 'publish', 'topic': '/stress/{}'.format(k),
+                                       'msg': {'data': k}})
+
+        def churn(i):
+            topic = '/stress/{}'.format(i % 4)
+            for _ in range(ROUNDS):
+                sub = Subscriber(self._exec, topic, 'std_msgs/Int32',
+                                 lambda msg: received.__setitem__(0, received[0] + 1))
+                pub = Publisher(self._exec, topic, 'std_msgs/Int32')
+                pub.publish({'data': i})
+                pub.unregister()
+                sub.unregister()
+
+        reader_thread = threading.Thread(target=reader)
+        reader_thread.start()
+        for t in self._run(churn):
+            t.join()
+        stop.set()
+        reader_thread.join()
+        self.assertEqual(self._errors, [])
+        self.assertEqual(len(self._exec.protocol.subscribers), 0)
+        self.assertEqual(len(self._exec.protocol.publishers), 0)
+        # Every subscription is matched by an unsubscription
+        subscribe = self._exec.wait_for('subscribe', 0)
+        unsubscribe = self._exec.wait_for('unsubscribe', 0)
+        self.assertEqual(len(subscribe), len(unsubscribe))
+        self.assertEqual(len(self._exec.wait_for('publish', 0)), THREADS * ROUNDS)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
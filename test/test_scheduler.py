@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import threading
+import time
+from rosbridge_pyclient import Publisher
+from loopback import LoopbackExecutor
+
+
+class BurstRecordingExecutor(LoopbackExecutor):
+    def __init__(self, *args, **kwargs):
+        LoopbackExecutor.__init__(self, *args, **kwargs)
+        self.bursts = []
+
+    def send_many(self, payloads):
+        self.bursts.append(len(payloads))
+        LoopbackExecutor.send_many(self, payloads)
+
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._exec = BurstRecordingExecutor()
+
+    def tearDown(self):
+        self._exec.scheduler.stop()
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_drift_free(self):
+        pub = Publisher(self._exec, "/tick", "std_msgs/Float64")
+        ticks = []
+
+        def provider():
+            ticks.append(time.time())
+            if len(ticks) == 3:
+                # A slow tick must not shift the following ones
+                time.sleep(0.015)
+            return {"data": ticks[-1]}
+        task = pub.publish_periodic(100, provider)
+        time.sleep(0.5)
+        task.cancel()
+        count = len(ticks)
+        self.assertTrue(45 <= count + task.missed <= 52, (count, task.missed))
+        # Ticks stay on the start + k * period grid, despite the slow one
+        residuals = sorted(abs(r - round(r)) * 0.01
+                           for r in ((t - ticks[0]) / 0.01 for t in ticks[3:]))
+        self.assertLess(residuals[len(residuals) // 2], 0.002)
+        time.sleep(0.05)
+        self.assertEqual(len(ticks), count)
+        self.assertEqual(len(self._exec.wait_for('publish', 0)), task.published)
+
+    def test_batched_ticks(self):
+        counts = [0] * 20
+
+        def provider(i):
+            def message():
+                counts[i] += 1
+                return {"data": i}
+            return message
+        for i in range(20):
+            pub = Publisher(self._exec, "/stream/{}".format(i), "std_msgs/Int32")
+            pub.publish_periodic(50, provider(i), phase=0.02)
+        time.sleep(0.2)
+        self.assertTrue(all(c >= 5 for c in counts), counts)
+        # Streams due at the same tick go out in one burst
+        self.assertGreater(max(self._exec.bursts), 1)
+        self.assertLess(len(self._exec.bursts), sum(counts))
+
+    def test_skip_and_errors(self):
+        pub = Publisher(self._exec, "/maybe", "std_msgs/Int32")
+        calls = []
+
+        def provider():
+            calls.append(1)
+            if len(calls) % 2:
+                return None
+            if len(calls) == 4:
+                raise ValueError("boom")
+            return {"data": len(calls)}
+        task = pub.publish_periodic(200, provider)
+        time.sleep(0.1)
+        task.cancel()
+        time.sleep(0.02)
+        n = len(calls)
+        self.assertGreater(n, 6)
+        # Odd calls are skipped, the failing 4th call is not published
+        self.assertEqual(task.published, n // 2 - 1)
+        self.assertEqual(len(self._exec.wait_for('publish', 0)), task.published)
+
+    def test_shared_grid(self):
+        first = Publisher(self._exec, "/first", "std_msgs/Int32")
+        second = Publisher(self._exec, "/second", "std_msgs/Int32")
+        first.publish_periodic(20, lambda: {"data": 1})
+        time.sleep(0.023)
+        # Added between two ticks of the first stream, and aligned with it
+        second.publish_periodic(20, lambda: {"data": 2})
+        time.sleep(0.2)
+        self._exec.scheduler.stop()
+        self.assertEqual(self._exec.bursts[-3:], [2, 2, 2])
+
+    def test_restart(self):
+        pub = Publisher(self._exec, "/tick", "std_msgs/Int32")
+        tasks = []
+
+        def provider():
+            if len(tasks) == 1:
+                # Restarted from the scheduler thread, which cannot be joined
+                self._exec.scheduler.stop()
+                tasks.append(pub.publish_periodic(100, lambda: {"data": 1}))
+            return {"data": 0}
+        tasks.append(pub.publish_periodic(100, provider))
+        time.sleep(0.1)
+        threads = [t for t in threading.enumerate() if t.name == 'PeriodicScheduler']
+        self.assertEqual(len(threads), 1)
+        self.assertGreater(tasks[1].published, 5)
+        self.assertEqual(len(self._exec.scheduler), 1)
+        tasks[1].cancel()
+        self.assertEqual(len(self._exec.scheduler), 0)
+
+    def test_stopped_on_close(self):
+        pub = Publisher(self._exec, "/tick", "std_msgs/Int32")
+        task = pub.publish_periodic(100, lambda: {"data": 0})
+        time.sleep(0.05)
+        self._exec.closed(1000, "test")
+        published = task.published
+        self.assertGreater(published, 0)
+        self.assertEqual(len(self._exec.scheduler), 0)
+        time.sleep(0.05)
+        self.assertEqual(task.published, published)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import threading
+import time
+from rosbridge_pyclient import ServiceServer
+from loopback import LoopbackExecutor
+
+
+class ServiceServerTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._exec = LoopbackExecutor()
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def _call(self, service, call_id, args):
+        self._exec.inject({
+            'op': 'call_service', 'service': service, 'id': call_id, 'args': args})
+
+    def test_advertise_and_respond(self):
+        srv = ServiceServer(self._exec, "/add_two_ints", "demo_service/AddTwoInts",
+                            lambda req: {"sum": req["a"] + req["b"]})
+        self.assertEqual(self._exec.sent[0]['op'], 'advertise_service')
+        self._call("/add_two_ints", "call:1", {"a": 1, "b": 2})
+        resp = self._exec.wait_for('service_response', 1)
+        self.assertEqual(resp[0]['values'], {"sum": 3})
+        self.assertTrue(resp[0]['result'])
+        srv.unregister()
+        self.assertEqual(self._exec.sent[-1]['op'], 'unadvertise_service')
+
+    def test_handler_does_not_block_reader(self):
+        release = threading.Event()
+
+        def slow(req):
+            release.wait(2)
+            return {}
+        ServiceServer(self._exec, "/slow", "std_srvs/Empty", slow, workers=4)
+        start = time.time()
+        for i in range(4):
+            self._call("/slow", "call:{}".format(i), {})
+        self.assertLess(time.time() - start, 0.5)
+        release.set()
+        self.assertEqual(len(self._exec.wait_for('service_response', 4)), 4)
+
+    def test_handler_error(self):
+        def fail(req):
+            raise ValueError("boom")
+        ServiceServer(self._exec, "/fail", "std_srvs/Empty", fail)
+        self._call("/fail", "call:1", {})
+        resp = self._exec.wait_for('service_response', 1)
+        self.assertFalse(resp[0]['result'])
+        self.assertEqual(resp[0]['values'], "boom")
+
+
+    def test_unregister_full_queue(self):
+        release = threading.Event()
+        srv = ServiceServer(self._exec, "/slow", "std_srvs/Empty",
+                            lambda req: release.wait(2) and {},
+                            workers=2, queue_size=1)
+        # Two requests taken by the workers, the third one fills the queue
+        for i in range(3):
+            self._call("/slow", "call:{}".format(i), {})
+            time.sleep(0.02)
+        self.assertEqual(srv.pending, 1)
+        start = time.time()
+        srv.unregister()
+        self.assertLess(time.time() - start, 0.5)
+        release.set()
+        # The queued request is still handled, then the workers exit
+        responses = self._exec.wait_for('service_response', 3)
+        self.assertEqual(sorted(r['id'] for r in responses), ["call:0", "call:1", "call:2"])
+        self.assertTrue(all(r['result'] for r in responses))
+        for worker in srv._workers:
+            worker.join(1.0)
+            self.assertFalse(worker.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
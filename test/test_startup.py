@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import hashlib
+import os
+import subprocess
+import sys
+import time
+from rosbridge_pyclient import Executor, local_source_ip
+from loopback import LoopbackExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+class StartupTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_lazy_imports(self):
+        out = subprocess.check_output([sys.executable, "-c", (
+            "import sys; sys.path.insert(0, {!r}); import rosbridge_pyclient; "
+            "print(sorted(m for m in ('tornado', 'numpy', 'rosbridge_pyclient.tf_client') "
+            "if m in sys.modules))"
+        ).format(ROOT)], stderr=subprocess.STDOUT)
+        self.assertEqual(out.decode().strip().splitlines()[-1], "[]")
+
+    def test_auth_offline(self):
+        executor = LoopbackExecutor(ip="10.0.0.2")
+        self.assertTrue(executor.authenticate("secret", source_ip="10.0.0.1"))
+        self.assertTrue(executor.authenticate("secret", source_ip=lambda e: "10.0.0.1"))
+        for auth in executor.wait_for('auth', 2):
+            expected = hashlib.sha512(("secret" + "10.0.0.1" + "10.0.0.2" +
+                                       auth['rand'] + "0admin0").encode()).hexdigest()
+            self.assertEqual(auth['mac'], expected)
+            self.assertEqual(auth['client'], "10.0.0.1")
+
+    def test_default_source_ip(self):
+        executor = LoopbackExecutor(ip="127.0.0.1")
+        executor.authenticate("secret")
+        self.assertEqual(executor.wait_for('auth', 1)[0]['client'], "127.0.0.1")
+
+    def test_unconnected_source_ip(self):
+        # ws4py creates its socket before connecting, bound to 0.0.0.0
+        executor = Executor(ip="127.0.0.1", port=9)
+        try:
+            self.assertEqual(executor.sock.getsockname()[0], "0.0.0.0")
+            self.assertEqual(local_source_ip(executor), "127.0.0.1")
+        finally:
+            executor.sock.close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
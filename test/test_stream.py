@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import threading
+import time
+import asyncio
+from rosbridge_pyclient import Subscriber, MessageStream, StreamClosed
+from loopback import LoopbackExecutor
+
+
+class StreamTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._exec = LoopbackExecutor()
+        self._sub = Subscriber(self._exec, "/chatter", "std_msgs/Int32")
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def _publish(self, *values):
+        for v in values:
+            self._exec.inject({'op': 'publish', 'topic': '/chatter', 'msg': {"data": v}})
+
+    def test_iterate(self):
+        stream = self._sub.stream()
+        self._publish(1, 2, 3)
+        stream.close()
+        self.assertEqual([m["data"] for m in stream], [1, 2, 3])
+        self._publish(4)
+        self.assertEqual(len(stream), 0)
+        self.assertRaises(StreamClosed, stream.get)
+
+    def test_drop_policies(self):
+        oldest = self._sub.stream(maxlen=2)
+        newest = self._sub.stream(maxlen=2, policy=MessageStream.DROP_NEWEST)
+        self._publish(1, 2, 3)
+        self.assertEqual([m["data"] for m in oldest.next_batch(5, timeout=0)], [2, 3])
+        self.assertEqual([m["data"] for m in newest.next_batch(5, timeout=0)], [1, 2])
+        self.assertEqual(oldest.dropped, 1)
+
+    def test_next_batch(self):
+        stream = self._sub.stream()
+        threading.Timer(0.05, self._publish, [1, 2, 3]).start()
+        batch = stream.next_batch(2, timeout=1)
+        self.assertEqual([m["data"] for m in batch], [1, 2])
+        self.assertEqual(len(stream.next_batch(2, timeout=0.05)), 1)
+        self.assertEqual(stream.next_batch(2, timeout=0.01), [])
+
+    def test_async_iterate(self):
+        stream = self._sub.stream()
+
+        async def consume():
+            received = []
+            async for msg in stream:
+                received.append(msg["data"])
+                if len(received) == 3:
+                    stream.close()
+            return received
+
+        def produce():
+            self._publish(1)
+            time.sleep(0.05)
+            self._publish(2, 3)
+        threading.Timer(0.05, produce).start()
+        self.assertEqual(asyncio.run(consume()), [1, 2, 3])
+
+
+    def test_cancelled_consumer(self):
+        stream = MessageStream(maxlen=2)
+
+        async def consume():
+            stream.__anext__().cancel()
+            stream.push({"data": 1})
+            # The message of the cancelled consumer goes to the next one
+            following = stream.__anext__()
+            self.assertEqual((await following)["data"], 1)
+            stream.__anext__().cancel()
+            stream.push({"data": 2})
+            stream.push({"data": 3})
+            stream.push({"data": 4})
+            await asyncio.sleep(0.01)
+        asyncio.run(consume())
+        # Back in the buffer as the oldest message, within maxlen
+        self.assertEqual([m["data"] for m in stream.next_batch(5, timeout=0)], [3, 4])
+        self.assertEqual(stream.dropped, 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
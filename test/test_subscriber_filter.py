@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import time
+from rosbridge_pyclient import Subscriber
+from rosbridge_pyclient.fieldpath import compile_predicate, compile_needles
+from loopback import LoopbackExecutor, FakeMessage
+
+
+def diagnostic(level, frame_id="base"):
+    return {"header": {"frame_id": frame_id},
+            "status": [{"level": level, "name": "motor"}]}
+
+
+class CountingExecutor(LoopbackExecutor):
+    """Counts the frames that got decoded."""
+    decoded = 0
+
+    def handle_event(self, event):
+        self.decoded += 1
+        LoopbackExecutor.handle_event(self, event)
+
+
+class SubscriberFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._exec = CountingExecutor()
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def _publish(self, msg, topic="/diagnostics"):
+        self._exec.inject({'op': 'publish', 'topic': topic, 'msg': msg})
+
+    def test_predicate(self):
+        match = compile_predicate({"status[0].level": [1, 2], "header.frame_id": "base"})
+        self.assertTrue(match(diagnostic(2)))
+        self.assertFalse(match(diagnostic(0)))
+        self.assertFalse(match(diagnostic(2, "map")))
+        self.assertFalse(match({"status": []}))
+        self.assertEqual(compile_needles({"a": "base", "b": 3, "c": True, "d": 1.5}),
+                         ('"base"', '3'))
+
+    def test_filter_and_project(self):
+        received = []
+        Subscriber(self._exec, "/diagnostics", "diagnostic_msgs/DiagnosticArray",
+                   received.append, where={"status[0].level": 2},
+                   projection="status[0].name")
+        for level in (0, 2, 1, 2):
+            self._publish(diagnostic(level))
+        self.assertEqual(received, ["motor", "motor"])
+
+    def test_skip_decoding(self):
+        received = []
+        Subscriber(self._exec, "/diagnostics", "", received.append,
+                   where={"header.frame_id": "map"})
+        self._publish(diagnostic(0, "base"))
+        self._publish(diagnostic(0, "map"))
+        self.assertEqual(self._exec.decoded, 1)
+        # Byte frames, as received by ws4py
+        frame = FakeMessage({'op': 'publish', 'topic': '/diagnostics',
+                             'msg': diagnostic(0, "base")})
+        frame.data = frame.data.encode('utf-8')
+        self._exec.received_message(frame)
+        self.assertEqual(self._exec.decoded, 1)
+        # A subscriber without conditions disables the prefilter
+        Subscriber(self._exec, "/diagnostics", "", lambda msg: None)
+        self._publish(diagnostic(0, "base"))
+        self.assertEqual(self._exec.decoded, 2)
+        self.assertEqual(len(received), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import time
+from rosbridge_pyclient import Subscriber, TimeSynchronizer, ApproximateTimeSynchronizer
+from loopback import LoopbackExecutor
+
+
+def stamped(t, name):
+    return {"header": {"stamp": {"secs": int(t), "nsecs": int(round((t % 1) * 1e9))}},
+            "name": name}
+
+
+class SynchronizerTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._exec = LoopbackExecutor()
+        self._subs = [Subscriber(self._exec, topic, "")
+                      for topic in ("/camera", "/lidar", "/odom")]
+        self._matched = []
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def _clb(self, *msgs):
+        self._matched.append(tuple(m["name"] for m in msgs))
+
+    def _publish(self, topic, t):
+        self._exec.inject({'op': 'publish', 'topic': topic,
+                           'msg': stamped(t, "{}@{}".format(topic[1:], t))})
+
+    def test_exact(self):
+        sync = TimeSynchronizer(self._subs[:2], self._clb)
+        self._publish("/camera", 1.0)
+        self._publish("/camera", 2.0)
+        self._publish("/lidar", 1.5)
+        self._publish("/lidar", 2.0)
+        self.assertEqual(self._matched, [("camera@2.0", "lidar@2.0")])
+        # camera@1.0 expired once lidar moved past it
+        self.assertEqual(sync.dropped, 2)
+
+    def test_approximate(self):
+        ApproximateTimeSynchronizer(self._subs, self._clb, slop=0.05)
+        self._publish("/camera", 1.00)
+        self._publish("/lidar", 1.03)
+        self._publish("/lidar", 1.10)
+        self._publish("/odom", 1.02)
+        self._publish("/camera", 1.20)
+        self._publish("/odom", 1.12)
+        self._publish("/lidar", 1.22)
+        self._publish("/odom", 1.19)
+        self.assertEqual(self._matched, [
+            ("camera@1.0", "lidar@1.03", "odom@1.02"),
+            ("camera@1.2", "lidar@1.22", "odom@1.19")])
+
+    def test_bounded_queues(self):
+        sync = ApproximateTimeSynchronizer(self._subs[:2], self._clb,
+                                           queue_size=3, slop=0.01)
+        for i in range(10):
+            self._publish("/camera", float(i))
+        self.assertEqual(len(sync._stamps[0]), 3)
+        self._publish("/lidar", 9.0)
+        self.assertEqual(self._matched, [("camera@9.0", "lidar@9.0")])
+        sync.unregister()
+        self._publish("/camera", 10.0)
+        self._publish("/lidar", 10.0)
+        self.assertEqual(len(self._matched), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
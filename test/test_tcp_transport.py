@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import time
+import json
+import socket
+import struct
+import threading
+from rosbridge_pyclient import ExecutorTCP, Publisher, Subscriber
+from rosbridge_pyclient.transport import JSONStreamCodec, LengthPrefixCodec, FrameBuffer
+from loopback import split_json_stream
+
+
+class StandinTCPServer(threading.Thread):
+    """Single connection rosbridge_tcp stand-in, in JSON mode: publish
+    messages are sent back to the client if it subscribed to their topic."""
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(1)
+        self.port = self.listener.getsockname()[1]
+        self.received = []
+
+    def run(self):
+        conn, _ = self.listener.accept()
+        topics = set()
+        buf = b''
+        while True:
+            data = conn.recv(65536)
+            if not data:
+                break
+            messages, buf = split_json_stream(buf + data)
+            for msg in messages:
+                self.received.append(msg)
+                if msg['op'] == 'subscribe':
+                    topics.add(msg['topic'])
+                elif msg['op'] == 'publish' and msg['topic'] in topics:
+                    conn.sendall(json.dumps({'op': 'publish', 'topic': msg['topic'],
+                                             'msg': msg['msg']}).encode('utf-8'))
+        conn.close()
+        self.listener.close()
+
+
+class TCPTransportTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_codec(self):
+        codec = LengthPrefixCodec()
+        frames = codec.encode(u'{"op": "a"}') + codec.encode(b'') + codec.encode(b'x' * 300)
+        buffer = FrameBuffer(codec, size=16)
+        messages = []
+        # Byte by byte, then the rest at once
+        for i in range(10):
+            messages += buffer.feed(frames[i:i + 1])
+        messages += buffer.feed(frames[10:])
+        self.assertEqual(messages, [b'{"op": "a"}', b'', b'x' * 300])
+        self.assertEqual(len(buffer), 0)
+        # Grown to fit the largest message
+        self.assertEqual(buffer.capacity, 512)
+
+    def test_json_stream(self):
+        messages = [{'op': 'publish', 'topic': '/a', 'msg': {'data': 'x' * i}}
+                    for i in range(50)]
+        messages.append({'op': 'publish', 'topic': '/b', 'msg': {
+            'data': u'{"nested": [1, {}]} \\ \" \u00e9 }}'}})
+        stream = b'\n'.join(json.dumps(m).encode('utf-8') for m in messages)
+        buffer = FrameBuffer(JSONStreamCodec(), size=16)
+        received = []
+        # Byte by byte, to cut the stream everywhere
+        for i in range(len(stream)):
+            received += buffer.feed(stream[i:i + 1])
+        self.assertEqual([json.loads(m.decode('utf-8')) for m in received], messages)
+        self.assertEqual(len(buffer), 0)
+        with self.assertRaises(ValueError):
+            FrameBuffer(JSONStreamCodec()).feed(b'[1, 2]')
+        with self.assertRaises(ValueError):
+            FrameBuffer(JSONStreamCodec(max_size=100)).feed(b'{"a": "' + b'x' * 200)
+
+    def test_oversized(self):
+        buffer = FrameBuffer(LengthPrefixCodec(max_size=100))
+        with self.assertRaises(ValueError):
+            buffer.feed(struct.pack("!I", 101))
+
+    def test_executor(self):
+        server = StandinTCPServer()
+        server.start()
+        executor = ExecutorTCP(port=server.port)
+        executor.start()
+        received = []
+        sub = Subscriber(executor, "/chatter", "std_msgs/String", received.append)
+        pub = Publisher(executor, "/chatter", "std_msgs/String")
+        for i in range(100):
+            pub.publish({'data': 'x' * i})
+        executor.register_many(publish=[("/a", "std_msgs/String"), ("/b", "std_msgs/String")])
+        deadline = time.time() + 2
+        while len(received) < 100 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(received, [{'data': 'x' * i} for i in range(100)])
+        sub.unregister()
+        executor.close()
+        executor._thread.join(2)
+        self.assertFalse(executor._thread.is_alive())
+        server.join(2)
+        self.assertEqual([m['op'] for m in server.received[:2]], ['subscribe', 'advertise'])
+        self.assertEqual([m['topic'] for m in server.received[-3:-1]], ['/a', '/b'])
+        self.assertEqual(server.received[-1]['op'], 'unsubscribe')
+
+
+if __name__ == "__main__":
+    unittest.main()
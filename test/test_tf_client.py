@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import time
+import math
+import numpy as np
+from rosbridge_pyclient import TFClient, TransformBuffer, TransformLookupError
+from loopback import LoopbackExecutor
+
+
+def _yaw(theta):
+    return (0.0, 0.0, math.sin(theta / 2.0), math.cos(theta / 2.0))
+
+
+def _dict(q):
+    return dict(zip('xyzw', q))
+
+
+class TransformBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self.buf = TransformBuffer(buffer_size=10)
+        # map -> odom is static, odom -> base_link moves along x and yaws.
+        self.buf.set_transform("map", "odom", 0, (1.0, 0.0, 0.0), _yaw(0.0), static=True)
+        self.buf.set_transform("odom", "base_link", 1.0, (0.0, 0.0, 0.0), _yaw(0.0))
+        self.buf.set_transform("odom", "base_link", 2.0, (2.0, 0.0, 0.0), _yaw(math.pi / 2))
+        self.buf.set_transform("base_link", "laser", 1.0, (0.5, 0.0, 0.2), _yaw(0.0))
+        self.buf.set_transform("base_link", "laser", 3.0, (0.5, 0.0, 0.2), _yaw(0.0))
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_interpolation(self):
+        tf = self.buf.lookup_transform("map", "base_link", 1.5)
+        np.testing.assert_allclose(tf.translation, [2.0, 0.0, 0.0], atol=1e-9)
+        np.testing.assert_allclose(tf.rotation, _yaw(math.pi / 4), atol=1e-9)
+
+    def test_latest_common_time(self):
+        tf = self.buf.lookup_transform("map", "laser")
+        np.testing.assert_allclose(tf.translation, [3.0, 0.5, 0.2], atol=1e-9)
+
+    def test_inverse_chain(self):
+        tf = self.buf.lookup_transform("laser", "map", 2.0)
+        back = self.buf.lookup_transform("map", "laser", 2.0)
+        ident = tf * back
+        np.testing.assert_allclose(ident.translation, [0.0, 0.0, 0.0], atol=1e-9)
+        np.testing.assert_allclose(np.abs(ident.rotation), [0.0, 0.0, 0.0, 1.0], atol=1e-9)
+
+    def test_transform_points(self):
+        points = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+        out = self.buf.transform_points(points, "map", "base_link", 2.0)
+        np.testing.assert_allclose(out, [[3.0, 1.0, 0.0], [2.0, 0.0, 0.0]], atol=1e-9)
+
+    def test_vectorized_times(self):
+        tfs = self.buf.lookup_transforms("map", "base_link", [1.0, 1.5, 2.0])
+        np.testing.assert_allclose(tfs.translation[:, 0], [1.0, 2.0, 3.0], atol=1e-9)
+
+    def test_extrapolation_error(self):
+        self.assertRaises(TransformLookupError,
+                          self.buf.lookup_transform, "map", "base_link", 5.0)
+        self.assertRaises(TransformLookupError,
+                          self.buf.lookup_transform, "map", "unknown")
+
+    def test_ring_buffer_bound(self):
+        for i in range(100):
+            self.buf.set_transform("odom", "base_link", 10.0 + i, (i, 0.0, 0.0), _yaw(0.0))
+        self.assertRaises(TransformLookupError,
+                          self.buf.lookup_transform, "odom", "base_link", 12.0)
+        tf = self.buf.lookup_transform("odom", "base_link", 105.5)
+        np.testing.assert_allclose(tf.translation, [95.5, 0.0, 0.0], atol=1e-9)
+
+
+class RepublisherTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+        self._exec = LoopbackExecutor()
+        self._tf = TFClient(self._exec, 'map', republisher=True, update_delay=0.02)
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def _published(self, count):
+        frames = self._exec.wait_for('publish', count, timeout=0.5)
+        return [(f['topic'].rsplit('/', 1)[1], f['msg']) for f in frames]
+
+    def test_batched_goal(self):
+        self._tf.subscribe('base_link')
+        self._tf.subscribe('/laser', 'odom')
+        self._tf.unsubscribe('odom')
+        sent = self._published(2)
+        self.assertEqual(len(sent), 1)
+        topic, goal = sent[0]
+        self.assertEqual(topic, 'goal')
+        self.assertEqual(goal['goal'], {'source_frames': ['base_link', 'laser'],
+                                        'target_frame': 'map', 'angular_thres': 2.0,
+                                        'trans_thres': 0.01, 'rate': 10.0})
+        # Changes undone within the delay send nothing
+        self._tf.subscribe('odom')
+        self._tf.unsubscribe('odom')
+        self.assertEqual(len(self._published(2)), 1)
+
+    def test_cancel_and_resend(self):
+        self._tf.subscribe('base_link', 'laser')
+        first = self._published(1)[0][1]['goal_id']['id']
+        self._tf.unsubscribe('laser')
+        sent = self._published(3)
+        self.assertEqual([topic for topic, _ in sent], ['goal', 'cancel', 'goal'])
+        self.assertEqual(sent[1][1], {'id': first})
+        self.assertEqual(sent[2][1]['goal']['source_frames'], ['base_link'])
+        self._tf.unregister()
+        self.assertEqual(self._published(4)[3], ('cancel', {'id': sent[2][1]['goal_id']['id']}))
+
+    def test_feedback_transforms(self):
+        self._tf.subscribe('base_link')
+        goal_id = self._published(1)[0][1]['goal_id']['id']
+        self._exec.inject({'op': 'publish', 'topic': '/tf2_web_republisher/feedback', 'msg': {
+            'status': {'goal_id': {'id': goal_id}, 'status': 1},
+            'feedback': {'transforms': [{
+                'header': {'frame_id': 'map', 'stamp': {'secs': 5, 'nsecs': 0}},
+                'child_frame_id': 'base_link',
+                'transform': {'translation': {'x': 1.0, 'y': 2.0, 'z': 0.0},
+                              'rotation': _dict(_yaw(math.pi / 2))}}]}}})
+        tf = self._tf.lookup_transform('map', 'base_link')
+        np.testing.assert_allclose(tf.translation, [1.0, 2.0, 0.0], atol=1e-9)
+        np.testing.assert_allclose(tf.rotation, _yaw(math.pi / 2), atol=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
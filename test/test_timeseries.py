@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import unittest
+import time
+import numpy as np
+from rosbridge_pyclient import Subscriber, TimeSeries
+from loopback import LoopbackExecutor
+
+
+def odom(t, x, joints=None):
+    msg = {"header": {"stamp": {"secs": int(t), "nsecs": int(round((t % 1) * 1e9))}},
+           "pose": {"position": {"x": x, "y": -x}}}
+    if joints is not None:
+        msg["position"] = joints
+    return msg
+
+
+class TimeSeriesTest(unittest.TestCase):
+    def setUp(self):
+        self.startTime = time.time()
+
+    def tearDown(self):
+        t = time.time() - self.startTime
+        print("%s: %.3f" % (self.id(), t))
+
+    def test_extract(self):
+        ts = TimeSeries(["pose.position.x", "position[1:3]", "pose.position.y"],
+                        capacity=4, stamp="header.stamp")
+        self.assertEqual(ts.columns, ["pose.position.x", "position[1]",
+                                      "position[2]", "pose.position.y"])
+        ts.push(odom(1.5, 2.0, [0, 10, 20, 30]))
+        times, values = ts.data()
+        self.assertAlmostEqual(times[0], 1.5)
+        np.testing.assert_allclose(values[0], [2.0, 10, 20, -2.0])
+        # Missing or short fields are skipped
+        ts.push(odom(2.0, 1.0))
+        ts.push(odom(2.0, 1.0, [0, 1]))
+        self.assertEqual((len(ts), ts.skipped), (1, 2))
+
+    def test_invalid_paths(self):
+        for path in ["a..b", "a[1:]", "a[0:2].b", "a[2:1]", "a-b"]:
+            self.assertRaises(ValueError, TimeSeries, [path])
+
+    def test_queries(self):
+        ts = TimeSeries("pose.position.x", capacity=5, stamp="header.stamp")
+        for i in range(8):
+            ts.push(odom(float(i), float(i)))
+        times, values = ts.data()
+        np.testing.assert_allclose(times, [3, 4, 5, 6, 7])
+        times, values = ts.window(2.0)
+        np.testing.assert_allclose(values[:, 0], [5, 6, 7])
+        self.assertAlmostEqual(ts.mean(2.0)[0], 6.0)
+        np.testing.assert_allclose(ts.last(2)[0], [6, 7])
+        np.testing.assert_allclose(ts.last(10)[0], [3, 4, 5, 6, 7])
+        times, values = ts.last(0)
+        self.assertEqual((times.shape, values.shape), ((0,), (0, 1)))
+        self.assertEqual(len(ts.last(-1)[0]), 0)
+        grid, values = ts.resample(0.5, seconds=1.0)
+        np.testing.assert_allclose(grid, [6.0, 6.5, 7.0])
+        np.testing.assert_allclose(values[:, 0], [6.0, 6.5, 7.0])
+
+    def test_float32_values(self):
+        ts = TimeSeries("pose.position.x", stamp="header.stamp", dtype=np.float32)
+        stamp = 1700000000.25
+        ts.push(odom(stamp, 0.5))
+        ts.push(odom(stamp + 0.01, 1.5))
+        times, values = ts.data()
+        self.assertEqual((times.dtype, values.dtype), (np.float64, np.float32))
+        np.testing.assert_allclose(times, [stamp, stamp + 0.01], rtol=0, atol=1e-6)
+        np.testing.assert_allclose(ts.window(0.005)[1][:, 0], [1.5])
+
+    def test_subscriber_sink(self):
+        executor = LoopbackExecutor()
+        sub = Subscriber(executor, "/odom", "nav_msgs/Odometry")
+        ts = sub.timeseries(["pose.position.x"])
+        for i in range(3):
+            executor.inject({'op': 'publish', 'topic': '/odom', 'msg': odom(i, i)})
+        self.assertEqual(len(ts), 3)
+        sub.remove_sink(ts)
+        executor.inject({'op': 'publish', 'topic': '/odom', 'msg': odom(4, 4)})
+        self.assertEqual(len(ts), 3)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)